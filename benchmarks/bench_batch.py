@@ -0,0 +1,57 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Compare batch generation with and without `numpy_engine`.
+
+Run with::
+
+  $ python benchmarks/bench_batch.py [COUNT]
+
+We print the time needed to generate COUNT (default: 100000)
+passphrases with default options, once one by one and once with NumPy
+(if installed). The same is done for passphrases made after `TEMPLATE`.
+"""
+import sys
+import time
+from diceware import get_passphrases, handle_options, numpy_engine
+
+
+#: A template comparable to default options with one special char.
+TEMPLATE = "{en_eff:3}{en_adjectives}{en_nouns}{en_eff}{digit:2}{special}"
+
+
+def run(count, args):
+    start = time.time()
+    for passphrase in get_passphrases(handle_options(args), count):
+        pass
+    return time.time() - start
+
+
+def main(count=100000):
+    print("%-12s %-10s %10s %12s" % ("engine", "format", "count", "seconds"))
+    engines = ["python"]
+    if numpy_engine.is_available():
+        engines.insert(0, "numpy")
+    for engine in engines:
+        if engine == "python":
+            numpy_engine.numpy = None
+        for name, args in (("options", ["-s", "1"]),
+                           ("template", ["-t", TEMPLATE])):
+            print("%-12s %-10s %10d %12.3f" % (
+                engine, name, count, run(count, args)))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
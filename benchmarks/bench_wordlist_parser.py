@@ -0,0 +1,82 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Compare `parse_wordlist()` with the former line-by-line parser.
+
+Run with::
+
+  $ python benchmarks/bench_wordlist_parser.py
+
+For each bundled wordlist we print the best time of several runs for
+both parsers and make sure, they deliver the same terms.
+"""
+import io
+import os
+import timeit
+from diceware.wordlist import (
+    SIGNATURE_START, WordList, get_wordlists_dir, parse_wordlist,
+)
+
+
+def parse_per_line(w_list):
+    """Parse `w_list` line by line, like `WordList` did before 1.1.
+    """
+    w_list.fd.seek(0)
+    if w_list.signed:
+        while w_list.fd.readline().strip():
+            pass
+    result = []
+    for line in w_list.fd:
+        line = w_list.refine_entry(line)
+        if not line:
+            continue
+        elif w_list.signed and line == SIGNATURE_START:
+            break
+        result.append(line)
+    return result
+
+
+def parse_bulk(w_list):
+    """Parse `w_list` with `parse_wordlist()`.
+    """
+    w_list.fd.seek(0)
+    return list(parse_wordlist(w_list.fd))
+
+
+def main(number=20):
+    wordlists_dir = get_wordlists_dir()
+    print("%-28s %8s %12s %12s %8s" % (
+        "wordlist", "words", "per-line ms", "bulk ms", "speedup"))
+    for name in sorted(os.listdir(wordlists_dir)):
+        if name.endswith(".dwl"):
+            continue
+        w_list = WordList.__new__(WordList)
+        with io.open(os.path.join(wordlists_dir, name), "r") as fd:
+            w_list.fd = io.StringIO(fd.read())
+        w_list.path = "-"
+        w_list.signed = w_list.is_signed()
+        words = parse_per_line(w_list)
+        assert parse_bulk(w_list) == words, name
+        old = min(timeit.repeat(
+            lambda: parse_per_line(w_list), number=number, repeat=3))
+        new = min(timeit.repeat(
+            lambda: parse_bulk(w_list), number=number, repeat=3))
+        print("%-28s %8d %12.3f %12.3f %7.1fx" % (
+            name, len(words), old * 1000 / number, new * 1000 / number,
+            old / new))
+
+
+if __name__ == "__main__":
+    main()
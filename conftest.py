@@ -0,0 +1,6 @@
+import sys
+
+# `diceware.aio` and its tests use syntax of Python >= 3.6
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore = ["diceware/aio.py", "tests/test_aio.py"]
@@ -1,6 +1,9 @@
 version = "1.1.0.dev0"
 random_sources = {
     'system': 'diceware.random_sources:SystemRandomSource',
+    'buffered': 'diceware.random_sources:BufferedSystemRandomSource',
+    'xof': 'diceware.random_sources:XofRandomSource',
+    'seeded': 'diceware.random_sources:SeededRandomSource',
     'realdice': 'diceware.random_sources:RealDiceRandomSource',
     # add more sources of randomness here...
 }
@@ -16,6 +16,9 @@
 """diceware -- rememberable passphrases
 """
 import argparse
+import copy
+import heapq
+import itertools
 import os
 import sys
 import logging
@@ -25,12 +28,22 @@ from .__about__ import version as __version__
 from diceware.config import get_config_dict
 from diceware.logger import configure
 from diceware.wordlist import (
-    WordList, get_wordlist_path, get_wordlist_dirs, get_wordlist_names,
+    get_wordlist_path, get_wordlist_dirs, get_wordlist_names,
+    load_wordlist, parse_wordlist, compile_wordlist, open_wordlist_file,
+    transform_words, WORD_TRANSFORMS,
     )
+from diceware.packed import PACKED_EXT, PackedWordList
+from diceware.output import PassphraseWriter, is_broken_pipe, silence_stdout
+from diceware.plugins import RandomSources, registry as plugin_registry
+from diceware.random_sources import SystemRandomSource, as_batch_source
+from diceware import numpy_engine
 
 #: Special chars inserted on demand
 SPECIAL_CHARS = r"~!#$%^&*()-=+[]\{}:;" + r'"' + r"'<>?/0123456789"
 
+#: Minimum number of passphrases to generate with `numpy_engine`.
+NUMPY_MIN_COUNT = 1000
+
 GPL_TEXT = (
     """
     This program is free software: you can redistribute it and/or modify
@@ -69,26 +82,22 @@ def print_wordlist_dirs():
 
 
 def get_random_sources():
-    """Get a dictionary of all entry points called diceware_random_source.
+    """Get a mapping of all registered random sources.
 
-    Returns a dictionary with names mapped to callables registered as
-    `entry_point`s for the ``diceware_randomsource`` group.
+    Returns a `diceware.plugins.RandomSources` mapping with names mapped
+    to callables registered as `entry_point`s for the
+    ``diceware_source_of_randomness`` group and the sources shipped
+    with `diceware`. Modules of sources are imported only when sources
+    are looked up.
 
     Callables should accept `options` when called and return something
     that provides a `choice(sequence)` method that works like the
     respective method in the standard Python lib `random` module.
     """
     from .__about__ import random_sources
-    result = dict()
-    for name, spec in random_sources.items():
-        module, func = spec.split(":")
-        module = __import__(module, fromlist=['__name__'], level=0)
-        try:
-            func = getattr(module, func)
-        except AttributeError as exc:
-            raise ImportError(str(exc))
-        result[name] = func
-    return result
+    specs = dict(plugin_registry.get_specs())
+    specs.update(random_sources)
+    return RandomSources(specs)
 
 
 def handle_options(args):
@@ -106,6 +115,27 @@ def handle_options(args):
     parser.add_argument(
         '-n', '--num', default=6, type=int,
         help='number of words to concatenate. Default: 6')
+    parser.add_argument(
+        '-N', '--count', default=1, type=int, metavar='COUNT',
+        help='number of passphrases to generate. Default: 1')
+    parser.add_argument(
+        '-j', '--jobs', default=1, type=int, metavar='N',
+        help=(
+            'generate passphrases in N worker processes. 0 means one per '
+            'CPU. Default: 1'))
+    parser.add_argument(
+        '--unordered', action='store_true',
+        help=(
+            'with --jobs: output passphrases as soon as they are ready, '
+            'not in order of generation.'))
+    parser.add_argument(
+        '-o', '--output', default=None, metavar='OUTFILE',
+        help="Write passphrases to OUTFILE. `-' means stdout, the default.")
+    parser.add_argument(
+        '--flush-every', default=0, type=int, metavar='COUNT',
+        help=(
+            'write out passphrases after each COUNT passphrases. By default '
+            'passphrases are written in large blocks.'))
     cap_group = parser.add_mutually_exclusive_group()
     cap_group.add_argument(
         '-c', '--caps', action='store_true',
@@ -113,12 +143,31 @@ def handle_options(args):
     cap_group.add_argument(
         '--no-caps', action='store_false', dest='caps',
         help='Turn off capitalization.')
+    parser.add_argument(
+        '--transform', default=[], choices=list(WORD_TRANSFORMS),
+        metavar='NAME', nargs='*',
+        help=(
+            "Transform words with these transforms, applied in order after "
+            "capitalization. Possible values: `%s'." % (
+                "', `".join(WORD_TRANSFORMS))))
     parser.add_argument(
         '-s', '--specials', default=0, type=int, metavar='NUM',
         help="Append NUM special chars at the end of the generated passphrase.")
+    parser.add_argument(
+        '--insert-specials', action='store_true',
+        help=(
+            "Insert special chars at random positions of the passphrase "
+            "instead of appending them."))
     parser.add_argument(
         '-d', '--delimiter', default='',
         help="Separate words by DELIMITER. Empty string by default.")
+    parser.add_argument(
+        '-t', '--template', default=None, metavar='TEMPLATE',
+        help=(
+            "Make passphrases after TEMPLATE, like "
+            "`{en_adjectives}{en_nouns}{digit:2}{special}'. "
+            "Options -n, -s, -d, -w and --single-pass are ignored then. "
+            "INFILE cannot be given."))
     parser.add_argument(
         '-r', '--randomsource', default='system', choices=rnd_sources,
         metavar="SOURCE",
@@ -139,6 +188,11 @@ def handle_options(args):
             '--dice-sides', default=6, type=int, metavar="N",
             help='Number of sides of dice. Default: 6'
         )
+    parser.add_argument(
+        '--single-pass', action='store_true',
+        help=(
+            "Pick words while reading the wordlist once, without loading "
+            "or caching it. Meant for huge wordlists used only once."))
     parser.add_argument(
         'infile', nargs='?', metavar='INFILE', default=None,
         help="Input wordlist. `-' will read from stdin.",
@@ -154,11 +208,39 @@ def handle_options(args):
         '--show-wordlist-dirs', action='store_true',
         help='Output directories we look up to find wordlists and exit.',
         )
-    for plugin in plugins.values():
+    parser.set_defaults(**defaults)
+    if "-h" in args or "--help" in args:
+        selected = plugins.values()
+    else:
+        name = parser.parse_known_args(args)[0].randomsource
+        selected = [plugins[name]] if name in plugins else []
+    for plugin in selected:
         if hasattr(plugin, "update_argparser"):
             parser = plugin.update_argparser(parser)
     parser.set_defaults(**defaults)
     args = parser.parse_args(args)
+    interactive = getattr(
+        plugins.get(args.randomsource), "interactive", False)
+    if interactive and args.single_pass and not args.template:
+        parser.error(
+            "--single-pass does not work with random source `%s'"
+            % args.randomsource)
+    if interactive and args.jobs != 1:
+        parser.error(
+            "--jobs does not work with random source `%s'"
+            % args.randomsource)
+    if args.single_pass and args.jobs != 1 and not args.template:
+        parser.error("--jobs cannot be used with --single-pass")
+    if args.template:
+        from diceware.template import TemplateSlot, parse_template
+        if args.infile is not None:
+            parser.error("INFILE cannot be used with --template")
+        try:
+            items = parse_template(args.template, wordlist_names)
+        except ValueError as exc:
+            parser.error(str(exc))
+        if not [x for x in items if isinstance(x, TemplateSlot)]:
+            parser.error("Template without slots: %s" % args.template)
     return args
 
 
@@ -175,6 +257,141 @@ def append_special_char(word, specials=SPECIAL_CHARS, rnd=None):
     return ''.join([word, rnd.choice(specials)])
 
 
+def get_random_indexes(rnd, n, count):
+    """Get a list of `count` random ints in range ``[0, n)``.
+
+    Random sources `rnd` providing a `sample_indices(n, k)` method
+    deliver all numbers at once. Other sources are asked via
+    `diceware.random_sources.as_batch_source()`.
+    """
+    return as_batch_source(rnd).sample_indices(n, count)
+
+
+def pick_words(rnd, wordlists, num):
+    """Pick `num` words out of each of `wordlists`.
+
+    Words of each wordlist are picked with one `choice_many()` call of
+    `rnd` (see `diceware.random_sources.as_batch_source()`). They are
+    returned in turns, first word of each wordlist first::
+
+      >>> from diceware.random_sources import BatchSourceAdapter
+      >>> rnd = BatchSourceAdapter(SystemRandom())
+      >>> pick_words(rnd, [["a"], ["b"]], 2)
+      ['a', 'b', 'a', 'b']
+    """
+    columns = [rnd.choice_many(wordlist, num) for wordlist in wordlists]
+    return [word for row in zip(*columns) for word in row]
+
+
+def insert_chars(text, chars, positions):
+    """Insert each char of `chars` into `text` at the respective position.
+
+    Positions refer to `text` before any insertion. Chars with equal
+    positions keep their order. The result is built in one go::
+
+      >>> insert_chars("foobar", "12", [3, 0])
+      '2foo1bar'
+    """
+    pieces = []
+    start = 0
+    for pos, char in sorted(zip(positions, chars), key=lambda x: x[0]):
+        pieces.extend([text[start:pos], char])
+        start = pos
+    pieces.append(text[start:])
+    return "".join(pieces)
+
+
+def add_special_chars(passphrase, options, rnd, specials=SPECIAL_CHARS):
+    """Add `options.specials` chars out of `specials` to `passphrase`.
+
+    Chars are appended or, if `options.insert_specials` is set, inserted
+    at random positions (also inside words). All chars (and positions)
+    are picked by `rnd` in one batch (see `get_random_indexes()`).
+    """
+    num = options.specials
+    if num < 1:
+        return passphrase
+    chars = [specials[x] for x in get_random_indexes(rnd, len(specials), num)]
+    if not getattr(options, "insert_specials", False):
+        return passphrase + "".join(chars)
+    positions = get_random_indexes(rnd, len(passphrase) + 1, num)
+    return insert_chars(passphrase, chars, positions)
+
+
+def reservoir_sample(iterable, k, rnd):
+    """Pick `k` items out of `iterable` in a single pass.
+
+    The result is distributed like `k` calls of `rnd.choice()` on a list
+    of all items (i.e. items can be picked several times), but only `k`
+    items are kept in memory and `iterable` is consumed only once.
+
+    For each pick we run reservoir sampling with a reservoir of size
+    one: the `m`-th item replaces the current pick with probability
+    ``1/m``. Instead of deciding this for each item, we draw the number
+    of the next replacing item directly and skip all items before it.
+
+    `rnd` must provide a `choice()` method, see `random_sources`. Empty
+    iterables raise `IndexError`.
+    """
+    if k < 1:
+        return []
+    items = iter(iterable)
+    try:
+        first = next(items)
+    except StopIteration:
+        raise IndexError("Cannot choose from an empty sequence")
+    result = [first] * k
+    upcoming = [(_next_replacement(1, rnd), num) for num in range(k)]
+    heapq.heapify(upcoming)
+    consumed = 1
+    while True:
+        index = upcoming[0][0]
+        try:
+            item = next(itertools.islice(items, index - consumed - 1, None))
+        except StopIteration:
+            return result
+        consumed = index
+        while upcoming[0][0] == index:
+            num = upcoming[0][1]
+            result[num] = item
+            heapq.heapreplace(upcoming, (_next_replacement(index, rnd), num))
+
+
+def _next_replacement(seen, rnd):
+    """Get number of the next item replacing a pick after `seen` items.
+
+    The next item replacing the pick is item number `j`, where
+    ``P(j > m) = seen/m``. We compute `j` from a uniformly distributed
+    random number in ``[1, sys.maxsize]`` (drawn with `sample_indices()`
+    of `rnd`), which makes the error negligible.
+    """
+    rand = as_batch_source(rnd).sample_indices(sys.maxsize, 1)[0] + 1
+    return seen * sys.maxsize // rand + 1
+
+
+def sample_wordlist(path, k, rnd):
+    """Pick `k` words from wordlist file `path` in a single pass.
+
+    Words are picked with `reservoir_sample()`. With `path` ``-`` we
+    read from stdin. The wordlist is neither loaded completely nor
+    cached. From packed wordlists we pick `k` indexes at once and look
+    up only the words at these indexes.
+    """
+    if path == "-":
+        return reservoir_sample(parse_wordlist(sys.stdin), k, rnd)
+    if path.endswith(PACKED_EXT):
+        with open(path, "rb") as fd:
+            packed = PackedWordList(fd)
+            if k < 1:
+                return []
+            if not len(packed):
+                raise IndexError("Cannot choose from an empty sequence")
+            return [packed[x] for x in get_random_indexes(
+                rnd, len(packed), k)]
+    with open_wordlist_file(path) as fd:
+        return reservoir_sample(parse_wordlist(fd), k, rnd)
+
+
 def get_passphrase(options=None):
     """Get a diceware passphrase.
 
@@ -182,37 +399,222 @@ def get_passphrase(options=None):
     `argparse.OptionParser.parse_args()`.
 
     The passphrase returned will contain `options.num` words delimited by
-    `options.delimiter` and `options.specials` special chars.
+    `options.delimiter` and `options.specials` special chars. Special
+    chars are appended, or inserted at random positions if
+    `options.insert_specials` is ``True``.
 
     For the passphrase generation we will use the random source
     registered under the name `options.randomsource` (something like
     "system" or "dice").
 
-    If `options.caps` is ``True``, all words will be caps.
+    If `options.caps` is ``True``, all words will be caps. Further word
+    transforms are applied as named in `options.transform`.
 
     If `options.infile`, a file descriptor, is given, it will be used
     instead of a 'built-in' wordlist. `options.infile` must be open for
     reading.
+
+    If `options.single_pass` is ``True``, words are picked while reading
+    each wordlist once (see `sample_wordlist()`).
+
+    If `options.template` is set, the passphrase is made after this
+    template (see `diceware.template`).
+    """
+    return next(get_passphrases(options, 1))
+
+
+def get_input_paths(options):
+    """Get paths of the wordlists requested by `options`.
+
+    This is `options.infile`, if set, or the paths of the wordlists
+    named in `options.wordlist`.
+    """
+    if options.infile is not None:
+        return [options.infile]
+    return [get_wordlist_path(x) for x in options.wordlist]
+
+
+def get_word_transforms(options):
+    """Get names of the word transforms requested by `options`.
+
+    Words are capitalized first, if `options.caps` is set. Then the
+    transforms named in `options.transform` are applied, in order.
+    """
+    result = ["capitalize"] if options.caps else []
+    return result + list(getattr(options, "transform", None) or [])
+
+
+def load_wordlists(options):
+    """Load the wordlists requested by `options`, with words transformed.
+
+    Words are transformed as requested (see `get_word_transforms()`)
+    once and kept, packed, with the loaded wordlist. Picking a word is
+    a lookup in a memory-mapped file then.
+    """
+    transforms = get_word_transforms(options)
+    return [load_wordlist(path, transforms)
+            for path in get_input_paths(options)]
+
+
+def get_passphrases(options=None, count=None):
+    """Generate `count` diceware passphrases.
+
+    Passphrases are made like in `get_passphrase()`, but wordlists are
+    loaded and the random source is created only once for all of them.
+    If `count` is ``None``, we generate `options.count` passphrases.
+
+    In single pass mode we read each wordlist once and pick the words
+    for all passphrases during that pass.
+
+    If `options.jobs` is greater than one, passphrases are generated by
+    a pool of worker processes (see `diceware.parallel`). They are
+    delivered in order, unless `options.unordered` is set.
     """
     if options is None:
         options = handle_options(args=[])
+    if count is None:
+        count = getattr(options, "count", 1)
+    single_pass = getattr(options, "single_pass", False) and not getattr(
+        options, "template", None)
+    jobs = getattr(options, "jobs", 1)
+    if jobs != 1 and not single_pass:
+        from diceware.parallel import iter_parallel
+        for passphrase in iter_parallel(
+                options, count, jobs,
+                ordered=not getattr(options, "unordered", False)):
+            yield passphrase
+        return
+    if not single_pass:
+        for passphrase in PassphraseGenerator(options).generate_many(count):
+            yield passphrase
+        return
     rnd_source = get_random_sources()[options.randomsource]
     rnd = rnd_source(options)
+    transforms = get_word_transforms(options)
+    picks = [
+        transform_words(
+            sample_wordlist(path, options.num * count, rnd), transforms)
+        for path in get_input_paths(options)]
+    for num in range(count):
+        row_picks = [
+            pick[num * options.num:(num + 1) * options.num]
+            for pick in picks]
+        words = [word for row in zip(*row_picks) for word in row]
+        yield make_passphrase(words, options, rnd)
+
+
+def generate_passphrases(options, rnd, wordlists, count):
+    """Generate `count` passphrases out of loaded `wordlists`.
+
+    Words of `wordlists` are used as they are, so they must be
+    transformed already (see `load_wordlists()`). Words and special
+    chars are picked by `rnd`, a random source. At least
+    `NUMPY_MIN_COUNT` passphrases picked by the ``system`` random source
+    are generated by `numpy_engine`, if NumPy is installed.
+    """
+    if use_numpy_engine(rnd, wordlists, count):
+        insert = getattr(options, "insert_specials", False)
+        engine_options = options
+        if insert:
+            # numpy_engine only appends; we insert afterwards.
+            engine_options = copy.copy(options)
+            engine_options.specials = 0
+        for passphrase in numpy_engine.iter_passphrases(
+                wordlists, engine_options, count, rnd.rnd.getbytes,
+                SPECIAL_CHARS):
+            if insert:
+                passphrase = add_special_chars(passphrase, options, rnd)
+            yield passphrase
+        return
+    batch_rnd = as_batch_source(rnd)
+    for num in range(count):
+        words = pick_words(batch_rnd, wordlists, options.num)
+        yield make_passphrase(words, options, rnd)
+
+
+class PassphraseGenerator(object):
+    """A reusable generator of diceware passphrases.
+
+    All setup is done once, on creation: the random source is created
+    and wordlists are loaded, with words transformed. `generate()` and
+    `generate_many()` then only pick words.
+
+    Options are taken from `options` (as returned by `handle_options()`)
+    or, if ``None``, from defaults and config files. Any keyword
+    argument overrides the option of same name, for instance::
+
+      >>> generator = PassphraseGenerator(num=3, delimiter="-")
+      >>> len(generator.generate().split("-"))
+      3
+
+    If `options.template` is set, passphrases are made after this
+    template. It is compiled once into a `diceware.template.TemplatePlan`.
+
+    `options.single_pass` and `options.jobs` are not used here, see
+    `get_passphrases()` for these.
+    """
+    def __init__(self, options=None, **kw):
+        if options is None:
+            options = handle_options(args=[])
+        else:
+            options = copy.copy(options)
+        for key, value in kw.items():
+            if not hasattr(options, key):
+                raise TypeError("Unknown option: %s" % key)
+            setattr(options, key, value)
+        self.options = options
+        self.rnd = get_random_sources()[options.randomsource](options)
+        self.plan = None
+        self.wordlists = []
+        if getattr(options, "template", None):
+            from diceware.template import compile_template
+            self.plan = compile_template(options.template, options)
+            return
+        self.wordlists = load_wordlists(options)
+
+    def generate(self):
+        """Get a passphrase.
+        """
+        if self.plan is not None:
+            return self.plan.generate(self.rnd)
+        words = pick_words(
+            as_batch_source(self.rnd), self.wordlists, self.options.num)
+        return make_passphrase(words, self.options, self.rnd)
+
+    def generate_many(self, count):
+        """Generate `count` passphrases.
+
+        For large numbers of passphrases `numpy_engine` is used, if
+        available (see `generate_passphrases()`).
+        """
+        if self.plan is not None:
+            return self.plan.generate_many(self.rnd, count)
+        return generate_passphrases(
+            self.options, self.rnd, self.wordlists, count)
+
 
-    words = []
-    paths = [options.infile]
-    if paths == [None]:
-        paths = [get_wordlist_path(x) for x in options.wordlist]
-    wordlists = [list(WordList(path)) for path in paths]
-    for x_ in range(options.num):
-        for wordlist in wordlists:
-            words.append(rnd.choice(wordlist))
-    if options.caps:
-        words = [x.capitalize() for x in words]
-    result = options.delimiter.join(words)
-    for _ in range(options.specials):
-        result = append_special_char(result, rnd=rnd)
-    return result
+def use_numpy_engine(rnd, wordlists, count):
+    """Tell whether to generate `count` passphrases with `numpy_engine`.
+
+    We need NumPy, a `SystemRandomSource` as `rnd`, at least
+    `NUMPY_MIN_COUNT` passphrases and wordlists (or other sequences to
+    pick from) `numpy_engine` can handle. NumPy is looked up (and
+    imported) last, only if all other conditions are met.
+    """
+    return (
+        count >= NUMPY_MIN_COUNT and isinstance(rnd, SystemRandomSource) and
+        all([0 < len(w) <= numpy_engine.RANDOM_SPACE for w in wordlists])
+        and numpy_engine.is_available())
+
+
+def make_passphrase(words, options, rnd):
+    """Join picked `words` into a passphrase as requested by `options`.
+
+    Words, already transformed, are joined by `options.delimiter`.
+    Finally `options.specials` special chars, picked by `rnd`, are added
+    (see `add_special_chars()`).
+    """
+    return add_special_chars(options.delimiter.join(words), options, rnd)
 
 
 def main(args=None):
@@ -233,12 +635,70 @@ def main(args=None):
     elif options.show_wordlist_dirs:
         print_wordlist_dirs()
         raise SystemExit(0)
+    passphrases = get_passphrases(options)
+    writer = PassphraseWriter(options.output, options.flush_every)
     try:
-        print(get_passphrase(options))
+        writer.write_all(passphrases)
     except (OSError, IOError) as infile_error:
-        if getattr(infile_error, 'errno', 0) == ENOENT:
-            logging.getLogger('ulif.diceware').error(
-                "The file '%s' does not exist." % infile_error.filename)
+        if is_broken_pipe(infile_error):
+            silence_stdout()
+            raise SystemExit(1)
+        elif getattr(infile_error, 'errno', 0) == ENOENT:
+            if writer.fd is None and not writer.to_stdout and (
+                    infile_error.filename == options.output):
+                logging.getLogger('ulif.diceware').error(
+                    "Cannot write to '%s': the directory does not exist."
+                    % infile_error.filename)
+            else:
+                logging.getLogger('ulif.diceware').error(
+                    "The file '%s' does not exist." % infile_error.filename)
             raise SystemExit(1)
         else:
             raise
+    finally:
+        passphrases.close()
+
+
+def compile_main(args=None):
+    """Compile wordlists into packed wordlists.
+
+    Called when `diceware-compile` script is called.
+
+    `args` is a list of command line arguments to process. If no such
+    args are given, we use `sys.argv`.
+    """
+    if args is None:
+        args = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        description=(
+            "Compile wordlists into packed wordlists. Packed wordlists "
+            "load faster and are preferred over wordlists of same name "
+            "in wordlist dirs."),
+        )
+    parser.add_argument(
+        'infiles', nargs='+', metavar='INFILE',
+        help="Input wordlist. `-' will read from stdin.")
+    parser.add_argument(
+        '-o', '--output', default=None, metavar='OUTFILE',
+        help=(
+            "Write packed wordlist to OUTFILE. Only one INFILE allowed "
+            "then. Default: `wordlist_<NAME>.dwl' next to INFILE."))
+    parser.add_argument(
+        '-v', '--verbose', action='count',
+        help='Be verbose. Use several times for increased verbosity.')
+    options = parser.parse_args(args)
+    configure(options.verbose)
+    if options.output is not None and len(options.infiles) > 1:
+        parser.error("--output allows one INFILE only")
+    for path in options.infiles:
+        try:
+            out_path = compile_wordlist(path, options.output)
+        except ValueError as exc:
+            parser.error(str(exc))
+        except (OSError, IOError) as exc:
+            logging.getLogger('ulif.diceware').error(
+                "Cannot compile '%s': %s" % (path, exc))
+            raise SystemExit(1)
+        logging.getLogger('ulif.diceware').info(
+            "Compiled '%s' into '%s'" % (path, out_path))
@@ -0,0 +1,155 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""aio -- generate passphrases in `asyncio` applications.
+
+`get_passphrase()` reads config files and wordlists, and some random
+sources (like ``realdice``) wait for user input. Called from a
+coroutine, this would block the event loop. `aget_passphrase()` and
+`aget_passphrases()` run all blocking work in an executor (the default
+executor of the loop, if none is given) instead.
+
+Random sources can also be async-native: if the `choice` method of a
+random source is a coroutine function, we await it on the event loop
+and only load wordlists in the executor::
+
+    class MyAsyncRandomSource(object):
+
+        def __init__(self, options):
+            self.options = options
+
+        async def choice(self, sequence):
+            index = await get_random_index_from_somewhere(len(sequence))
+            return sequence[index]
+
+This module requires Python >= 3.6.
+"""
+import asyncio
+import inspect
+import itertools
+from diceware import (
+    SPECIAL_CHARS, get_passphrases, get_random_sources, handle_options,
+    insert_chars, load_wordlists,
+)
+from diceware.template import compile_template
+
+
+#: Number of passphrases generated at once in the executor.
+CHUNK_SIZE = 1000
+
+
+def is_async_source(rnd_source):
+    """Tell whether `rnd_source` provides a coroutine `choice` method.
+    """
+    return inspect.iscoroutinefunction(getattr(rnd_source, "choice", None))
+
+
+def get_options_and_source(options=None):
+    """Get `options` and the random source class selected there.
+
+    If `options` is ``None``, default options (including config files)
+    are read. Looking up the random source might import its module.
+    Both can block, so this function is run in an executor.
+    """
+    if options is None:
+        options = handle_options([])
+    return options, get_random_sources()[options.randomsource]
+
+
+async def aget_passphrase(options=None, executor=None):
+    """Get a diceware passphrase without blocking the event loop.
+
+    Works like `diceware.get_passphrase()`. Blocking work is done in
+    `executor` (see `aget_passphrases()`).
+    """
+    passphrases = aget_passphrases(options, 1, executor)
+    try:
+        return await passphrases.__anext__()
+    finally:
+        await passphrases.aclose()
+
+
+async def aget_passphrases(options=None, count=None, executor=None,
+                           chunk_size=CHUNK_SIZE):
+    """Generate `count` passphrases without blocking the event loop.
+
+    Works like `diceware.get_passphrases()`, but is an asynchronous
+    generator. If `options` is ``None``, default options (including
+    config files) are read in `executor`. The random source is looked
+    up (and maybe imported) in `executor` as well.
+
+    For regular random sources we run `diceware.get_passphrases()` in
+    `executor`, taking `chunk_size` passphrases at once. Async-native
+    random sources are awaited on the event loop instead.
+    """
+    loop = asyncio.get_event_loop()
+    options, rnd_source = await loop.run_in_executor(
+        executor, get_options_and_source, options)
+    if count is None:
+        count = getattr(options, "count", 1)
+    if is_async_source(rnd_source):
+        passphrases = _aget_async_passphrases(
+            options, count, executor, rnd_source(options))
+        async for passphrase in passphrases:
+            yield passphrase
+        return
+    passphrases = get_passphrases(options, count)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(
+                executor, list, itertools.islice(passphrases, chunk_size))
+            if not chunk:
+                break
+            for passphrase in chunk:
+                yield passphrase
+    finally:
+        try:
+            passphrases.close()
+        except ValueError:  # pragma: no cover
+            pass  # cancelled while still running in executor
+
+
+async def _aget_async_passphrases(options, count, executor, rnd):
+    """Generate `count` passphrases with words picked by async `rnd`.
+    """
+    loop = asyncio.get_event_loop()
+    if getattr(options, "template", None):
+        plan = await loop.run_in_executor(
+            executor, compile_template, options.template, options)
+        for num in range(count):
+            picks = []
+            for sequence in plan.schedule:
+                picks.append(await rnd.choice(sequence))
+            yield plan.format(picks)
+        return
+    wordlists = await loop.run_in_executor(
+        executor, load_wordlists, options)
+    for num in range(count):
+        words = []
+        for x_ in range(options.num):
+            for wordlist in wordlists:
+                words.append(await rnd.choice(wordlist))
+        passphrase = options.delimiter.join(words)
+        specials = []
+        for x_ in range(options.specials):
+            specials.append(await rnd.choice(SPECIAL_CHARS))
+        if getattr(options, "insert_specials", False):
+            numbers = range(len(passphrase) + 1)
+            positions = []
+            for x_ in specials:
+                positions.append(await rnd.choice(numbers))
+            yield insert_chars(passphrase, specials, positions)
+        else:
+            yield passphrase + "".join(specials)
@@ -28,11 +28,18 @@ OPTIONS_DEFAULTS = dict(
     num=6,
     caps=True,
     specials=0,
+    insert_specials=False,
+    transform=[],
+    template=None,
     delimiter="",
     randomsource="system",
     verbose=0,
     wordlist=["en_eff"],
     dice_sides=6,
+    random_buffer_size=65536,
+    xof_hash="shake256",
+    reseed_bytes=16777216,
+    reseed_interval=300,
     )
 
 
@@ -122,7 +129,7 @@ def get_config_dict(
             result[key] = parser.getboolean(section, key)
         elif isinstance(val, int):
             result[key] = parser.getint(section, key)
-        elif key == "wordlist":
+        elif key in ("wordlist", "transform"):
             result[key] = string_to_wlist_list(parser.get(section, key))
         else:
             result[key] = parser.get(section, key).strip("\"'")
@@ -0,0 +1,146 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""numpy_engine -- generate many passphrases at once with NumPy.
+
+This engine is used by `diceware.get_passphrases()` for large batches
+if `NumPy` is installed and the ``system`` random source is in use.
+Instead of picking word by word, we turn blocks of random bytes into
+arrays of indexes, and gather words from array-backed wordlists for
+whole batches of passphrases.
+
+Indexes are computed like in `diceware.random_sources.BulkRandom`, with
+rejection sampling, so passphrases are distributed exactly as if made
+one by one. Without NumPy, `is_available()` returns ``False`` and
+`diceware` generates passphrases one by one.
+
+NumPy is imported only when `is_available()` is called for the first
+time, so importing `diceware` (and making a few passphrases) does not
+cost the time for importing NumPy.
+"""
+
+#: The `numpy` module, set by `is_available()`. ``False`` while not
+#: looked up yet, ``None`` if NumPy is not installed.
+numpy = False
+
+
+#: Number of passphrases generated at once.
+BATCH_SIZE = 65536
+
+#: Upper limit (exclusive) of random numbers drawn in one step.
+RANDOM_SPACE = 2 ** 32
+
+
+def is_available():
+    """Tell whether NumPy is installed.
+
+    NumPy is imported on first call.
+    """
+    global numpy
+    if numpy is False:
+        try:
+            import numpy as module
+        except ImportError:  # pragma: no cover
+            module = None
+        numpy = module
+    return numpy is not None
+
+
+def randbelow_many(getbytes, n, count):
+    """Get an array of `count` random ints in range ``[0, n)``.
+
+    `getbytes(num)` must return `num` random bytes. We read unsigned 32
+    bit ints and reject values from the incomplete last interval before
+    taking them modulo `n`. `n` must therefore be at most
+    `RANDOM_SPACE`.
+    """
+    if not 0 < n <= RANDOM_SPACE:
+        raise ValueError("n must be in range 1..%s" % RANDOM_SPACE)
+    if not is_available():
+        raise ImportError("NumPy is not installed")
+    limit = RANDOM_SPACE - RANDOM_SPACE % n
+    parts = [numpy.zeros(0, dtype="<u4")]
+    found = 0
+    while found < count:
+        missing = count - found
+        # draw some more than needed, to avoid further rounds.
+        num = missing + missing // 64 + 16
+        values = numpy.frombuffer(getbytes(4 * num), dtype="<u4")
+        if limit < RANDOM_SPACE:
+            values = values[values < limit]
+        values = values[:missing]
+        parts.append(values)
+        found += len(values)
+    return numpy.concatenate(parts).astype(numpy.int64) % n
+
+
+def iter_passphrases(wordlists, options, count, getbytes, special_chars):
+    """Generate `count` passphrases from `wordlists`.
+
+    Passphrases are made like in `diceware.get_passphrase()`, according
+    to `options`: `options.num` words of each wordlist in `wordlists`
+    (in turn), joined by `options.delimiter`. Words are used as they
+    are, word transforms must be applied already. Finally
+    `options.specials` chars out of `special_chars` are appended.
+
+    Random bytes are taken from `getbytes(num)`. Passphrases are
+    generated in batches of `BATCH_SIZE` (see `iter_scheduled()`).
+    """
+    schedule = [w for x_ in range(options.num) for w in wordlists]
+    fmt = options.delimiter.replace("%", "%%").join(["%s"] * len(schedule))
+    schedule += [special_chars] * options.specials
+    fmt += "%s" * options.specials
+    return iter_scheduled(schedule, fmt, count, getbytes)
+
+
+def iter_scheduled(schedule, fmt, count, getbytes):
+    """Generate `count` strings made after format string `fmt`.
+
+    `schedule` is a list of sequences, one for each ``%s`` in `fmt`.
+    For each string we pick one item of each sequence. Sequences with
+    no more items than we draw from them in total are turned into
+    arrays once. From larger sequences (like memory-mapped wordlists)
+    we look up the drawn items only, so they are never copied as a
+    whole.
+
+    Random bytes are taken from `getbytes(num)`. Strings are generated
+    in batches of `BATCH_SIZE`, drawing the indexes for one slot of a
+    whole batch at once.
+    """
+    if not is_available():
+        raise ImportError("NumPy is not installed")
+    draws, arrays = {}, {}
+    for sequence in schedule:
+        draws[id(sequence)] = draws.get(id(sequence), 0) + count
+    for sequence in schedule:
+        if id(sequence) not in arrays:
+            array = sequence
+            if len(sequence) <= draws[id(sequence)]:
+                array = numpy.empty(len(sequence), dtype=object)
+                array[:] = list(sequence)
+            arrays[id(sequence)] = array
+    columns_arrays = [arrays[id(sequence)] for sequence in schedule]
+    while count > 0:
+        batch = min(count, BATCH_SIZE)
+        count -= batch
+        columns = numpy.empty((batch, len(columns_arrays)), dtype=object)
+        for num, array in enumerate(columns_arrays):
+            indexes = randbelow_many(getbytes, len(array), batch)
+            if isinstance(array, numpy.ndarray):
+                columns[:, num] = array[indexes]
+            else:
+                columns[:, num] = [array[x] for x in indexes.tolist()]
+        for row in columns.tolist():
+            yield fmt % tuple(row)
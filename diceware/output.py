@@ -0,0 +1,141 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""output -- write passphrases.
+
+Printing each passphrase means one small write (and maybe flush) per
+line. `PassphraseWriter` instead collects encoded passphrases in a
+buffer and writes them out in large blocks, to stdout or to a file.
+"""
+import errno
+import io
+import os
+import sys
+
+
+#: Number of bytes collected before they are written.
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+
+class PassphraseWriter(object):
+    """Write passphrases, one per line, to file `path` or stdout.
+
+    With `path` ``None`` or ``-`` we write to stdout, encoded with the
+    encoding of stdout. If stdout is a text file without binary
+    `buffer` (like an `io.StringIO` set as `sys.stdout`), we write text
+    instead. Files are written UTF-8 encoded. Files are opened on first
+    write, so no file is created if there is nothing to write.
+
+    Passphrases are collected until `buffer_size` bytes are reached.
+    If `flush_every` is set, we write out (and flush) additionally each
+    time after `flush_every` passphrases. Call `close()` when done.
+    """
+    def __init__(self, path=None, flush_every=0,
+                 buffer_size=OUTPUT_BUFFER_SIZE):
+        self.path = path
+        self.flush_every = flush_every
+        self.buffer_size = buffer_size
+        self.fd = None
+        self.text = False
+        self.encoding = "utf-8"
+        if self.to_stdout:
+            self.encoding = getattr(sys.stdout, "encoding", None) or "utf-8"
+        self.buffer = []
+        self.buffered = 0
+        self.count = 0
+
+    @property
+    def to_stdout(self):
+        return self.path in (None, "-")
+
+    def get_fd(self):
+        """Get the file object we write to.
+
+        This is a binary file object, unless `text` is set.
+        """
+        if self.fd is None:
+            if self.to_stdout:
+                self.fd = getattr(sys.stdout, "buffer", None)
+                if self.fd is None:
+                    self.fd = sys.stdout
+                    self.text = sys.version_info >= (3, ) and not (
+                        isinstance(self.fd, (io.BufferedIOBase,
+                                             io.RawIOBase)))
+            else:
+                self.fd = open(self.path, "wb")
+        return self.fd
+
+    def write(self, passphrase):
+        """Write `passphrase`, followed by a newline.
+        """
+        data = (passphrase + "\n").encode(self.encoding)
+        self.buffer.append(data)
+        self.buffered += len(data)
+        self.count += 1
+        if self.buffered >= self.buffer_size or (
+                self.flush_every and self.count % self.flush_every == 0):
+            self.flush()
+
+    def write_all(self, passphrases):
+        """Write all passphrases of iterable `passphrases` and close.
+
+        Only up to `buffer_size` bytes are kept in memory, no matter how
+        many passphrases there are.
+        """
+        for passphrase in passphrases:
+            self.write(passphrase)
+        self.close()
+
+    def flush(self):
+        """Write out buffered passphrases.
+        """
+        fd = self.get_fd()
+        data = b"".join(self.buffer)
+        if self.text:
+            data = data.decode(self.encoding)
+        fd.write(data)
+        fd.flush()
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self):
+        """Write out buffered passphrases and close the output file.
+
+        Stdout is flushed but not closed.
+        """
+        if self.buffer:
+            self.flush()
+        if self.fd is not None and not self.to_stdout:
+            self.fd.close()
+
+
+def is_broken_pipe(exc):
+    """Tell whether `exc` was raised because the reader of our output
+    went away (like ``head`` in ``diceware -N 100 | head -n 1``).
+    """
+    return getattr(exc, "errno", None) == errno.EPIPE
+
+
+def silence_stdout():
+    """Redirect stdout to ``os.devnull``.
+
+    After a broken pipe, Python would try to flush stdout again on exit
+    and complain a second time.
+    """
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    except (AttributeError, ValueError, OSError, IOError):
+        pass  # stdout is not a real file
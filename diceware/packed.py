@@ -0,0 +1,313 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""packed -- compact binary wordlists.
+
+Reading a text wordlist means stripping (and maybe regex-matching) each
+single line. To avoid this work on every run, we store the already
+refined words of a wordlist in a binary file, a `packed` wordlist. Packed
+wordlists of regular wordlist files are kept in a cache dir (see
+`get_cache_dir()`).
+
+A packed wordlist file is made of (all numbers little-endian):
+
+- a header (see `HEADER`) with magic bytes, size and modification time
+  of the source file, flags, the length of the source path, the number
+  of words and the length of the words blob.
+
+- the UTF-8 encoded absolute path of the source file.
+
+- the words blob: all words, UTF-8 encoded, each one followed by a
+  newline char.
+
+- an offsets table: for each word the start position inside the blob,
+  followed by the length of the blob. Offsets are unsigned 32 bit ints,
+  or 64 bit ints if the blob is larger than `MAX_NARROW_OFFSET` (then
+  flag `FLAG_WIDE` is set).
+
+The whole list can therefore be read with one `read()` and one
+`split()`, while the offsets table allows to look up single words
+without reading the whole blob (see `PackedWordList`).
+"""
+import array
+import hashlib
+import logging
+import mmap
+import operator
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+
+#: Magic bytes at the beginning of each packed wordlist.
+MAGIC = b"DWLPACK1"
+
+#: Packed wordlist header: magic, source size, source mtime (in ns),
+#: flags, length of source path, number of words, length of words blob.
+HEADER = struct.Struct("<8sQqIIQQ")
+
+#: Two consecutive offsets table entries (32 bit).
+OFFSETS_PAIR = struct.Struct("<II")
+
+#: Two consecutive offsets table entries (64 bit).
+WIDE_OFFSETS_PAIR = struct.Struct("<QQ")
+
+#: Largest offset stored in 32 bit offsets tables.
+MAX_NARROW_OFFSET = 2 ** 32 - 1
+
+#: Header flag: source file was a signed wordlist.
+FLAG_SIGNED = 1
+
+#: Header flag: offsets table contains 64 bit ints.
+FLAG_WIDE = 2
+
+#: Filename extension of packed wordlists.
+PACKED_EXT = ".dwl"
+
+#: Files modified less than `RACY_INTERVAL` seconds ago are not cached.
+#:
+#: Filesystems with coarse timestamps might otherwise hide changes
+#: that happen right after we cached a file.
+RACY_INTERVAL = 2
+
+#: Approximate number of bytes decoded at once when iterating over words.
+ITER_CHUNK_SIZE = 1024 * 1024
+
+#: Infos about a packed wordlist as stored in its header.
+PackedHeader = namedtuple(
+    "PackedHeader",
+    ["source_path", "source_size", "source_mtime", "signed", "num_words",
+     "blob_len", "wide"])
+
+
+def get_cache_dir():
+    """Get the directory in which packed wordlists are cached.
+
+    This is ``${XDG_CACHE_HOME}/diceware/`` if ${XDG_CACHE_HOME} is set
+    and ``${HOME}/.cache/diceware/`` else. If neither is available, we
+    return ``None``.
+    """
+    cache_home = os.getenv("XDG_CACHE_HOME", "")
+    user_home = os.path.expanduser("~")
+    if (cache_home == "") and (user_home != "~"):
+        cache_home = os.path.join(user_home, ".cache")
+    if not cache_home:
+        return None
+    return os.path.join(os.path.abspath(cache_home), "diceware")
+
+
+def get_cache_path(path, transforms=()):
+    """Get path of the cached packed version of wordlist file `path`.
+
+    Words with `transforms` (a sequence of transform names) applied are
+    cached in a file of their own. Returns ``None`` if no cache dir is
+    available.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    key = "\n".join([os.path.abspath(path)] + list(transforms))
+    key = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key + PACKED_EXT)
+
+
+def get_source_id(path):
+    """Get size and modification time (in nanoseconds) of file `path`.
+    """
+    st = os.stat(path)
+    mtime = getattr(st, "st_mtime_ns", None)
+    if mtime is None:  # pragma: no cover  # Python < 3.3
+        mtime = int(st.st_mtime * 10 ** 9)
+    return st.st_size, mtime
+
+
+def pack(words, fd, source_path="", source_size=0, source_mtime=0,
+         signed=False):
+    """Write `words` as packed wordlist into binary file `fd`.
+
+    `words` can be any iterable of strings, it is consumed only once.
+    `fd` must be seekable, as we update the header when done. Apart from
+    the offsets table (4 or 8 bytes per word) we keep nothing in memory.
+
+    Returns the number of words written.
+    """
+    path = source_path.encode("utf-8")
+    start = fd.tell()
+    fd.write(HEADER.pack(MAGIC, 0, 0, 0, 0, 0, 0))
+    fd.write(path)
+    offsets = array.array("I")
+    pos = 0
+    for word in words:
+        data = word.encode("utf-8") + b"\n"
+        fd.write(data)
+        offsets.append(pos)
+        pos += len(data)
+        if pos > MAX_NARROW_OFFSET and offsets.typecode == "I":
+            offsets = array.array("Q", offsets)
+    offsets.append(pos)
+    flags = signed and FLAG_SIGNED or 0
+    if offsets.typecode == "Q":
+        flags |= FLAG_WIDE
+    if sys.byteorder != "little":  # pragma: no cover
+        offsets.byteswap()
+    fd.write(offsets.tobytes())
+    end = fd.tell()
+    fd.seek(start)
+    fd.write(HEADER.pack(
+        MAGIC, source_size, source_mtime, flags, len(path),
+        len(offsets) - 1, pos))
+    fd.seek(end)
+    fd.flush()
+    return len(offsets) - 1
+
+
+def read_header(data):
+    """Get a `PackedHeader` from the beginning of `data`.
+
+    `data` is the content of a packed wordlist as bytes (or any other
+    buffer). Raises `ValueError` if `data` is not a packed wordlist.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Not a packed wordlist")
+    (magic, size, mtime, flags, path_len, num_words,
+     blob_len) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a packed wordlist")
+    path = bytes(data[HEADER.size:HEADER.size + path_len]).decode("utf-8")
+    return PackedHeader(
+        path, size, mtime, bool(flags & FLAG_SIGNED), num_words, blob_len,
+        bool(flags & FLAG_WIDE))
+
+
+def unpack(data):
+    """Get header and list of words from packed wordlist `data`.
+    """
+    header = read_header(data)
+    start = HEADER.size + len(header.source_path.encode("utf-8"))
+    blob = data[start:start + header.blob_len]
+    return header, blob.decode("utf-8").split("\n")[:-1]
+
+
+class PackedWordList(object):
+    """A sequence of words stored in a packed wordlist file.
+
+    `fd` is a binary file object of a packed wordlist. The file is
+    memory-mapped and words are decoded only when looked up by index.
+    Therefore picking some words from even a huge wordlist keeps memory
+    usage low.
+
+    `PackedWordList` instances support `len()`, indexing (also with
+    negative indexes) and iteration. Iterating decodes about
+    `ITER_CHUNK_SIZE` bytes of words at a time.
+    """
+    def __init__(self, fd):
+        self.fd = fd
+        self.mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = read_header(self.mmap)
+        self._blob = HEADER.size + len(
+            self.header.source_path.encode("utf-8"))
+        self._offsets = self._blob + self.header.blob_len
+        self._pair = self.header.wide and WIDE_OFFSETS_PAIR or OFFSETS_PAIR
+        self._offset_size = self._pair.size // 2
+        if len(self.mmap) < self._offsets + self._offset_size * (
+                self.header.num_words + 1):
+            raise ValueError("Truncated packed wordlist")
+
+    def __len__(self):
+        return self.header.num_words
+
+    def __getitem__(self, index):
+        index = operator.index(index)
+        if index < 0:
+            index += self.header.num_words
+        if not 0 <= index < self.header.num_words:
+            raise IndexError("packed wordlist index out of range")
+        start, end = self._pair.unpack_from(
+            self.mmap, self._offsets + index * self._offset_size)
+        return self.mmap[self._blob + start:self._blob + end - 1].decode(
+            "utf-8")
+
+    def __iter__(self):
+        start, end = self._blob, self._blob + self.header.blob_len
+        while start < end:
+            stop = self.mmap.rfind(
+                b"\n", start, min(start + ITER_CHUNK_SIZE, end)) + 1
+            if stop <= start:  # a single word longer than a chunk
+                stop = self.mmap.find(b"\n", start, end) + 1
+            for word in self.mmap[start:stop - 1].decode("utf-8").split(
+                    "\n"):
+                yield word
+            start = stop
+
+
+def open_cached(path, transforms=()):
+    """Open the cached packed version of wordlist file `path`.
+
+    Returns a `PackedWordList` if we have a cached version of `path` (with
+    `transforms` applied) that is still valid, i.e. was made from a file
+    with same path, size and modification time. Otherwise ``None`` is
+    returned.
+    """
+    cache_path = get_cache_path(path, transforms)
+    if cache_path is None or not os.path.isfile(cache_path):
+        return None
+    try:
+        size, mtime = get_source_id(path)
+        with open(cache_path, "rb") as fd:
+            packed = PackedWordList(fd)
+    except (OSError, IOError, ValueError):
+        return None
+    header = packed.header
+    if (header.source_path, header.source_size, header.source_mtime) != (
+            os.path.abspath(path), size, mtime):
+        return None
+    return packed
+
+
+def store_cached(path, words, signed=False, transforms=()):
+    """Store `words`, read from wordlist file `path`, in cache dir.
+
+    If `words` have `transforms` applied, pass the transform names to
+    store them apart from the plain words of `path`. Returns the path of
+    the packed wordlist or ``None`` if no cache file was written. Failing
+    to write a cache file is not an error.
+    """
+    cache_path = get_cache_path(path, transforms)
+    if cache_path is None:
+        return None
+    logger = logging.getLogger("ulif.diceware")
+    try:
+        size, mtime = get_source_id(path)
+        if time.time() - (mtime / 10.0 ** 9) < RACY_INTERVAL:
+            return None
+        cache_dir = os.path.dirname(cache_path)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        fd = tempfile.NamedTemporaryFile(dir=cache_dir, delete=False)
+        try:
+            with fd:
+                pack(words, fd, os.path.abspath(path), size, mtime, signed)
+            getattr(os, "replace", os.rename)(fd.name, cache_path)
+        except BaseException:
+            os.unlink(fd.name)
+            raise
+    except (OSError, IOError) as exc:
+        logger.debug("Could not cache wordlist %s: %s" % (path, exc))
+        return None
+    logger.debug("Cached wordlist %s in %s" % (path, cache_path))
+    return cache_path
@@ -0,0 +1,156 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""parallel -- generate passphrases in several processes.
+
+Generating passphrases is CPU-bound, so one process uses only one core.
+`iter_parallel()` spreads the work over a pool of worker processes.
+
+Each worker creates its own instance of the requested random source
+(and therefore draws its own random numbers) and loads the wordlists
+once, when started. The work is split into chunks of passphrases. The
+parent process hands out chunk numbers and sizes only and gets back
+lists of passphrases. Sources providing a ``seed_chunk(index)`` method
+(like ``seeded``) are reseeded per chunk, so their output does not
+depend on which worker made a chunk.
+
+Wordlist files are packed (see `diceware.packed`) by the parent
+process before workers start, so workers only memory-map the cached
+packed wordlists. Words read from stdin are passed to the workers
+directly.
+
+Interactive random sources (like ``realdice``) are of no use here.
+"""
+import multiprocessing
+from diceware import (
+    generate_passphrases, get_input_paths, get_random_sources,
+    get_word_transforms, load_wordlist, transform_words,
+)
+from diceware.template import compile_template
+
+
+#: Maximum number of passphrases generated in one worker call.
+CHUNK_SIZE = 10000
+
+#: State of worker processes, set by `init_worker()`.
+worker_state = {}
+
+
+def init_worker(options, sources):
+    """Set up a worker process.
+
+    We create the random source requested in `options` and load the
+    wordlists given in `sources`. Each source is either the path of a
+    wordlist file or a list of words. Words are transformed once, as
+    requested in `options`.
+
+    If `options.template` is set, we compile the template, too.
+    """
+    rnd_source = get_random_sources()[options.randomsource]
+    transforms = get_word_transforms(options)
+    plan = None
+    wordlists = []
+    if getattr(options, "template", None):
+        plan = compile_template(options.template, options)
+    for source in sources:
+        if isinstance(source, list):
+            wordlists.append(transform_words(source, transforms))
+        else:
+            wordlists.append(load_wordlist(source, transforms))
+    worker_state.update(
+        options=options, rnd=rnd_source(options), wordlists=wordlists,
+        plan=plan)
+
+
+def generate_chunk(chunk):
+    """Generate passphrases for `chunk` in a worker process.
+
+    `chunk` is a tuple ``(index, count)``: the number of the chunk and
+    the number of passphrases to generate.
+    """
+    index, count = chunk
+    seed_chunk = getattr(worker_state["rnd"], "seed_chunk", None)
+    if seed_chunk is not None:
+        seed_chunk(index)
+    if worker_state.get("plan") is not None:
+        return list(worker_state["plan"].generate_many(
+            worker_state["rnd"], count))
+    return list(generate_passphrases(
+        worker_state["options"], worker_state["rnd"],
+        worker_state["wordlists"], count))
+
+
+def get_chunk_sizes(count, jobs, chunk_size=CHUNK_SIZE):
+    """Split `count` passphrases into chunks for `jobs` workers.
+
+    We make at least four chunks per worker (if `count` allows), so
+    workers that finish early can take over work of slower ones.
+    """
+    size = max(1, min(chunk_size, -(-count // (jobs * 4))))
+    result = [size] * (count // size)
+    if count % size:
+        result.append(count % size)
+    return result
+
+
+def get_sources(options):
+    """Get the wordlist sources to pass to `init_worker()`.
+
+    Wordlist files are loaded (and thereby packed and cached) here
+    once, so workers do not have to parse them again. Words from stdin
+    are turned into a list.
+
+    For templates we compile the template once, which packs the
+    wordlists used, and return no sources.
+    """
+    if getattr(options, "template", None):
+        compile_template(options.template, options)
+        return []
+    sources = []
+    for path in get_input_paths(options):
+        w_list = load_wordlist(path)
+        if path == "-":
+            sources.append(list(w_list))
+        else:
+            w_list.packed()
+            sources.append(path)
+    return sources
+
+
+def iter_parallel(options, count, jobs, ordered=True):
+    """Generate `count` passphrases in `jobs` worker processes.
+
+    Passphrases are made as requested in `options` (see
+    `diceware.get_passphrase()`). If `jobs` is less than one, we start
+    one worker per CPU.
+
+    Passphrases are yielded chunk by chunk. With `ordered` set to
+    ``False``, chunks are yielded as soon as they are ready, instead of
+    in the order they were handed out.
+    """
+    if jobs < 1:
+        jobs = multiprocessing.cpu_count()
+    sources = get_sources(options)
+    pool = multiprocessing.Pool(jobs, init_worker, (options, sources))
+    try:
+        imap = ordered and pool.imap or pool.imap_unordered
+        chunks = enumerate(get_chunk_sizes(count, jobs))
+        for chunk in imap(generate_chunk, chunks):
+            for passphrase in chunk:
+                yield passphrase
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,243 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""plugins -- lazy discovery of random sources.
+
+Random sources are registered as entry points in group
+`ENTRY_POINT_GROUP`. Sources shipped with `diceware` are listed in
+`diceware.__about__.random_sources` in addition, so they are available
+also if `diceware` is not installed, and they cannot be replaced by
+other packages.
+
+Discovering entry points means reading the metadata of all installed
+packages. We therefore keep the found names and specs (like
+``mypkg.sources:MySource``) once per process and in a small JSON file
+in the cache dir (see `diceware.packed.get_cache_dir()`). The cache file
+is valid as long as ``sys.path`` and the package metadata found there
+(``*.dist-info`` and ``*.egg-info``) do not change, which happens when
+packages are installed or removed.
+
+Modules of random sources are imported only when a source is looked up
+(see `RandomSources`), so unused plugins cost nothing.
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover  # Python 2
+    from collections import Mapping
+from diceware.__about__ import version
+from diceware.packed import RACY_INTERVAL, get_cache_dir, get_source_id
+
+#: The entry point group random sources are registered in.
+ENTRY_POINT_GROUP = "diceware_source_of_randomness"
+
+#: Name of the file in cache dir that keeps found entry points.
+PLUGINS_CACHE_NAME = "random_sources.json"
+
+#: Extensions of package metadata dirs, that might declare entry points.
+METADATA_EXTS = (".dist-info", ".egg-info")
+
+
+def iter_entry_points(group):
+    """Get ``(name, spec)`` tuples of all entry points in `group`.
+
+    Entry points are read with `importlib.metadata`. On Python versions
+    without it, we find no entry points.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover  # Python < 3.8
+        return []
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=group)
+    else:  # pragma: no cover  # Python < 3.10
+        entry_points = entry_points.get(group, [])
+    return [(ep.name, ep.value) for ep in entry_points]
+
+
+def get_path_fingerprint():
+    """Get a fingerprint of ``sys.path`` and its age.
+
+    The fingerprint is a hex string computed from the `diceware`
+    version, the running Python, the ``sys.path`` entries and names and
+    modification times of package metadata found there. Entries that
+    are no dirs (zip files for instance) count with their own
+    modification time. The age is the time in seconds since the latest
+    modification of anything fingerprinted.
+    """
+    entries, latest = [], 0
+    for path in sys.path:
+        path = os.path.abspath(path or os.curdir)
+        try:
+            names = [name for name in sorted(os.listdir(path))
+                     if name.endswith(METADATA_EXTS)]
+        except OSError:
+            names = [None]
+        for name in names:
+            try:
+                mtime = get_source_id(
+                    path if name is None else os.path.join(path, name))[1]
+            except OSError:
+                mtime = None
+            else:
+                latest = max(latest, mtime)
+            entries.append([path, name, mtime])
+    data = json.dumps([version, sys.executable, entries])
+    fingerprint = hashlib.sha256(data.encode("utf-8")).hexdigest()
+    return fingerprint, time.time() - latest / 10.0 ** 9
+
+
+def load_spec(spec):
+    """Get the object named by `spec`, like ``mypkg.sources:MySource``.
+
+    Missing modules or objects raise `ImportError`.
+    """
+    module, attr = spec.split(":")
+    module = __import__(module, fromlist=['__name__'], level=0)
+    try:
+        return getattr(module, attr)
+    except AttributeError as exc:
+        raise ImportError(str(exc))
+
+
+class PluginRegistry(object):
+    """Names and specs of random sources registered as entry points.
+
+    Entry points are discovered once per process and cached in a file
+    in cache dir (see `get_cache_path()`). Objects loaded with `load()`
+    are kept, too.
+    """
+    def __init__(self, group=ENTRY_POINT_GROUP):
+        self.group = group
+        self.specs = None
+        self.loaded = {}
+
+    def clear(self):
+        """Forget all discovered entry points and loaded objects.
+        """
+        self.specs = None
+        self.loaded.clear()
+
+    def get_cache_path(self):
+        """Get path of the cache file or ``None``.
+        """
+        cache_dir = get_cache_dir()
+        if cache_dir is None:
+            return None
+        return os.path.join(cache_dir, PLUGINS_CACHE_NAME)
+
+    def read_cache(self, path, fingerprint):
+        """Get specs stored in cache file `path` for `fingerprint`.
+
+        Returns ``None`` if the file is missing, invalid or outdated.
+        """
+        try:
+            with open(path, "r") as fd:
+                data = json.load(fd)
+        except (OSError, IOError, ValueError):
+            return None
+        if not isinstance(data, dict) or (
+                data.get("fingerprint") != fingerprint):
+            return None
+        specs = data.get("specs")
+        if not isinstance(specs, dict):
+            return None
+        return specs
+
+    def write_cache(self, path, fingerprint, specs):
+        """Store `specs` for `fingerprint` in cache file `path`.
+
+        Failing to write the file is not an error.
+        """
+        logger = logging.getLogger("ulif.diceware")
+        try:
+            cache_dir = os.path.dirname(path)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd = tempfile.NamedTemporaryFile(
+                mode="w", dir=cache_dir, delete=False)
+            try:
+                with fd:
+                    json.dump(dict(fingerprint=fingerprint, specs=specs), fd)
+                getattr(os, "replace", os.rename)(fd.name, path)
+            except BaseException:
+                os.unlink(fd.name)
+                raise
+        except (OSError, IOError) as exc:
+            logger.debug("Could not cache random sources: %s" % exc)
+
+    def get_specs(self):
+        """Get a dict of names and specs of all entry points.
+
+        If several entry points share a name, the first one found wins.
+        """
+        if self.specs is not None:
+            return self.specs
+        path = self.get_cache_path()
+        fingerprint, age = get_path_fingerprint()
+        specs = None
+        if path is not None:
+            specs = self.read_cache(path, fingerprint)
+        if specs is None:
+            specs = dict()
+            for name, spec in iter_entry_points(self.group):
+                specs.setdefault(name, spec)
+            if path is not None and age >= RACY_INTERVAL:
+                self.write_cache(path, fingerprint, specs)
+        self.specs = specs
+        return specs
+
+    def load(self, spec):
+        """Get the object named by `spec`, importing it only once.
+        """
+        if spec not in self.loaded:
+            self.loaded[spec] = load_spec(spec)
+        return self.loaded[spec]
+
+
+#: The registry used by `get_random_sources()`.
+registry = PluginRegistry()
+
+
+class RandomSources(Mapping):
+    """A read-only mapping of random source names to random sources.
+
+    `specs` is a dict mapping names to specs like
+    ``mypkg.sources:MySource``. Sources are imported when looked up for
+    the first time. Looking up all values therefore imports all
+    sources.
+    """
+    def __init__(self, specs, registry=registry):
+        self.specs = specs
+        self.registry = registry
+
+    def __getitem__(self, name):
+        return self.registry.load(self.specs[name])
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self):
+        return len(self.specs)
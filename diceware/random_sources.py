@@ -15,7 +15,8 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """Sources of randomness.
 
-Please register all sources as entry point in ``__about__.py``. Look out for
+Please register all sources as entry point in group
+``diceware_source_of_randomness`` (see `diceware.plugins`). Look out for
 "SystemRandomSource" for an example.
 
 For developers of interfaces to other sources of randomness: Currently,
@@ -41,20 +42,33 @@ required, `choice` might also ask users for input or similar. Typically,
 `choice` is called once for each word and once for each special char to
 generate.
 
+Sources can optionally provide batch methods: `choice_many(self,
+sequence, k)` returning a list of `k` items picked out of `sequence`
+(like `k` calls to `choice`) and `sample_indices(self, n, k)` returning
+a list of `k` random ints in range ``[0, n)``. Words of a passphrase,
+special chars and their positions are then picked with one call each.
+For sources lacking these methods `as_batch_source()` provides an
+adapter.
+
+Sources asking users for input (like dice rolls) should set a class
+attribute `interactive` to ``True``. `diceware` then refuses options
+that would make it ask for lots of input, like ``--single-pass``, or
+use the source outside the main process, like ``--jobs``.
+
+Random sources can also make `choice` a coroutine function (``async
+def choice(self, sequence)``). Such sources are awaited by the
+`asyncio` API in `diceware.aio`.
+
 If you want to manage own commandline options with your plugin, you can
 implement a `classmethod` called ``update_argparser(parser)`` which gets
 an `argparse.ArgumentParser` instance  as argument (no pun intended).
 
-Finally, to register the source, add some stanza in `__about__.py`
-that looks like::
+Finally, to register the source, add some stanza in the
+``pyproject.toml`` of your package that looks like::
 
-    # ...
-    random_sources' = {
-         # ...
-        'myrandom': 'mypkg.mymodule:MyRandomSource',
-        'myothersrc': 'mypkg.mymodule:MyOtherSource',
-    }
-    # ...
+    [project.entry-points."diceware_source_of_randomness"]
+    myrandom = "mypkg.mymodule:MyRandomSource"
+    myothersrc = "mypkg.mymodule:MyOtherSource"
 
 Here the `myrandom` and `myothersrc` lines register random sources that
 (if installed) `diceware` will find on startup and offer to users under
@@ -66,10 +80,38 @@ and the random source defined in the given class would be used for
 generating a passphrase.
 
 """
+import binascii
+import hashlib
+import hmac
 import math
+import multiprocessing
+import os
+import struct
 import sys
 import re
-from random import SystemRandom
+import time
+
+
+#: Number of random bytes fetched from the OS at once by `BulkRandom`.
+RANDOM_POOL_SIZE = 4096
+
+#: Default number of random bytes prefetched by `BufferedRandom`.
+RANDOM_BUFFER_SIZE = 64 * 1024
+
+#: Device `BufferedRandom` reads random bytes from, if it exists.
+URANDOM_PATH = "/dev/urandom"
+
+#: Hash functions `XofRandom` can expand keys with.
+XOF_HASHES = ("shake256", "blake2b")
+
+#: Size of `XofRandom` keys in bytes.
+XOF_KEY_SIZE = 32
+
+#: Default number of bytes `XofRandom` delivers before reseeding.
+XOF_RESEED_BYTES = 16 * 1024 * 1024
+
+#: Default number of seconds after which `XofRandom` reseeds.
+XOF_RESEED_INTERVAL = 300
 
 
 input_func = input
@@ -77,10 +119,341 @@ if sys.version[0] < "3":
     input_func = raw_input  # NOQA: F821  # defined in python 2 only.
 
 
+class BulkRandom(object):
+    """Random numbers drawn from large blocks of OS randomness.
+
+    `random.SystemRandom` calls ``os.urandom()`` (and therefore the
+    kernel) for each single number. We fetch `pool_size` bytes at once
+    instead and serve many numbers out of them.
+
+    Numbers below `n` are computed with rejection sampling: we read one
+    byte more than needed to represent ``n - 1``, take the result modulo
+    `n` and reject values from the incomplete last interval. This keeps
+    the numbers unbiased while rejecting less than one draw in 256.
+
+    Pooled bytes are never reused, also not after `fork()`: a process
+    with another PID than the one that filled the pool drops the pool.
+
+    Fresh bytes are taken from `read()`, which subclasses can override
+    to use other sources of random bytes.
+    """
+    def __init__(self, pool_size=RANDOM_POOL_SIZE):
+        self.pool_size = pool_size
+        self.pool = b""
+        self.pos = 0
+        self.pid = os.getpid()
+
+    def getbytes(self, num):
+        """Get `num` random bytes.
+        """
+        if self.pid != os.getpid():
+            self.pool, self.pos, self.pid = b"", 0, os.getpid()
+        if self.pos + num > len(self.pool):
+            self.pool = self.read(max(num, self.pool_size))
+            self.pos = 0
+        result = self.pool[self.pos:self.pos + num]
+        self.pos += num
+        return result
+
+    def read(self, size):
+        """Get `size` fresh random bytes from the OS.
+        """
+        return os.urandom(size)
+
+    def randbelow(self, n):
+        """Get a random int in range ``[0, n)``.
+        """
+        if n < 1:
+            raise ValueError("n must be positive")
+        num_bytes = ((n - 1).bit_length() + 7) // 8 + 1
+        space = 256 ** num_bytes
+        limit = space - space % n
+        while True:
+            num = int(binascii.hexlify(self.getbytes(num_bytes)), 16)
+            if num < limit:
+                return num % n
+
+    def randbelow_many(self, n, count):
+        """Get a list of `count` random ints in range ``[0, n)``.
+
+        Bytes for all numbers are taken from the pool at once. Only
+        rejected numbers are drawn again, one by one.
+        """
+        if n < 1:
+            raise ValueError("n must be positive")
+        num_bytes = ((n - 1).bit_length() + 7) // 8 + 1
+        space = 256 ** num_bytes
+        limit = space - space % n
+        digits = binascii.hexlify(self.getbytes(num_bytes * count))
+        width = 2 * num_bytes
+        result = []
+        for pos in range(0, width * count, width):
+            num = int(digits[pos:pos + width], 16)
+            if num < limit:
+                result.append(num % n)
+            else:
+                result.append(self.randbelow(n))
+        return result
+
+    def choice(self, sequence):
+        """Pick one item out of `sequence`.
+        """
+        if not len(sequence):
+            raise IndexError("Cannot choose from an empty sequence")
+        return sequence[self.randbelow(len(sequence))]
+
+    def choice_many(self, sequence, k):
+        """Pick `k` items out of `sequence`, with all numbers drawn at once.
+        """
+        if k < 1:
+            return []
+        if not len(sequence):
+            raise IndexError("Cannot choose from an empty sequence")
+        return [sequence[x] for x in self.randbelow_many(len(sequence), k)]
+
+
+class BufferedRandom(BulkRandom):
+    """A `BulkRandom` that wipes its buffer.
+
+    Random bytes are read from the kernel into a buffer of `pool_size`
+    bytes. If `URANDOM_PATH` is readable, we read into the buffer in
+    place, otherwise we copy the result of ``os.urandom()``.
+
+    Bytes are overwritten with zeros as soon as they are handed out, so
+    the buffer never keeps bytes already used. Bytes left over when the
+    buffer is refilled are wiped as well. A forked child wipes its copy
+    of the buffer of the parent and fills a new one.
+    """
+    def __init__(self, pool_size=RANDOM_BUFFER_SIZE):
+        BulkRandom.__init__(self, pool_size)
+        self.pool = bytearray()
+
+    def __del__(self):
+        self.wipe()
+
+    def wipe(self):
+        """Overwrite all buffered bytes with zeros and drop them.
+        """
+        self.pool[:] = bytearray(len(self.pool))
+        self.pool = bytearray()
+        self.pos = 0
+
+    def fill(self, size):
+        """Wipe the buffer and fill it with `size` fresh random bytes.
+        """
+        self.wipe()
+        self.pool = bytearray(size)
+        try:
+            with open(URANDOM_PATH, "rb", buffering=0) as fd:
+                view = memoryview(self.pool)
+                pos = 0
+                while pos < size:
+                    num = fd.readinto(view[pos:])
+                    if not num:
+                        raise IOError("%s: no data" % URANDOM_PATH)
+                    pos += num
+        except (IOError, OSError):
+            self.pool[:] = os.urandom(size)
+
+    def getbytes(self, num):
+        """Get `num` random bytes.
+        """
+        if self.pid != os.getpid():
+            self.wipe()
+            self.pid = os.getpid()
+        if self.pos + num > len(self.pool):
+            self.fill(max(num, self.pool_size))
+        end = self.pos + num
+        result = bytes(self.pool[self.pos:end])
+        self.pool[self.pos:end] = bytearray(num)
+        self.pos = end
+        return result
+
+
+class XofRandom(BulkRandom):
+    """Random bytes expanded from a seed with SHAKE-256 or BLAKE2b.
+
+    A user-space CSPRNG built on `hashlib`. Output blocks are computed
+    in counter mode from a 32 byte key: with `xof_hash` ``shake256`` a
+    block is ``SHAKE-256(key || counter)``, with ``blake2b`` it is the
+    concatenation of ``BLAKE2b(counter || index, key=key)`` digests.
+    Counters are 64 bit little endian ints. The first `XOF_KEY_SIZE`
+    bytes of each block replace the key (and are never handed out), so
+    earlier output cannot be recomputed from the current state.
+
+    The key is seeded from ``os.urandom()`` when the first bytes are
+    needed. It is reseeded (the old key hashed together with fresh OS
+    randomness) after `reseed_bytes` bytes or `reseed_interval`
+    seconds, whatever comes first, and always in forked processes.
+
+    If `seed` is given, we start from this seed instead and stay
+    deterministic until the next reseed. This is meant for tests.
+    """
+    def __init__(self, pool_size=RANDOM_BUFFER_SIZE, xof_hash="shake256",
+                 reseed_bytes=XOF_RESEED_BYTES,
+                 reseed_interval=XOF_RESEED_INTERVAL, seed=None):
+        BulkRandom.__init__(self, pool_size)
+        if xof_hash not in XOF_HASHES:
+            raise ValueError("Unknown hash: %s" % xof_hash)
+        if not hasattr(hashlib, "shake_256"):  # pragma: no cover
+            raise RuntimeError("Python 3.6 or newer required")
+        self.xof_hash = xof_hash
+        self.reseed_bytes = reseed_bytes
+        self.reseed_interval = reseed_interval
+        self.key = None
+        if seed is not None:
+            self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """Mix `seed` (or fresh OS randomness) into the key.
+        """
+        if seed is None:
+            seed = os.urandom(XOF_KEY_SIZE)
+        self.key = hashlib.shake_256(
+            b"diceware-xof" + (self.key or b"") + seed).digest(XOF_KEY_SIZE)
+        self.counter = 0
+        self.delivered = 0
+        self.seeded_at = time.time()
+        self.seeded_pid = os.getpid()
+
+    def expand(self, size):
+        """Get `size` bytes of output for the current key and counter.
+        """
+        counter = struct.pack("<Q", self.counter)
+        if self.xof_hash == "shake256":
+            return hashlib.shake_256(self.key + counter).digest(size)
+        blake2b = hashlib.blake2b
+        blocks = [
+            blake2b(counter + struct.pack("<Q", num), key=self.key).digest()
+            for num in range(-(-size // 64))]
+        return b"".join(blocks)[:size]
+
+    def read(self, size):
+        """Get `size` fresh random bytes, reseeding if due.
+        """
+        if self.key is None or (
+                self.seeded_pid != os.getpid() or
+                self.delivered >= self.reseed_bytes or
+                time.time() - self.seeded_at >= self.reseed_interval):
+            self.reseed()
+        block = self.expand(XOF_KEY_SIZE + size)
+        self.key = block[:XOF_KEY_SIZE]
+        self.counter += 1
+        self.delivered += size
+        return block[XOF_KEY_SIZE:]
+
+
+class HmacDrbg(object):
+    """HMAC_DRBG with SHA-256 as described in NIST SP 800-90A.
+
+    The generator is instantiated with `seed` (entropy input, nonce and
+    personalization string in one). We never reseed and support no
+    additional input.
+    """
+    def __init__(self, seed):
+        self.key = b"\x00" * 32
+        self.value = b"\x01" * 32
+        self.update(seed)
+
+    def hmac(self, data):
+        return hmac.new(self.key, data, hashlib.sha256).digest()
+
+    def update(self, provided=b""):
+        """Update the internal state with `provided` data.
+        """
+        self.key = self.hmac(self.value + b"\x00" + provided)
+        self.value = self.hmac(self.value)
+        if provided:
+            self.key = self.hmac(self.value + b"\x01" + provided)
+            self.value = self.hmac(self.value)
+
+    def generate(self, num):
+        """Get `num` pseudo-random bytes.
+        """
+        blocks = []
+        for x_ in range(-(-num // 32)):
+            self.value = self.hmac(self.value)
+            blocks.append(self.value)
+        self.update()
+        return b"".join(blocks)[:num]
+
+
+class SeededRandom(BulkRandom):
+    """A `BulkRandom` drawing its bytes from an `HmacDrbg` seeded with
+    `seed`.
+
+    The same `seed` always gives the same numbers, on all platforms and
+    Python versions. Forked processes mix their PID into the state, so
+    they do not repeat the numbers of their parent.
+    """
+    def __init__(self, seed, pool_size=RANDOM_POOL_SIZE):
+        BulkRandom.__init__(self, pool_size)
+        self.drbg = HmacDrbg(seed)
+        self.drbg_pid = os.getpid()
+
+    def read(self, size):
+        """Get `size` bytes from the DRBG.
+        """
+        if self.drbg_pid != os.getpid():
+            self.drbg_pid = os.getpid()
+            self.drbg.update(struct.pack("<Q", self.drbg_pid))
+        return self.drbg.generate(size)
+
+
+class BatchSourceAdapter(object):
+    """Batch methods for random sources that provide `choice()` only.
+
+    `choice_many()` and `sample_indices()` make use of whatever `rnd`
+    provides: its own batch methods or, as last resort, one `choice()`
+    call per item.
+    """
+    def __init__(self, rnd):
+        self.rnd = rnd
+
+    def choice(self, sequence):
+        """Pick one item out of `sequence`.
+        """
+        return self.rnd.choice(sequence)
+
+    def choice_many(self, sequence, k):
+        """Pick `k` items out of `sequence`.
+        """
+        if hasattr(self.rnd, "choice_many"):
+            return self.rnd.choice_many(sequence, k)
+        if k < 1:
+            return []
+        if hasattr(self.rnd, "sample_indices"):
+            if not len(sequence):
+                raise IndexError("Cannot choose from an empty sequence")
+            return [sequence[x] for x in self.sample_indices(
+                len(sequence), k)]
+        choice = self.rnd.choice
+        return [choice(sequence) for x_ in range(k)]
+
+    def sample_indices(self, n, k):
+        """Get a list of `k` random ints in range ``[0, n)``.
+        """
+        if hasattr(self.rnd, "sample_indices"):
+            return self.rnd.sample_indices(n, k)
+        return self.choice_many(range(n), k)
+
+
+def as_batch_source(rnd):
+    """Get random source `rnd` with batch methods.
+
+    Sources providing `choice_many()` and `sample_indices()` are
+    returned as they are, others are wrapped in a `BatchSourceAdapter`.
+    """
+    if hasattr(rnd, "choice_many") and hasattr(rnd, "sample_indices"):
+        return rnd
+    return BatchSourceAdapter(rnd)
+
+
 class SystemRandomSource(object):
-    """A Random Source utilizing the standard Python `SystemRandom` call.
+    """A Random Source utilizing the randomness of the OS.
 
-    As time of writing, SystemRandom makes use of ``/dev/urandom`` to get
+    Like the standard Python `SystemRandom`, we make use of
+    ``os.urandom()`` (i.e. ``/dev/urandom`` or ``getrandom()``) to get
     fairly useable random numbers.
 
     This source is registered as entry_point in setup.py under the name
@@ -91,10 +464,13 @@ class SystemRandomSource(object):
     random.
 
     The SystemRandomSource is the default source.
+
+    Numbers are drawn with `BulkRandom`, so picking thousands of words
+    costs only a few calls to the OS.
     """
     def __init__(self, options):
         self.options = options
-        self.rnd = SystemRandom()
+        self.rnd = BulkRandom()
 
     def choice(self, sequence):
         """Pick one item out of `sequence`.
@@ -118,21 +494,191 @@ class SystemRandomSource(object):
         """
         return self.rnd.choice(sequence)
 
+    def choice_many(self, sequence, k):
+        """Pick `k` items out of `sequence`.
+
+        Numbers for all items are drawn at once. Random sources without
+        this method are asked via `choice()`, one item at a time (see
+        `as_batch_source()`).
+        """
+        return self.rnd.choice_many(sequence, k)
+
+    def sample_indices(self, n, k):
+        """Get a list of `k` random ints in range ``[0, n)``.
+
+        All numbers are drawn at once.
+        """
+        return self.rnd.randbelow_many(n, k)
+
+
+def add_buffer_size_argument(group):
+    """Add ``--random-buffer-size`` to argparser `group`.
+
+    Used by random sources working with `BulkRandom` pools. As several
+    of them might add it to the same parser, we skip the option if the
+    parser has it already.
+    """
+    if '--random-buffer-size' in group._option_string_actions:
+        return
+    group.add_argument(
+        '--random-buffer-size', default=RANDOM_BUFFER_SIZE, type=int,
+        metavar="BYTES",
+        help=(
+            "Number of random bytes to prefetch at once. "
+            "Default: %s" % RANDOM_BUFFER_SIZE))
+
+
+class BufferedSystemRandomSource(SystemRandomSource):
+    """A system random source with a larger, wiped buffer.
+
+    Works like `SystemRandomSource`, but random bytes are prefetched in
+    blocks of ``--random-buffer-size`` bytes (`RANDOM_BUFFER_SIZE` by
+    default) and wiped once used (see `BufferedRandom`).
+
+    This source is registered as ``buffered``.
+    """
+    def __init__(self, options):
+        self.options = options
+        self.rnd = BufferedRandom(
+            getattr(options, "random_buffer_size", RANDOM_BUFFER_SIZE))
+
+    @classmethod
+    def update_argparser(cls, parser):
+        """Add ``--random-buffer-size`` to `parser`.
+        """
+        group = parser.add_argument_group(
+            "Arguments related to `buffered' randomsource")
+        add_buffer_size_argument(group)
+        return parser
+
+
+class XofRandomSource(SystemRandomSource):
+    """A fast source of random numbers computed with SHAKE-256/BLAKE2b.
+
+    Works like `SystemRandomSource`, but random bytes are expanded from
+    a seed out of ``os.urandom()`` with a hash function (see
+    `XofRandom`). The kernel is asked only for seeds, so generating
+    large batches of passphrases needs hardly any system calls.
+
+    This source is registered as ``xof``. Requires Python >= 3.6.
+    """
+    def __init__(self, options):
+        self.options = options
+        self.rnd = XofRandom(
+            getattr(options, "random_buffer_size", RANDOM_BUFFER_SIZE),
+            getattr(options, "xof_hash", "shake256"),
+            getattr(options, "reseed_bytes", XOF_RESEED_BYTES),
+            getattr(options, "reseed_interval", XOF_RESEED_INTERVAL))
+
+    @classmethod
+    def update_argparser(cls, parser):
+        """Add options for hash function and reseeding to `parser`.
+        """
+        group = parser.add_argument_group(
+            "Arguments related to `xof' randomsource")
+        group.add_argument(
+            '--xof-hash', default="shake256", choices=XOF_HASHES,
+            metavar="NAME",
+            help=(
+                "Hash function to expand random seeds with: `%s'. "
+                "Default: shake256" % "', `".join(XOF_HASHES)))
+        group.add_argument(
+            '--reseed-bytes', default=XOF_RESEED_BYTES, type=int,
+            metavar="BYTES",
+            help=(
+                "Reseed from OS randomness after BYTES random bytes. "
+                "Default: %s" % XOF_RESEED_BYTES))
+        group.add_argument(
+            '--reseed-interval', default=XOF_RESEED_INTERVAL, type=int,
+            metavar="SECONDS",
+            help=(
+                "Reseed from OS randomness after SECONDS seconds. "
+                "Default: %s" % XOF_RESEED_INTERVAL))
+        add_buffer_size_argument(group)
+        return parser
+
+
+class SeededRandomSource(object):
+    """A deterministic source of pseudo-random numbers.
+
+    NOT FOR REAL PASSPHRASES! Anybody knowing the seed can compute all
+    passphrases made with this source.
+
+    Numbers are computed by an `HmacDrbg` seeded with ``--seed``, so
+    the same options give the same passphrases, on all machines and
+    Python versions. This is meant for benchmarks and tests only. We
+    never use `diceware.numpy_engine` with this source, as it draws
+    numbers differently. With ``--jobs``, each chunk of passphrases is
+    made from its own seed (see `seed_chunk()`), so parallel runs are
+    reproducible as well.
+
+    This source is registered as ``seeded``.
+    """
+    def __init__(self, options):
+        self.options = options
+        self.seed = (getattr(options, "seed", None) or "").encode("utf-8")
+        if multiprocessing.current_process().name == "MainProcess":
+            sys.stderr.write(
+                "Warning: the `seeded' random source is predictable. "
+                "Never use its passphrases!\n")
+        self.rnd = SeededRandom(self.seed)
+
+    def seed_chunk(self, index):
+        """Reseed for chunk number `index` of a parallel run.
+
+        Called by `diceware.parallel` before each chunk. The chunk index
+        is mixed into the seed, so chunks do not repeat each other and
+        do not depend on the worker process making them.
+        """
+        self.rnd = SeededRandom(self.seed + struct.pack("<Q", index))
+
+    def choice(self, sequence):
+        """Pick one item out of `sequence`.
+        """
+        return self.rnd.choice(sequence)
+
+    def choice_many(self, sequence, k):
+        """Pick `k` items out of `sequence`.
+        """
+        return self.rnd.choice_many(sequence, k)
+
+    def sample_indices(self, n, k):
+        """Get a list of `k` random ints in range ``[0, n)``.
+        """
+        return self.rnd.randbelow_many(n, k)
+
+    @classmethod
+    def update_argparser(cls, parser):
+        """Add ``--seed`` to `parser`.
+        """
+        group = parser.add_argument_group(
+            "Arguments related to `seeded' randomsource")
+        group.add_argument(
+            '--seed', default="", metavar="SEED",
+            help=(
+                "Seed for reproducible, NOT SECRET passphrases. "
+                "Default: empty"))
+        return parser
+
 
 class RealDiceRandomSource(object):
     """A source of randomness working with real dice.
     """
+    #: Users are asked for dice rolls.
+    interactive = True
+
     def __init__(self, options):
         self.options = options
         self.dice_sides = 6
         if options is not None:
             self.dice_sides = getattr(options, 'dice_sides', 6)
 
-    def pre_check(self, num_rolls, sequence):
-        """Checks performed before picking an item of a sequence.
+    def pre_check(self, num_rolls, sequence, picks=1):
+        """Checks performed before picking items of a sequence.
 
-        We make sure that `num_rolls`, the number of rolls, is in an
-        acceptable range and issue an hint about the procedure.
+        We make sure that `num_rolls`, the number of rolls per item, is
+        in an acceptable range and issue an hint about the procedure.
+        `picks` is the number of items picked at once.
         """
         if num_rolls == 0:
             raise ValueError
@@ -145,7 +691,7 @@ class RealDiceRandomSource(object):
             )
         print(
             "Please roll %s dice (or a single dice %s times)." % (
-                num_rolls, num_rolls))
+                num_rolls * picks, num_rolls * picks))
         return
 
     def get_num_rolls(self, seq_len):
@@ -161,21 +707,37 @@ class RealDiceRandomSource(object):
     def choice(self, sequence):
         """Pick one item out of `sequence`.
         """
+        return self.choice_many(sequence, 1)[0]
+
+    def choice_many(self, sequence, k):
+        """Pick `k` items out of `sequence`.
+
+        Users are asked for the rolls of all items at once. Rolls giving
+        values out of range are repeated, again all at once.
+        """
+        if k < 1:
+            return []
         if len(sequence) == 1:
-            return sequence[0]  # no need to roll dice.
+            return [sequence[0]] * k  # no need to roll dice.
         num_rolls = self.get_num_rolls(len(sequence))
-        self.pre_check(num_rolls, sequence)
-        repeat = True
-        while repeat:
-            result = 0
-
-            for i, rolled in self.__get_rolls(num_rolls):
-                result += ((self.dice_sides ** (i - 1)) * (int(rolled) - 1))
-            if result < len(sequence):
-                repeat = False
-            else:
-                print("Value out of range. Please roll dice again.")
-        return sequence[result]
+        self.pre_check(num_rolls, sequence, k)
+        result = []
+        while True:
+            rolls = self.__get_rolls(num_rolls * (k - len(result)))
+            for pos in range(0, len(rolls), num_rolls):
+                index = 0
+                for i, rolled in rolls[pos:pos + num_rolls]:
+                    index = index * self.dice_sides + int(rolled) - 1
+                if index < len(sequence):
+                    result.append(sequence[index])
+            if len(result) == k:
+                return result
+            print("Value out of range. Please roll dice again.")
+
+    def sample_indices(self, n, k):
+        """Get a list of `k` random ints in range ``[0, n)``.
+        """
+        return self.choice_many(range(n), k)
 
     def __get_rolls(self, num_rolls):
         """Ask the user for all dice results at once
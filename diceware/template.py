@@ -0,0 +1,183 @@
+#  diceware -- passphrases to remember
+#  Copyright (C) 2015-2026  Uli Fouquet and contributors.
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""template -- passphrases made after templates.
+
+A template like ``{en_adjectives}{en_nouns}{digit:2}{special}`` tells
+how passphrases are built. Each slot in curly braces is replaced by
+random picks: ``{NAME}`` by a word of the wordlist called `NAME`,
+``{digit}`` by a digit and ``{special}`` by a special char. With
+``{NAME:N}`` we pick `N` times. Any other text is kept as it is,
+``{{`` and ``}}`` give literal braces.
+
+Templates are compiled once into a `TemplatePlan`, which holds the
+loaded wordlists, the order of random draws and the entropy of each
+slot. Generating passphrases then means drawing and formatting only.
+"""
+import math
+import re
+from collections import namedtuple
+from diceware import (
+    SPECIAL_CHARS, get_word_transforms, numpy_engine, use_numpy_engine,
+)
+from diceware.random_sources import as_batch_source
+from diceware.wordlist import get_wordlist_path, load_wordlist
+
+
+#: Slot names standing for chars instead of words, and their chars.
+CHAR_SLOTS = {
+    "digit": "0123456789",
+    "special": SPECIAL_CHARS,
+}
+
+#: Tokens of templates: escaped braces, slots and single braces.
+RE_TEMPLATE_TOKEN = re.compile(r"(\{\{|\}\}|\{[^{}]*\}|[{}])")
+
+#: A valid slot, like ``{en_eff}`` or ``{digit:4}``.
+RE_TEMPLATE_SLOT = re.compile(r"^\{([\w-]+)(?::([0-9]+))?\}$")
+
+#: A slot of a template: `name` of wordlist or char slot and number of
+#: picks.
+TemplateSlot = namedtuple("TemplateSlot", ["name", "count"])
+
+
+def parse_template(template, wordlist_names=None):
+    """Parse `template` into a list of literal strings and slots.
+
+    Slots are returned as `TemplateSlot`. If `wordlist_names` is given,
+    slot names must be a wordlist name or a key of `CHAR_SLOTS`.
+    Invalid templates raise `ValueError`::
+
+      >>> parse_template("{digit:2}-{{")
+      [TemplateSlot(name='digit', count=2), '-{']
+    """
+    result = []
+    for token in RE_TEMPLATE_TOKEN.split(template):
+        if token in ("{{", "}}"):
+            token = token[0]
+        elif token in ("{", "}"):
+            raise ValueError("Unbalanced brace in template: %s" % template)
+        elif token.startswith("{"):
+            match = RE_TEMPLATE_SLOT.match(token)
+            if match is None:
+                raise ValueError("Invalid template slot: %s" % token)
+            name, count = match.group(1), int(match.group(2) or 1)
+            if count < 1:
+                raise ValueError("Invalid template slot: %s" % token)
+            if wordlist_names is not None and name not in CHAR_SLOTS and (
+                    name not in wordlist_names):
+                raise ValueError("Unknown template slot: %s" % token)
+            result.append(TemplateSlot(name, count))
+            continue
+        if not token:
+            continue
+        if result and not isinstance(result[-1], TemplateSlot):
+            token = result.pop() + token
+        result.append(token)
+    return result
+
+
+class TemplatePlan(object):
+    """An execution plan for passphrases made after a template.
+
+    `schedule` is a list holding the sequence to pick from for each
+    random draw, in order of draws. `fmt` is a format string with one
+    ``%s`` per draw. `slot_entropies` is a list of ``(slot, bits)``
+    tuples, telling the entropy of each slot.
+
+    Consecutive draws from the same sequence are kept in `runs`, a list
+    of ``(sequence, count)`` tuples. They are picked with one
+    `choice_many()` call each.
+    """
+    def __init__(self, schedule, fmt, slot_entropies):
+        self.schedule = schedule
+        self.fmt = fmt
+        self.slot_entropies = slot_entropies
+        self.runs = []
+        for sequence in schedule:
+            if self.runs and self.runs[-1][0] is sequence:
+                self.runs[-1][1] += 1
+            else:
+                self.runs.append([sequence, 1])
+        self.runs = [tuple(run) for run in self.runs]
+
+    @property
+    def entropy(self):
+        """Entropy of passphrases made after this plan, in bits.
+        """
+        return sum([bits for slot, bits in self.slot_entropies])
+
+    def format(self, picks):
+        """Make a passphrase out of `picks`, one for each draw.
+        """
+        return self.fmt % tuple(picks)
+
+    def generate(self, rnd):
+        """Make a passphrase with picks from random source `rnd`.
+
+        Sources without batch methods are adapted (see
+        `diceware.random_sources.as_batch_source()`).
+        """
+        rnd = as_batch_source(rnd)
+        picks = []
+        for sequence, count in self.runs:
+            picks.extend(rnd.choice_many(sequence, count))
+        return self.fmt % tuple(picks)
+
+    def generate_many(self, rnd, count):
+        """Generate `count` passphrases with picks from `rnd`.
+
+        Large batches are generated by `diceware.numpy_engine`, if
+        possible (see `diceware.use_numpy_engine()`).
+        """
+        if use_numpy_engine(rnd, self.schedule, count):
+            for passphrase in numpy_engine.iter_scheduled(
+                    self.schedule, self.fmt, count, rnd.rnd.getbytes):
+                yield passphrase
+            return
+        for num in range(count):
+            yield self.generate(rnd)
+
+
+def compile_template(template, options):
+    """Compile `template` into a `TemplatePlan`.
+
+    Wordlists are loaded and their words transformed as requested by
+    `options` (see `diceware.get_word_transforms()`). Chars of char
+    slots are never transformed. Unknown slots, empty wordlists and
+    templates without any slot raise `ValueError`.
+    """
+    transforms = get_word_transforms(options)
+    sequences = dict(CHAR_SLOTS)
+    schedule, pieces, slot_entropies = [], [], []
+    for item in parse_template(template):
+        if not isinstance(item, TemplateSlot):
+            pieces.append(item.replace("%", "%%"))
+            continue
+        if item.name not in sequences:
+            path = get_wordlist_path(item.name)
+            if path is None:
+                raise ValueError("Unknown template slot: %s" % item.name)
+            sequences[item.name] = load_wordlist(path, transforms)
+        sequence = sequences[item.name]
+        if not len(sequence):
+            raise ValueError("Empty wordlist: %s" % item.name)
+        schedule.extend([sequence] * item.count)
+        pieces.append("%s" * item.count)
+        slot_entropies.append(
+            (item, item.count * math.log(len(sequence), 2)))
+    if not schedule:
+        raise ValueError("Template without slots: %s" % template)
+    return TemplatePlan(schedule, "".join(pieces), slot_entropies)
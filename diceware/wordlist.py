@@ -15,10 +15,36 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """wordlist.py -- special handling of wordlists.
 """
+import bz2
+import gzip
+import io
+import itertools
+import logging
 import os
 import re
+import shutil
+import stat
 import sys
 import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, namedtuple
+try:
+    import lzma
+except ImportError:  # pragma: no cover  # Python 2
+    lzma = None
+try:
+    from compression import zstd  # Python >= 3.14
+except ImportError:  # pragma: no cover
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+from diceware.packed import (
+    PACKED_EXT, RACY_INTERVAL, PackedWordList, get_source_id, open_cached,
+    pack, store_cached,
+)
 
 #: Maximum in-memory file size in bytes (20 MB).
 #:
@@ -27,6 +53,9 @@ import tempfile
 #: disk.
 MAX_IN_MEM_SIZE = 20 * 1024 * 1024
 
+#: Number of chars read at once when copying input streams.
+COPY_CHUNK_SIZE = 64 * 1024
+
 #: A regular expression matching allowed wordlist names. We
 #: allow names that cannot easily mess up filesystems.
 RE_WORDLIST_NAME = re.compile(r'^[\w-]+$')
@@ -34,10 +63,55 @@ RE_WORDLIST_NAME = re.compile(r'^[\w-]+$')
 #: A regular expression matching numbered entries in wordlists.
 RE_NUMBERED_WORDLIST_ENTRY = re.compile(r'^[0-9]+(\-[0-9]+)*\s+([^\s]+)$')
 
+#: Header line of signed wordlists.
+SIGNED_HEADER = "-----BEGIN PGP SIGNED MESSAGE-----"
+
+#: Line starting the signature in signed wordlists.
+SIGNATURE_START = "-----BEGIN PGP SIGNATURE-----"
+
+#: Wordlist formats as detected by `parse_wordlist()`.
+FORMAT_PLAIN = "plain"
+FORMAT_NUMBERED = "numbered"
+
+#: Approximate number of chars `parse_wordlist()` reads and refines at once.
+PARSE_CHUNK_SIZE = 1024 * 1024
+
+#: ASCII digits. Entries not starting with one of them cannot be numbered.
+DIGITS = "0123456789"
+
 #: A regular expression describing valid wordlist file names.
+#:
+#: Compressed wordlists like ``wordlist_foo.txt.gz`` match as well.
 RE_VALID_WORDLIST_FILENAME = re.compile(
     r'^wordlist_([\w-]+)\.[\w][\w\.]+[\w]+$')
 
+#: Openers of compressed wordlist files by filename extension.
+#:
+#: Each opener takes a path and returns a seekable binary file object,
+#: that decompresses while being read. ``.xz`` requires `lzma` (not
+#: available in Python 2), ``.zst`` requires Python >= 3.14 or the
+#: `backports.zstd` package.
+COMPRESSED_OPENERS = {
+    ".gz": gzip.GzipFile,
+    ".bz2": bz2.BZ2File,
+}
+if lzma is not None:
+    COMPRESSED_OPENERS[".xz"] = lzma.LZMAFile
+if zstd is not None:  # pragma: no cover
+    COMPRESSED_OPENERS[".zst"] = zstd.ZstdFile
+
+
+def open_wordlist_file(path):
+    """Open wordlist file `path` for reading text.
+
+    Files with an extension from `COMPRESSED_OPENERS` are decompressed
+    on the fly. No decompressed copy is written anywhere.
+    """
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(str(path))[1])
+    if opener is None:
+        return open(path, "r")
+    return io.TextIOWrapper(opener(str(path)))
+
 
 def get_wordlist_dirs():
     """Get the directories in which wordlists can be stored.
@@ -77,23 +151,155 @@ def get_wordlists_dir():
         os.path.join(os.path.dirname(__file__), 'wordlists'))
 
 
-def get_wordlist_names():
-    """Get a all names of wordlists stored locally.
+#: Infos about a wordlist file found in a wordlist dir.
+WordlistEntry = namedtuple(
+    "WordlistEntry", ["name", "path", "size", "mtime"])
+
+
+class WordlistRegistry(object):
+    """A registry of wordlists stored in wordlist dirs.
+
+    The registry scans wordlist dirs for wordlist files once and keeps
+    the found entries (as `WordlistEntry`) per directory. Later lookups
+    only `stat()` each directory and re-scan a directory only if its
+    modification time changed. Directories modified less than
+    `RACY_INTERVAL` seconds before a scan are scanned again on next
+    lookup, as their timestamps might not reflect all changes yet.
+
+    The dirs looked up are determined by `get_wordlist_dirs()` on each
+    lookup.
     """
-    result = []
-    # wordlists_dir = get_wordlists_dir()
-    for wordlists_dir in get_wordlist_dirs():
-        if not os.path.isdir(wordlists_dir):
-            continue
-        filenames = os.listdir(wordlists_dir)
-        for filename in filenames:
-            if not os.path.isfile(os.path.join(wordlists_dir, filename)):
-                continue
+    def __init__(self):
+        self.dirs = dict()
+
+    def clear(self):
+        """Forget about all dirs scanned so far.
+        """
+        self.dirs.clear()
+
+    def scan_dir(self, wordlists_dir):
+        """Get list of `WordlistEntry` for all wordlists in `wordlists_dir`.
+
+        Entries are returned in directory order.
+        """
+        result = []
+        for filename in os.listdir(wordlists_dir):
             match = RE_VALID_WORDLIST_FILENAME.match(filename)
             if not match:
                 continue
-            result.append(match.groups()[0])
-    return sorted(result)
+            path = os.path.join(wordlists_dir, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            result.append(
+                WordlistEntry(match.groups()[0], path, st.st_size,
+                              st.st_mtime))
+        return result
+
+    def get_dir_entries(self, wordlists_dir):
+        """Get list of `WordlistEntry` for wordlists in `wordlists_dir`.
+
+        Uses cached results if `wordlists_dir` did not change since
+        last scan.
+        """
+        try:
+            st = os.stat(wordlists_dir)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISDIR(st.st_mode):
+            self.dirs.pop(wordlists_dir, None)
+            return []
+        cached = self.dirs.get(wordlists_dir)
+        if cached is not None and cached[0] == st.st_mtime:
+            return cached[1]
+        entries = self.scan_dir(wordlists_dir)
+        if time.time() - st.st_mtime >= RACY_INTERVAL:
+            self.dirs[wordlists_dir] = (st.st_mtime, entries)
+        else:
+            self.dirs.pop(wordlists_dir, None)
+        return entries
+
+    def get_entries(self):
+        """Get list of `WordlistEntry` for wordlists in all wordlist dirs.
+
+        Entries are ordered by wordlist dir.
+        """
+        result = []
+        for wordlists_dir in get_wordlist_dirs():
+            result.extend(self.get_dir_entries(wordlists_dir))
+        return result
+
+    def get_names(self):
+        """Get sorted list of all wordlist names.
+
+        Each name is listed once, even if several files provide it.
+        """
+        return sorted(set([entry.name for entry in self.get_entries()]))
+
+    def get_entry(self, name):
+        """Get `WordlistEntry` of first wordlist named `name` or ``None``.
+
+        Dirs are looked up in order. If a dir contains several files for
+        `name`, we prefer a packed wordlist (extension `PACKED_EXT`),
+        unless its source file changed since it was compiled (see
+        `get_changed_source()`). Then we log a warning and return the
+        entry of the source file.
+        """
+        for wordlists_dir in get_wordlist_dirs():
+            found = [entry for entry in self.get_dir_entries(wordlists_dir)
+                     if entry.name == name]
+            for entry in found:
+                if not entry.path.endswith(PACKED_EXT):
+                    continue
+                source = self.get_changed_source(entry, found)
+                if source is None:
+                    return entry
+                logging.getLogger("ulif.diceware").warning(
+                    "Packed wordlist %s is outdated, using %s. Please "
+                    "compile it again." % (entry.path, source.path))
+                return source
+            if found:
+                return found[0]
+        return None
+
+    def get_changed_source(self, entry, entries):
+        """Get the entry of the source file of packed wordlist `entry`, if
+        the source changed.
+
+        Packed wordlists made by `compile_wordlist()` store filename,
+        size and modification time of their source. If a file of that
+        name is in `entries` and its size or modification time differs,
+        we return its entry. Otherwise (also for packed wordlists we
+        cannot read) we return ``None``.
+        """
+        try:
+            with open(entry.path, "rb") as fd:
+                header = PackedWordList(fd).header
+        except (OSError, IOError, ValueError):
+            return None
+        for source in entries:
+            if os.path.basename(source.path) != header.source_path:
+                continue
+            try:
+                source_id = get_source_id(source.path)
+            except OSError:
+                return None
+            if source_id != (header.source_size, header.source_mtime):
+                return source
+        return None
+
+
+#: The registry used by `get_wordlist_names()` and `get_wordlist_path()`.
+registry = WordlistRegistry()
+
+
+def get_wordlist_names():
+    """Get a all names of wordlists stored locally.
+    """
+    return registry.get_names()
 
 
 def get_wordlist_path(name):
@@ -108,15 +314,169 @@ def get_wordlist_path(name):
     """
     if not RE_WORDLIST_NAME.match(name):
         raise ValueError("Not a valid wordlist name: %s" % name)
-    for wordlists_dir in get_wordlist_dirs():
-        if not os.path.isdir(wordlists_dir):
+    entry = registry.get_entry(name)
+    if entry is not None:
+        return entry.path
+
+
+def refine_numbered(entry):
+    """Extract the term from `entry` if it is preceded by numbers.
+
+    `entry` must be stripped already. Works like matching
+    `RE_NUMBERED_WORDLIST_ENTRY`, but handles the common case (only
+    digits before the term) without regular expressions.
+    """
+    parts = entry.split()
+    if len(parts) == 2 and not parts[0].strip(DIGITS):
+        return parts[1]
+    match = RE_NUMBERED_WORDLIST_ENTRY.match(entry)
+    if match:
+        return match.groups()[1]
+    return entry
+
+
+def detect_format(entry):
+    """Detect the format of a wordlist from its first `entry`.
+
+    Returns `FORMAT_NUMBERED` if entry looks like ``11111 abacus`` and
+    `FORMAT_PLAIN` otherwise.
+    """
+    if RE_NUMBERED_WORDLIST_ENTRY.match(entry):
+        return FORMAT_NUMBERED
+    return FORMAT_PLAIN
+
+
+def refine_entries(entries, wordlist_format):
+    """Refine stripped, non-empty `entries` of a wordlist.
+
+    Returns a list of terms. With `wordlist_format` we choose the fast
+    path for each `entry`: In numbered wordlists each entry is
+    refined. In plain wordlists only entries starting with a digit are
+    looked at more closely.
+    """
+    if wordlist_format == FORMAT_NUMBERED:
+        return [
+            parts[1] if len(parts) == 2 and not parts[0].strip(DIGITS)
+            else refine_numbered(entry)
+            for parts, entry in zip(map(str.split, entries), entries)]
+    return [
+        refine_numbered(entry) if entry[0] in DIGITS else entry
+        for entry in entries]
+
+
+def iter_entry_chunks(fd, signed=None):
+    """Get chunks of (stripped, non-empty) entries from wordlist `fd`.
+
+    If `signed` is ``None``, we check the first line for a signed
+    wordlist header. For signed wordlists, the signature header is
+    skipped, dash-escapes removed and we stop at the signature.
+    """
+    lines = []
+    if signed is None:
+        lines = [fd.readline()]
+        signed = lines[0].rstrip() == SIGNED_HEADER
+    if signed:
+        lines = []
+        while fd.readline().strip():
+            # wait for first empty line
+            pass
+    while True:
+        lines.extend(fd.readlines(PARSE_CHUNK_SIZE))
+        if not lines:
+            return
+        if signed:
+            entries = [
+                (line[2:] if line.startswith("- ") else line).strip()
+                for line in lines]
+            if SIGNATURE_START in entries:
+                yield list(filter(
+                    None, entries[:entries.index(SIGNATURE_START)]))
+                return
+        else:
+            entries = [line.strip() for line in lines]
+        lines = []
+        yield list(filter(None, entries))
+
+
+def parse_wordlist(fd, signed=None):
+    """Get the terms of wordlist file `fd` as iterator.
+
+    The file is read in chunks of about `PARSE_CHUNK_SIZE` chars. Each
+    chunk is refined at once. Whether the wordlist is numbered (like
+    ``11111 abacus``) is detected once from the first entry and the
+    respective fast path of `refine_entries()` used for all chunks.
+
+    The results are the same as from refining each line with
+    `WordList.refine_entry()`. See `iter_entry_chunks()` for the meaning
+    of `signed`.
+    """
+    return itertools.chain.from_iterable(_iter_term_chunks(fd, signed))
+
+
+def _iter_term_chunks(fd, signed):
+    """Get chunks of refined terms from wordlist `fd`.
+    """
+    wordlist_format = None
+    for entries in iter_entry_chunks(fd, signed):
+        if not entries:
             continue
-        for filename in os.listdir(wordlists_dir):
-            if not os.path.isfile(os.path.join(wordlists_dir, filename)):
-                continue
-            match = RE_VALID_WORDLIST_FILENAME.match(filename)
-            if match and match.groups()[0] == name:
-                return os.path.join(wordlists_dir, filename)
+        if wordlist_format is None:
+            wordlist_format = detect_format(entries[0])
+        yield refine_entries(entries, wordlist_format)
+
+
+#: Chars without decomposition and their replacement in `ascii_fold()`.
+ASCII_FOLD_EXTRA = {
+    u"\u00df": u"ss", u"\u00e6": u"ae", u"\u00c6": u"AE", u"\u00f8": u"o",
+    u"\u00d8": u"O", u"\u0153": u"oe", u"\u0152": u"OE", u"\u0142": u"l",
+    u"\u0141": u"L", u"\u00f0": u"d", u"\u00d0": u"D", u"\u00fe": u"th",
+    u"\u00de": u"TH", u"\u0111": u"d", u"\u0110": u"D",
+}
+
+
+def ascii_fold(word):
+    """Replace letters with diacritics in `word` by plain ASCII letters.
+
+    Diacritics are removed and some special letters (see
+    `ASCII_FOLD_EXTRA`) replaced. Other chars are kept::
+
+      >>> print(ascii_fold(u"Cr\u00e8me-Br\u00fbl\u00e9e Stra\u00dfe"))
+      Creme-Brulee Strasse
+    """
+    decomposed = unicodedata.normalize("NFKD", word)
+    result = u"".join([
+        ASCII_FOLD_EXTRA.get(char, char) for char in decomposed
+        if not unicodedata.combining(char)])
+    return unicodedata.normalize("NFC", result)
+
+
+#: Transforms that can be applied to all words of a wordlist.
+WORD_TRANSFORMS = OrderedDict([
+    ("capitalize", lambda word: word.capitalize()),
+    ("upper", lambda word: word.upper()),
+    ("lower", lambda word: word.lower()),
+    ("ascii", ascii_fold),
+])
+
+
+def iter_transformed(words, names):
+    """Iterate over `words` with transforms `names` applied.
+
+    `names` are keys of `WORD_TRANSFORMS`, applied in given order.
+    """
+    funcs = [WORD_TRANSFORMS[name] for name in names]
+    for word in words:
+        for func in funcs:
+            word = func(word)
+        yield word
+
+
+def transform_words(words, names):
+    """Get a list of all `words` with transforms `names` applied.
+
+    `names` are keys of `WORD_TRANSFORMS`, applied in given order.
+    """
+    return list(iter_transformed(words, names))
 
 
 class WordList(object):
@@ -127,7 +487,8 @@ class WordList(object):
 
     In case input comes from stdin, we write the input stream into a file if
     the content length is larger than `MAX_IN_MEM_SIZE`. Otherwise, the
-    wordlist is kept in memory.
+    wordlist is kept in memory. The input stream is copied in chunks of
+    `COPY_CHUNK_SIZE` chars, so it is never held in memory as a whole.
 
     Wordlist files are expected to contain words, one word per line. Empty
     lines are ignored, also whitespaces before or trailing a line are
@@ -144,47 +505,143 @@ class WordList(object):
     WordList are generators. That means, that you can retrieve the words of a
     wordlist by iterating over an instance of `WordList`.
 
+    WordLists are also sequences: they support `len()` and lookup of words
+    by index. Iteration, `len()` and lookups are all served by the
+    `PackedWordList` returned by `packed()`, which is built on first use.
+    Therefore a `WordList` can be passed to random sources directly,
+    without turning it into a list.
+
+    Words of regular wordlist files are cached in packed form (see
+    `diceware.packed`) when `packed()` is called. If a valid cached
+    version exists, we load the words from there and do not open `path`
+    at all. In that case `fd` is ``None``. `path` can also be a packed
+    wordlist itself (with filename extension `PACKED_EXT`), as created by
+    `compile_wordlist()`.
+
+    Compressed wordlist files (see `COMPRESSED_OPENERS`) are decompressed
+    while being read. As their words are cached as well, later loads do
+    not decompress anything.
+
+    Words with transforms applied (like capitalized words) are available
+    from `transformed()`.
+
     """
     def __init__(self, path):
         self.path = path
         self.fd = None
+        self._packed = None
+        self._transformed = {}
         if self.path == "-":
             self.fd = tempfile.SpooledTemporaryFile(
                     max_size=MAX_IN_MEM_SIZE, mode="w+")
-            self.fd.write(sys.stdin.read())
+            shutil.copyfileobj(sys.stdin, self.fd, COPY_CHUNK_SIZE)
             self.fd.seek(0)
+        elif str(self.path).endswith(PACKED_EXT):
+            with open(self.path, "rb") as fd:
+                self._packed = PackedWordList(fd)
+            self.signed = self._packed.header.signed
+            return
         else:
-            self.fd = open(self.path, "r")
+            self._packed = open_cached(self.path)
+            if self._packed is not None:
+                self.signed = self._packed.header.signed
+                return
+            self.fd = open_wordlist_file(self.path)
         self.signed = self.is_signed()
 
     def __del__(self):
         if self.path != "-" and self.fd is not None:
             self.fd.close()
 
+    def __len__(self):
+        return len(self.packed())
+
+    def __getitem__(self, index):
+        return self.packed()[index]
+
     def __iter__(self):
+        return iter(self.packed())
+
+    def _iter_fd(self):
+        """Iterate over entries of `fd`.
+        """
         self.fd.seek(0)
-        if self.signed:
-            while self.fd.readline().strip():
-                # wait for first empty line
-                pass
-        for line in self.fd:
-            line = self.refine_entry(line)
-            if not line:
-                continue
-            elif self.signed and line == '-----BEGIN PGP SIGNATURE-----':
-                break
-            yield line
+        return parse_wordlist(self.fd, self.signed)
+
+    def packed(self):
+        """Get the words of this wordlist as `PackedWordList`.
+
+        The returned sequence is memory-mapped from a packed wordlist
+        file, so words are read only when looked up.
+
+        For regular wordlist files we write a packed version into the
+        cache dir. If that is not possible (and for wordlists read from
+        stdin) we pack the words into an anonymous temporary file.
+
+        Words are packed only once per `WordList` instance.
+        """
+        if self._packed is not None:
+            return self._packed
+        if self.path != "-":
+            if store_cached(self.path, self._iter_fd(), self.signed):
+                self._packed = open_cached(self.path)
+        if self._packed is None:
+            fd = tempfile.TemporaryFile()
+            pack(self._iter_fd(), fd, signed=self.signed)
+            self._packed = PackedWordList(fd)
+        return self._packed
+
+    def transformed(self, names):
+        """Get the words of this wordlist with transforms `names` applied.
+
+        `names` is a sequence of `WORD_TRANSFORMS` keys. Transformed
+        words are packed like the plain words (see `packed()`): into the
+        cache dir, so later runs transform nothing, or else into an
+        anonymous temporary file. Either way they are kept with this
+        wordlist as `PackedWordList`. So picking a transformed word is a
+        lookup in a memory-mapped file and huge wordlists are never held
+        in memory as a whole. Without any transforms we return this
+        wordlist itself.
+        """
+        names = tuple(names)
+        if not names:
+            return self
+        if names in self._transformed:
+            return self._transformed[names]
+        view = None
+        if self.path != "-":
+            view = open_cached(self.path, names)
+            if view is None and store_cached(
+                    self.path, iter_transformed(self, names), self.signed,
+                    names):
+                view = open_cached(self.path, names)
+        if view is None:
+            fd = tempfile.TemporaryFile()
+            pack(iter_transformed(self, names), fd, signed=self.signed)
+            view = PackedWordList(fd)
+        self._transformed[names] = view
+        return view
+
+    @property
+    def size(self):
+        """Size of packed words and all transformed views in bytes.
+        """
+        return len(self.packed().mmap) + sum([
+            len(view.mmap) for view in self._transformed.values()])
 
     def is_signed(self):
         """check, whether this file is cryptographically signed.
 
         This operation is expensive and resets the file descriptor to
-        the beginning of file.
+        the beginning of file. For wordlists loaded from cache we return
+        the value stored there.
         """
+        if self.fd is None:
+            return self.signed
         self.fd.seek(0)
         line1 = self.fd.readline()
         self.fd.seek(0)
-        if line1.rstrip() == "-----BEGIN PGP SIGNED MESSAGE-----":
+        if line1.rstrip() == SIGNED_HEADER:
             return True
         return False
 
@@ -202,3 +659,153 @@ class WordList(object):
         if match:
             entry = match.groups()[1]
         return entry
+
+
+def compile_wordlist(path, out_path=None):
+    """Write the words of wordlist `path` as packed wordlist.
+
+    `path` can be any wordlist supported by `WordList`, also ``-`` for
+    stdin. The packed wordlist is written to `out_path`. If no
+    `out_path` is given, we write to a file with extension `PACKED_EXT`
+    next to `path`, for instance ``wordlist_foo.dwl`` for a wordlist
+    ``wordlist_foo.txt.asc``.
+
+    Packed wordlists in wordlist dirs are preferred over other
+    wordlist files of same name, as long as their source does not
+    change. Then they have to be compiled again.
+
+    The packed wordlist is written to a temporary file in the directory
+    of `out_path` first and then moved into place, so existing files
+    are replaced atomically. `out_path` must not be the same file as
+    `path`.
+
+    Returns the path written.
+    """
+    if out_path is None:
+        if path == "-":
+            raise ValueError("Need an output path for input from stdin")
+        dirname, filename = os.path.split(path)
+        match = RE_VALID_WORDLIST_FILENAME.match(filename)
+        if match:
+            filename = "wordlist_%s" % match.groups()[0]
+        else:
+            filename, ext = os.path.splitext(filename)
+            if ext in COMPRESSED_OPENERS:
+                filename = os.path.splitext(filename)[0]
+        out_path = os.path.join(dirname, filename + PACKED_EXT)
+    if path != "-" and os.path.exists(out_path) and (
+            os.path.samefile(path, out_path)):
+        raise ValueError(
+            "Cannot compile '%s' into itself" % path)
+    w_list = WordList(path)
+    words = w_list
+    if w_list.fd is not None:
+        words = w_list._iter_fd()  # parse once, w/o packing into cache
+    source_size, source_mtime = 0, 0
+    if path != "-":
+        source_size, source_mtime = get_source_id(path)
+    umask = os.umask(0)
+    os.umask(umask)
+    fd = tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(os.path.abspath(out_path)), delete=False)
+    try:
+        with fd:
+            pack(words, fd, os.path.basename(path), source_size,
+                 source_mtime, w_list.signed)
+        os.chmod(fd.name, 0o666 & ~umask)
+        getattr(os, "replace", os.rename)(fd.name, out_path)
+    except BaseException:
+        os.unlink(fd.name)
+        raise
+    return out_path
+
+
+class WordListCache(object):
+    """A least-recently-used cache of loaded `WordList` instances.
+
+    Wordlists are cached by absolute path and identity of the file
+    (device, inode, size and modification time). Looking up a cached
+    wordlist costs one `stat()` call. If the file changed, it is loaded
+    again.
+
+    At most `max_entries` wordlists are kept. If `max_bytes` is not
+    ``None``, also the sum of packed wordlist sizes (including their
+    transformed views, see `WordList.size`) is limited to `max_bytes`.
+    When limits are exceeded, the least recently used wordlists are
+    dropped. Both limits can also be changed on existing instances.
+
+    Wordlists from stdin (path ``-``) and files modified less than
+    `RACY_INTERVAL` seconds ago are not cached.
+    """
+    def __init__(self, max_entries=32, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def size(self):
+        """Sum of sizes of all packed wordlists cached.
+        """
+        return sum([entry[1].size for entry in self.entries.values()])
+
+    def clear(self):
+        """Remove all cached wordlists.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def get(self, path, transforms=()):
+        """Get a `WordList` for `path`.
+
+        Returns a cached wordlist if the file did not change since it
+        was loaded. Otherwise we load and (maybe) cache the wordlist.
+
+        If `transforms` are given, we return the respective transformed
+        view of the wordlist instead (see `WordList.transformed()`).
+        """
+        if path == "-":
+            return WordList(path).transformed(transforms)
+        st = os.stat(path)
+        identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime)
+        key = os.path.abspath(path)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None and entry[0] == identity:
+                self.entries[key] = entry
+        if entry is None or entry[0] != identity:
+            entry = (identity, WordList(path))
+            if time.time() - st.st_mtime < RACY_INTERVAL:
+                return entry[1].transformed(transforms)
+            entry[1].packed()
+            with self.lock:
+                self.entries[key] = entry
+        result = entry[1].transformed(transforms)
+        with self.lock:
+            self.evict()
+        return result
+
+    def evict(self):
+        """Drop least recently used entries until limits are met.
+        """
+        while len(self.entries) > max(self.max_entries, 0) or (
+                self.max_bytes is not None and self.entries and
+                self.size > self.max_bytes):
+            self.entries.popitem(last=False)
+
+
+#: The cache used by `load_wordlist()`.
+wordlist_cache = WordListCache()
+
+
+def load_wordlist(path, transforms=()):
+    """Get a `WordList` for `path`, using the process-wide cache.
+
+    With `transforms` we get the transformed view of the wordlist. See
+    `WordListCache` for details. The limits of the cache can be set on
+    `wordlist_cache`.
+    """
+    return wordlist_cache.get(path, transforms)
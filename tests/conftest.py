@@ -80,13 +80,15 @@ def change_home(monkeypatch, tmpdir):
     empty dir while tests are running.
 
     The same applies for XDG-based config files, that might be set on the host
-    running and point to real config files not related to testing.
+    running and point to real config files not related to testing. Also
+    caches are written to the temporary home only.
     """
     monkeypatch.setenv("HOME", str(tmpdir))
     monkeypatch.delenv("XDG_CONFIG_DIRS", raising=False)
     monkeypatch.delenv("XDG_CONFIG_HOME", raising=False)
     monkeypatch.delenv("XDG_DATA_DIRS", raising=False)
     monkeypatch.delenv("XDG_DATA_HOME", raising=False)
+    monkeypatch.delenv("XDG_CACHE_HOME", raising=False)
     return tmpdir
 
 
@@ -99,3 +101,26 @@ def cleanup_loghandlers(request, monkeypatch):
         for handler in logger.handlers:
             logger.removeHandler(handler)
     request.addfinalizer(teardown)
+
+
+@pytest.fixture(autouse=True)
+def clear_wordlist_caches(request):
+    """Clear process-wide wordlist caches after tests.
+    """
+    from diceware.wordlist import registry, wordlist_cache
+
+    def teardown():
+        registry.clear()
+        wordlist_cache.clear()
+    request.addfinalizer(teardown)
+
+
+@pytest.fixture(autouse=True)
+def clear_plugin_registry(request):
+    """Forget random sources discovered during tests.
+    """
+    from diceware.plugins import registry
+
+    def teardown():
+        registry.clear()
+    request.addfinalizer(teardown)
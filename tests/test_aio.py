@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+from diceware import handle_options
+from diceware.aio import (
+    aget_passphrase, aget_passphrases, get_options_and_source,
+    is_async_source,
+)
+from diceware.random_sources import SystemRandomSource
+
+
+def run(coro):
+    # run coroutine `coro` in a new event loop
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def collect(agen):
+    # get all items of async generator `agen` as list
+    return [item async for item in agen]
+
+
+class SlowRandomSource(object):
+    # a blocking random source, like one waiting for user input
+
+    def __init__(self, options):
+        self.options = options
+
+    def choice(self, sequence):
+        time.sleep(0.01)
+        return sequence[0]
+
+
+class AsyncRandomSource(object):
+    # an async-native random source
+
+    def __init__(self, options):
+        self.options = options
+
+    async def choice(self, sequence):
+        await asyncio.sleep(0)
+        SOURCE_THREADS.add(threading.current_thread())
+        return sequence[-1]
+
+
+SOURCE_THREADS = set()
+
+
+def fake_sources(monkeypatch):
+    # register our fake random sources
+    sources = dict(
+        system=SystemRandomSource, slow=SlowRandomSource,
+        async_src=AsyncRandomSource)
+    monkeypatch.setattr("diceware.get_random_sources", lambda: sources)
+    monkeypatch.setattr("diceware.aio.get_random_sources", lambda: sources)
+
+
+class TestAio(object):
+
+    def test_is_async_source(self):
+        # we can tell async-native random sources
+        assert is_async_source(AsyncRandomSource) is True
+        assert is_async_source(SystemRandomSource) is False
+        assert is_async_source(object) is False
+
+    def test_get_options_and_source(self, monkeypatch):
+        # we can get options and the selected random source at once
+        fake_sources(monkeypatch)
+        options, source = get_options_and_source()
+        assert options.randomsource == "system"
+        assert source is SystemRandomSource
+        options.randomsource = "slow"
+        assert get_options_and_source(options) == (options, SlowRandomSource)
+
+    def test_source_looked_up_in_executor(self, monkeypatch):
+        # random sources are looked up outside the event loop
+        threads = []
+
+        def get_random_sources():
+            threads.append(threading.current_thread())
+            return dict(system=SystemRandomSource)
+        monkeypatch.setattr(
+            "diceware.aio.get_random_sources", get_random_sources)
+        options = handle_options(args=['-N', '1'])
+        assert len(run(collect(aget_passphrases(options)))) == 1
+        assert threads and threading.main_thread() not in threads
+
+    def test_aget_passphrase(self, wordlists_dir):
+        # we can get passphrases in coroutines
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['-n', '2', '-w', 'foo'])
+        assert run(aget_passphrase(options)) == "FooFoo"
+
+    def test_aget_passphrase_default_options(self):
+        # w/o options we use defaults
+        phrase = run(aget_passphrase())
+        assert len(phrase) > 6
+
+    def test_aget_passphrases(self, wordlists_dir):
+        # we can generate batches of passphrases asynchronously
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['-n', '1', '-w', 'foo', '-N', '5'])
+        assert run(collect(aget_passphrases(options))) == ["Foo"] * 5
+        assert run(collect(aget_passphrases(
+            options, 7, chunk_size=3))) == ["Foo"] * 7
+
+    def test_blocking_source_does_not_block_loop(
+            self, wordlists_dir, monkeypatch):
+        # blocking random sources run in the executor
+        fake_sources(monkeypatch)
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', '-r', 'system'])
+        options.randomsource = 'slow'
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.005)
+
+        async def main():
+            task = asyncio.ensure_future(ticker())
+            result = await collect(aget_passphrases(options, 5))
+            task.cancel()
+            return result
+        assert run(main()) == ["FooFoo"] * 5
+        # 5 passphrases * 2 words * 10 ms in executor
+        assert len(ticks) > 5
+
+    def test_async_source(self, wordlists_dir, monkeypatch):
+        # async-native random sources are awaited on the loop
+        fake_sources(monkeypatch)
+        SOURCE_THREADS.clear()
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', '-d', '-', '-s', '2'])
+        options.randomsource = 'async_src'
+        phrases = run(collect(aget_passphrases(options, 3)))
+        assert phrases == ["Bar-Bar99"] * 3
+        assert SOURCE_THREADS == set([threading.current_thread()])
+        options.caps = False
+        assert run(aget_passphrase(options)) == "bar-bar99"
+
+    def test_async_source_insert_specials(self, wordlists_dir, monkeypatch):
+        # async-native random sources can insert special chars
+        fake_sources(monkeypatch)
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(
+            args=['-n', '1', '-w', 'foo', '-s', '2', '--insert-specials'])
+        options.randomsource = 'async_src'
+        assert run(aget_passphrase(options)) == "Bar99"
+        options.caps = False
+        options.delimiter = "-"
+        options.num = 2
+        assert run(aget_passphrase(options)) == "bar-bar99"
+
+    def test_async_source_template(self, wordlists_dir, monkeypatch):
+        # async-native random sources can fill templates
+        fake_sources(monkeypatch)
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(args=['-t', '{foo}-{digit:2}'])
+        options.randomsource = 'async_src'
+        assert run(collect(aget_passphrases(options, 2))) == ["Bar-99"] * 2
+
+    def test_aclose_early(self, wordlists_dir):
+        # we can stop generating early
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['-n', '1', '-w', 'foo'])
+
+        async def main():
+            agen = aget_passphrases(options, 10, chunk_size=2)
+            first = await agen.__anext__()
+            await agen.aclose()
+            return first
+        assert run(main()) == "Foo"
@@ -183,6 +183,13 @@ class TestGetConfigDict(object):
         config_dict = get_config_dict()
         assert config_dict["wordlist"] == ["en_eff"]
 
+    def test_get_config_dict_returns_transforms_as_list(self, home_dir):
+        # word transforms are returned as lists
+        config_file = home_dir / ".diceware.ini"
+        config_file.write("[diceware]\ntransform = \"lower ascii\"\n")
+        config_dict = get_config_dict()
+        assert config_dict["transform"] == ["lower", "ascii"]
+
 
 class TestSampleIni(object):
     # test local sample ini file
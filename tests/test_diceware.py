@@ -4,13 +4,21 @@ import os
 import pytest
 import re
 import sys
+import time
+from collections import Counter
 from io import StringIO
 from errno import EISDIR
+from random import Random
 from diceware import (
     SPECIAL_CHARS, append_special_char, get_passphrase,
     handle_options, main, __version__, print_version, get_random_sources,
-    get_wordlist_names
+    get_wordlist_names, reservoir_sample, sample_wordlist, compile_main,
+    get_passphrases, PassphraseGenerator, add_special_chars, insert_chars,
+    get_random_indexes, get_word_transforms, load_wordlists, pick_words,
     )
+from diceware.plugins import RandomSources
+from diceware.random_sources import SystemRandomSource
+from diceware.wordlist import compile_wordlist
 
 
 class FakeRandom(object):
@@ -24,6 +32,21 @@ class FakeRandom(object):
         return elems[num]
 
 
+class BatchRandom(FakeRandom):
+    # a fake random source with batch methods, recording calls
+
+    def __init__(self):
+        self.calls = []
+
+    def choice_many(self, sequence, k):
+        self.calls.append(("choice_many", list(sequence), k))
+        return [sequence[0]] * k
+
+    def sample_indices(self, n, k):
+        self.calls.append(("sample_indices", n, k))
+        return [n - 1] * k
+
+
 class TestHandleOptions(object):
     # tests for diceware.handle_options
 
@@ -39,6 +62,7 @@ class TestHandleOptions(object):
         assert options.num == 6
         assert options.caps is True
         assert options.specials == 0
+        assert options.insert_specials is False
         assert options.infile is None
         assert options.version is False
         assert options.delimiter == ""
@@ -70,6 +94,14 @@ class TestHandleOptions(object):
         options = handle_options(['--no-caps', ])
         assert options.caps is False
 
+    def test_handle_options_transform(self):
+        # we can request word transforms
+        assert handle_options([]).transform == []
+        options = handle_options(['--transform', 'upper', 'ascii'])
+        assert options.transform == ['upper', 'ascii']
+        with pytest.raises(SystemExit):
+            handle_options(['--transform', 'invalid'])
+
     def test_handle_options_caps_conflicting_raises_exc(self):
         # conflicting caps-settings raise an exception
         with pytest.raises(SystemExit):
@@ -140,6 +172,32 @@ class TestHandleOptions(object):
         options = handle_options(['--dice-sides', '21'])
         assert options.dice_sides == 21
 
+    def test_handle_options_count(self):
+        # we can set the number of passphrases to generate
+        options = handle_options([])
+        assert options.count == 1
+        options = handle_options(['-N', '3'])
+        assert options.count == 3
+        options = handle_options(['--count', '4'])
+        assert options.count == 4
+
+    def test_handle_options_single_pass(self):
+        # we can request to pick words in a single pass
+        options = handle_options([])
+        assert options.single_pass is False
+        options = handle_options(['--single-pass'])
+        assert options.single_pass is True
+
+    def test_handle_options_single_pass_realdice(self, capsys):
+        # we do not pick words in a single pass with interactive sources
+        with pytest.raises(SystemExit):
+            handle_options(['--single-pass', '-r', 'realdice'])
+        out, err = capsys.readouterr()
+        assert "--single-pass does not work with random source" in err
+        options = handle_options(
+            ['--single-pass', '-r', 'realdice', '-t', '{digit}'])
+        assert options.single_pass is True
+
     def test_handle_options_show_wordlist_dirs(self):
         # we can request to show the wordlist dirs
         options = handle_options([])
@@ -173,16 +231,40 @@ class TestHandleOptions(object):
 
         monkeypatch.setattr(
             diceware, 'get_random_sources', lambda: dict(foo=FakePlugin))
-        options = handle_options([])
+        options = handle_options(['-r', 'foo'])
         assert options.foo == 2
 
+    def test_handle_options_updates_selected_plugin_only(self, monkeypatch):
+        # only the selected plugin updates our argparser, unless we ask for help
+        import diceware
+        calls = []
+
+        def make_plugin(name):
+            class FakePlugin(object):
+                @classmethod
+                def update_argparser(cls, parser):
+                    calls.append(name)
+                    return parser
+            return FakePlugin
+
+        monkeypatch.setattr(
+            diceware, 'get_random_sources',
+            lambda: dict(foo=make_plugin("foo"), bar=make_plugin("bar")))
+        assert handle_options(['-r', 'bar']).randomsource == 'bar'
+        assert calls == ["bar"]
+        handle_options([])
+        assert calls == ["bar"]
+        with pytest.raises(SystemExit):
+            handle_options(['-r', 'bar', '--help'])
+        assert sorted(calls) == ["bar", "bar", "foo"]
+
 
 class TestDicewareModule(object):
 
     def test_get_random_sources(self):
-        # we can get a dict of random sources registered as entry_points.
+        # we can get a mapping of random sources registered as entry_points.
         sources_dict = get_random_sources()
-        assert isinstance(sources_dict, dict)
+        assert isinstance(sources_dict, RandomSources)
         assert len(sources_dict) > 0
         assert 'system' in sources_dict
         assert isinstance(sources_dict['system'], type)
@@ -193,7 +275,7 @@ class TestDicewareModule(object):
             diceware.__about__, 'random_sources',
             {'foo': 'diceware.random_sources:NotExistingSource'})
         with pytest.raises(ImportError):
-            get_random_sources()
+            get_random_sources()['foo']
 
     def test_insert_special_char(self):
         # we can append special chars to words.
@@ -241,6 +323,86 @@ class TestDicewareModule(object):
         phrase = get_passphrase(options)
         assert phrase.lower() == phrase
 
+    def test_get_random_indexes(self):
+        # we get many random numbers at once, if the source supports it
+        fake_rnd = FakeRandom()
+        fake_rnd.nums_to_draw = [2, 0, 1]
+        assert get_random_indexes(fake_rnd, 3, 3) == [2, 0, 1]
+        src = SystemRandomSource(None)
+        assert set(get_random_indexes(src, 4, 50)) <= set(range(4))
+        batch_rnd = BatchRandom()
+        assert get_random_indexes(batch_rnd, 4, 2) == [3, 3]
+        assert batch_rnd.calls == [("sample_indices", 4, 2)]
+
+    def test_pick_words(self):
+        # words of each wordlist are picked at once, returned in turns
+        rnd = BatchRandom()
+        assert pick_words(rnd, [["a", "b"], ["c"]], 2) == ["a", "c"] * 2
+        assert rnd.calls == [
+            ("choice_many", ["a", "b"], 2), ("choice_many", ["c"], 2)]
+
+    def test_insert_chars(self):
+        # we can insert chars at several positions
+        assert insert_chars("foo", "", []) == "foo"
+        assert insert_chars("foo", "ab", [3, 3]) == "fooab"
+        assert insert_chars("foo", "abc", [2, 0, 2]) == "bfoaco"
+
+    def test_add_special_chars(self):
+        # special chars are appended or inserted
+        options = handle_options(args=['-s', '2'])
+        fake_rnd = FakeRandom()
+        fake_rnd.nums_to_draw = [0, 1]
+        assert add_special_chars("foo", options, fake_rnd) == "foo~!"
+        options.insert_specials = True
+        fake_rnd.nums_to_draw = [0, 1, 2, 0]
+        assert add_special_chars("foo", options, fake_rnd) == "!fo~o"
+        options.specials = 0
+        assert add_special_chars("foo", options, fake_rnd) == "foo"
+
+    def test_get_word_transforms(self):
+        # capitalization comes first, other transforms follow
+        options = handle_options(['--transform', 'ascii'])
+        assert get_word_transforms(options) == ['capitalize', 'ascii']
+        options.caps = False
+        assert get_word_transforms(options) == ['ascii']
+        del options.transform
+        assert get_word_transforms(options) == []
+
+    def test_load_wordlists(self, wordlists_dir):
+        # wordlists are loaded with words transformed
+        path = wordlists_dir.join("wordlist_foo.txt")
+        path.write("foo\nbar\n")
+        past = time.time() - 100
+        os.utime(str(path), (past, past))
+        options = handle_options(['-w', 'foo', 'foo', '--transform', 'upper'])
+        wordlists = load_wordlists(options)
+        assert [list(x) for x in wordlists] == [["FOO", "BAR"]] * 2
+        assert wordlists[0] is wordlists[1]
+        options.caps = False
+        options.transform = []
+        assert list(load_wordlists(options)[0]) == ["foo", "bar"]
+
+    def test_get_passphrase_transform(self, wordlists_dir):
+        # we can transform words in passphrases
+        wordlists_dir.join("wordlist_foo.txt").write("f\u00f6\u00f6\n")
+        options = handle_options(
+            ['-n', '2', '-w', 'foo', '-d', ' ', '--transform', 'ascii'])
+        assert get_passphrase(options) == "Foo Foo"
+        options.transform = ['upper']
+        assert get_passphrase(options) == "F\u00d6\u00d6 F\u00d6\u00d6"
+        options.single_pass = True
+        assert get_passphrase(options) == "F\u00d6\u00d6 F\u00d6\u00d6"
+
+    def test_get_passphrase_insert_specials(self, wordlists_dir):
+        # special chars can be inserted at random positions
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(
+            args=['-n', '3', '-w', 'foo', '-s', '4', '--insert-specials'])
+        phrase = get_passphrase(options)
+        assert len(phrase) == 13
+        assert [x for x in phrase if x not in SPECIAL_CHARS] == list(
+            "FooFooFoo")
+
     def test_get_passphrase_specialchars(self):
         # we can request special chars in passphrases
         options = handle_options(args=[])
@@ -257,6 +419,169 @@ class TestDicewareModule(object):
         phrase = get_passphrase(options)
         assert " " in phrase
 
+    def test_get_passphrase_single_pass(self, tmpdir):
+        # we can pick words in a single pass
+        options = handle_options(args=['-n', '3', '-d', ' '])
+        options.single_pass = True
+        phrase = get_passphrase(options)
+        assert len(phrase.split(" ")) == 3
+
+    def test_get_passphrase_single_pass_multiple_lists(self, wordlists_dir):
+        # also in single pass mode we take words from lists in turn
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        wordlists_dir.join("wordlist_bar.txt").write("bar\n")
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', 'bar', '--single-pass'])
+        assert get_passphrase(options) == "FooBarFooBar"
+
+    def test_get_passphrase_single_pass_packed(self, wordlists_dir):
+        # packed wordlists can be sampled in a single pass
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        compile_main([str(wordlists_dir.join("wordlist_foo.txt"))])
+        wordlists_dir.join("wordlist_foo.txt").remove()
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', '--single-pass'])
+        assert get_passphrase(options) == "FooFoo"
+
+    def test_get_passphrase_single_pass_compressed(self, wordlists_dir):
+        # compressed wordlists can be sampled in a single pass
+        import gzip
+        with gzip.GzipFile(
+                str(wordlists_dir / "wordlist_foo.txt.gz"), "wb") as fd:
+            fd.write(b"foo\n")
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', '--single-pass'])
+        assert get_passphrase(options) == "FooFoo"
+
+    def test_get_passphrases(self, wordlists_dir):
+        # we can generate several passphrases
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(args=['-n', '2', '-w', 'foo', '-d', ' '])
+        phrases = list(get_passphrases(options, 20))
+        assert len(phrases) == 20
+        for phrase in phrases:
+            assert set(phrase.split(" ")) <= set(["Foo", "Bar"])
+            assert len(phrase.split(" ")) == 2
+        assert len(set(phrases)) > 1
+
+    def test_get_passphrases_count_from_options(self, wordlists_dir):
+        # by default we generate `options.count` passphrases
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['-n', '1', '-w', 'foo', '-N', '3'])
+        assert list(get_passphrases(options)) == ["Foo", "Foo", "Foo"]
+
+    def test_get_passphrases_loads_once(self, monkeypatch):
+        # wordlists and random sources are set up once per batch
+        import diceware
+        calls = []
+        orig_load_wordlist = diceware.load_wordlist
+        orig_get_random_sources = diceware.get_random_sources
+
+        def load_wordlist(path, transforms=()):
+            calls.append("load")
+            return orig_load_wordlist(path, transforms)
+
+        def get_random_sources():
+            calls.append("sources")
+            return orig_get_random_sources()
+        monkeypatch.setattr(diceware, "load_wordlist", load_wordlist)
+        monkeypatch.setattr(
+            diceware, "get_random_sources", get_random_sources)
+        options = handle_options(args=[])
+        del calls[:]
+        assert len(list(get_passphrases(options, 5))) == 5
+        assert calls == ["sources", "load"]
+        assert len(list(get_passphrases())) == 1
+
+    def test_get_passphrases_single_pass(self, wordlists_dir):
+        # in single pass mode we pick words for all passphrases at once
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        wordlists_dir.join("wordlist_bar.txt").write("bar\n")
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', 'bar', '--single-pass', '-s', '1'])
+        phrases = list(get_passphrases(options, 3))
+        assert len(phrases) == 3
+        for phrase in phrases:
+            assert phrase[:-1] == "FooBarFooBar"
+            assert phrase[-1] in SPECIAL_CHARS
+
+    def test_reservoir_sample(self):
+        # we can pick items in one pass
+        rnd = Random(1)
+        assert reservoir_sample(["a"], 3, rnd) == ["a", "a", "a"]
+        assert reservoir_sample(iter("abc"), 0, rnd) == []
+        assert set(reservoir_sample(iter("abc"), 20, rnd)) <= set("abc")
+
+    def test_reservoir_sample_empty(self):
+        # empty iterables cannot be sampled
+        with pytest.raises(IndexError):
+            reservoir_sample([], 1, Random(1))
+
+    def test_reservoir_sample_uniform(self):
+        # all items are picked with same probability
+        rnd = Random(42)
+        counts = Counter()
+        for x in range(2000):
+            counts.update(reservoir_sample(range(10), 5, rnd))
+        assert sorted(counts) == list(range(10))
+        for num in range(10):
+            assert 850 < counts[num] < 1150  # expected: 1000
+
+    def test_reservoir_sample_independent(self):
+        # picks are independent of each other (items can repeat)
+        rnd = Random(23)
+        counts = Counter(
+            tuple(reservoir_sample("ab", 2, rnd)) for x in range(4000))
+        for pair in [("a", "a"), ("a", "b"), ("b", "a"), ("b", "b")]:
+            assert 850 < counts[pair] < 1150  # expected: 1000
+
+    def test_reservoir_sample_uses_sample_indices(self):
+        # replacements are drawn with sample_indices() of sources
+        class IndexSource(object):
+            calls = []
+
+            def choice(self, sequence):
+                raise AssertionError("choice() called")
+
+            def choice_many(self, sequence, k):
+                return [sequence[0]] * k
+
+            def sample_indices(self, n, k):
+                self.calls.append((n, k))
+                return [0] * k
+        rnd = IndexSource()
+        assert reservoir_sample(iter("abc"), 2, rnd) == ["a", "a"]
+        assert rnd.calls == [(sys.maxsize, 1)] * 2
+
+    def test_sample_wordlist(self, tmpdir):
+        # we can sample wordlist files
+        path = tmpdir.join("mywordlist")
+        path.write("11111 foo\n\n11112 bar\n")
+        result = sample_wordlist(str(path), 10, Random(1))
+        assert len(result) == 10
+        assert set(result) == set(["foo", "bar"])
+
+    def test_sample_wordlist_packed(self, tmpdir, monkeypatch):
+        # from packed wordlists we pick by index, w/o reading all words
+        path = tmpdir.join("wordlist_foo.txt")
+        path.write("foo\nbar\n")
+        packed_path = compile_wordlist(str(path))
+        tmpdir.join("wordlist_empty.txt").write("\n")
+        empty_path = compile_wordlist(str(tmpdir / "wordlist_empty.txt"))
+        monkeypatch.setattr(
+            "diceware.packed.PackedWordList.__iter__", None)
+        rnd = FakeRandom()
+        rnd.nums_to_draw = [1, 0, 1]
+        assert sample_wordlist(packed_path, 3, rnd) == ["bar", "foo", "bar"]
+        assert sample_wordlist(packed_path, 0, rnd) == []
+        with pytest.raises(IndexError):
+            sample_wordlist(empty_path, 1, rnd)
+
+    def test_sample_wordlist_stdin(self, argv_handler):
+        # we can sample wordlists from stdin
+        sys.stdin = StringIO("foo\n")
+        assert sample_wordlist("-", 2, Random(1)) == ["foo", "foo"]
+
     def test_print_version(self, capsys):
         # we can print version infos
         print_version()
@@ -349,6 +674,22 @@ class TestDicewareModule(object):
             main()
         assert infile_error.value.errno == EISDIR
 
+    def test_main_infile_stdin_single_pass(self, argv_handler, capsys):
+        # main() can sample stdin in a single pass
+        sys.stdin = StringIO("word1\n")
+        sys.argv = ['diceware', '-n', '2', '--single-pass', '-']
+        main()
+        out, err = capsys.readouterr()
+        assert out == 'Word1Word1\n'
+
+    def test_main_count(self, argv_handler, capsys):
+        # main() outputs several passphrases on request
+        sys.stdin = StringIO("word1\n")
+        sys.argv = ['diceware', '-n', '2', '-N', '3', '-']
+        main()
+        out, err = capsys.readouterr()
+        assert out == 'Word1Word1\n' * 3
+
     def test_main_delimiters(self, argv_handler, capsys):
         # delimiters are respected on calls to main
         sys.stdin = StringIO("word1\n")
@@ -383,3 +724,123 @@ class TestDicewareModule(object):
         assert exc_info.value.code == 0
         out, err = capsys.readouterr()
         assert str(wordlists_dir) in out
+
+
+class TestPassphraseGenerator(object):
+
+    def test_generate(self, wordlists_dir):
+        # we can generate passphrases
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['-n', '2', '-w', 'foo'])
+        generator = PassphraseGenerator(options)
+        assert generator.generate() == "FooFoo"
+        assert generator.generate() == "FooFoo"
+
+    def test_generate_many(self, wordlists_dir):
+        # we can generate batches of passphrases
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        generator = PassphraseGenerator(num=1, wordlist=["foo"])
+        assert list(generator.generate_many(3)) == ["Foo"] * 3
+
+    def test_keywords(self, wordlists_dir):
+        # keywords override options
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        wordlists_dir.join("wordlist_bar.txt").write("bar\n")
+        options = handle_options(args=['-n', '2', '-w', 'foo'])
+        generator = PassphraseGenerator(
+            options, wordlist=["foo", "bar"], caps=False, delimiter="-")
+        assert generator.generate() == "foo-bar-foo-bar"
+        assert options.delimiter == ""
+        with pytest.raises(TypeError):
+            PassphraseGenerator(options, unknown_option=1)
+
+    def test_setup_done_once(self, wordlists_dir, monkeypatch):
+        # generating passphrases requires no further setup
+        import diceware
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        generator = PassphraseGenerator(wordlist=["foo"], specials=1)
+
+        def fail(*args, **kw):
+            raise AssertionError("setup repeated")
+        for name in ("handle_options", "get_random_sources",
+                     "load_wordlist", "get_wordlist_path"):
+            monkeypatch.setattr(diceware, name, fail)
+        generator.generate()
+        assert len(list(generator.generate_many(2000))) == 2000
+
+    def test_words_transformed_once(self, wordlists_dir, monkeypatch):
+        # words are transformed on setup, not per passphrase
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        generator = PassphraseGenerator(
+            num=2, wordlist=["foo"], transform=["upper"])
+        monkeypatch.setattr("diceware.wordlist.WORD_TRANSFORMS", {})
+        assert generator.generate() in ["FOOFOO", "FOOBAR", "BARFOO", "BARBAR"]
+        assert set(generator.generate_many(20)) <= set(
+            ["FOOFOO", "FOOBAR", "BARFOO", "BARBAR"])
+
+    def test_fake_random(self, wordlists_dir):
+        # words are picked in order, specials last
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        generator = PassphraseGenerator(num=2, wordlist=["foo"], specials=1)
+        generator.rnd = FakeRandom()
+        generator.rnd.nums_to_draw = [1, 0, 2]
+        assert generator.generate() == "BarFoo#"
+
+    def test_batch_methods_preferred(self, wordlists_dir):
+        # sources with batch methods are asked once per wordlist
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        wordlists_dir.join("wordlist_baz.txt").write("baz\n")
+        generator = PassphraseGenerator(
+            num=2, wordlist=["foo", "baz"], specials=2, caps=False)
+        generator.rnd = BatchRandom()
+        assert generator.generate() == "foobazfoobaz99"
+        assert generator.rnd.calls == [
+            ("choice_many", ["foo", "bar"], 2), ("choice_many", ["baz"], 2),
+            ("sample_indices", len(SPECIAL_CHARS), 2)]
+        del generator.rnd.calls[:]
+        assert list(generator.generate_many(2)) == ["foobazfoobaz99"] * 2
+        assert len(generator.rnd.calls) == 6
+
+
+class TestCompileMain(object):
+
+    def test_compile_main(self, tmpdir, caplog):
+        # we can compile several wordlists at once
+        tmpdir.join("wordlist_foo.txt").write("foo\n")
+        tmpdir.join("wordlist_bar.asc").write("bar\n")
+        compile_main([str(tmpdir / "wordlist_foo.txt"),
+                      str(tmpdir / "wordlist_bar.asc"), "-v"])
+        assert tmpdir.join("wordlist_foo.dwl").isfile()
+        assert tmpdir.join("wordlist_bar.dwl").isfile()
+        assert "Compiled '%s'" % (tmpdir / "wordlist_foo.txt") in caplog.text
+
+    def test_compile_main_output(self, tmpdir, argv_handler):
+        # we can set the output path
+        tmpdir.join("wordlist_foo.txt").write("foo\n")
+        sys.argv = ['diceware-compile', str(tmpdir / "wordlist_foo.txt"),
+                    '-o', str(tmpdir / "out.dwl")]
+        compile_main()
+        assert tmpdir.join("out.dwl").isfile()
+
+    def test_compile_main_output_one_infile(self, tmpdir, capsys):
+        # with --output we accept one input file only
+        with pytest.raises(SystemExit) as exc_info:
+            compile_main(["foo", "bar", "-o", str(tmpdir / "out.dwl")])
+        assert exc_info.value.code == 2
+        out, err = capsys.readouterr()
+        assert "one INFILE only" in err
+
+    def test_compile_main_stdin_needs_output(self, capsys):
+        # stdin input requires an output path
+        with pytest.raises(SystemExit) as exc_info:
+            compile_main(["-"])
+        assert exc_info.value.code == 2
+        out, err = capsys.readouterr()
+        assert "Need an output path" in err
+
+    def test_compile_main_nonexisting(self, tmpdir, caplog):
+        # we complain about files we cannot read
+        with pytest.raises(SystemExit) as exc_info:
+            compile_main([str(tmpdir / "wordlist_foo.txt")])
+        assert exc_info.value.code == 1
+        assert "Cannot compile" in caplog.text
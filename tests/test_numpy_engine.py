@@ -0,0 +1,223 @@
+import os
+import pytest
+import subprocess
+import sys
+from collections import Counter
+from diceware import (
+    SPECIAL_CHARS, get_passphrases, handle_options, use_numpy_engine,
+)
+from diceware import numpy_engine
+from diceware.numpy_engine import (
+    is_available, randbelow_many, iter_passphrases, iter_scheduled,
+)
+from diceware.random_sources import (
+    BulkRandom, RealDiceRandomSource, SystemRandomSource,
+)
+
+numpy = pytest.importorskip("numpy")
+
+
+def fake_getbytes(data):
+    # get a getbytes() function that delivers `data` over and over
+    def getbytes(num):
+        return (data * (num // len(data) + 1))[:num]
+    return getbytes
+
+
+class TestNumpyEngine(object):
+
+    def test_is_available(self):
+        # we can tell whether numpy is installed
+        assert is_available() is True
+
+    def test_numpy_imported_lazily(self):
+        # importing diceware and making few passphrases does not need numpy
+        code = (
+            "import sys, diceware; diceware.get_passphrase("
+            "diceware.handle_options([])); "
+            "print('numpy' in sys.modules)")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(
+            os.path.dirname(numpy_engine.__file__)))
+        output = subprocess.check_output(
+            [sys.executable, "-c", code], env=env)
+        assert output.strip() == b"False"
+
+    def test_numpy_missing(self, monkeypatch):
+        # w/o numpy we cannot draw numbers or make passphrases
+        monkeypatch.setattr("diceware.numpy_engine.numpy", None)
+        with pytest.raises(ImportError):
+            randbelow_many(os.urandom, 3, 1)
+        with pytest.raises(ImportError):
+            list(iter_scheduled([], "x", 1, os.urandom))
+
+    def test_randbelow_many(self):
+        # we get arrays of ints in the requested range
+        for n in (1, 2, 3, 7776, 2 ** 32):
+            result = randbelow_many(os.urandom, n, 1000)
+            assert len(result) == 1000
+            assert result.min() >= 0
+            assert result.max() < n
+        assert len(randbelow_many(os.urandom, 3, 0)) == 0
+
+    def test_randbelow_many_invalid_n(self):
+        # we cannot draw numbers in empty or too large ranges
+        with pytest.raises(ValueError):
+            randbelow_many(os.urandom, 0, 1)
+        with pytest.raises(ValueError):
+            randbelow_many(os.urandom, 2 ** 32 + 1, 1)
+
+    def test_randbelow_many_rejects_incomplete_range(self):
+        # values in the incomplete last interval are rejected
+        # 2^32 - 1 is the only value >= 3 * (2^32 // 3)
+        getbytes = fake_getbytes(b"\xff\xff\xff\xff\x05\x00\x00\x00")
+        assert list(randbelow_many(getbytes, 3, 4)) == [2, 2, 2, 2]
+
+    def test_randbelow_many_uniform(self):
+        # picked ints are uniformly distributed (chi-squared test)
+        num = 100000
+        counts = Counter(randbelow_many(os.urandom, 10, num).tolist())
+        expected = num / 10.0
+        chi2 = sum([(counts[x] - expected) ** 2 / expected for x in range(10)])
+        # 9 degrees of freedom: fails by chance with p < 10^-6
+        assert chi2 < 46.0
+
+    def test_iter_passphrases(self):
+        # we can generate passphrases as requested by options
+        options = handle_options(args=['-n', '2', '-d', '-', '-s', '1'])
+        phrases = list(iter_passphrases(
+            [["Foo", "Bar"], ["Baz"]], options, 100, os.urandom, "%"))
+        assert len(phrases) == 100
+        for phrase in phrases:
+            words = phrase[:-1].split("-")
+            assert words[1] == words[3] == "Baz"
+            assert set([words[0], words[2]]) <= set(["Foo", "Bar"])
+            assert phrase[-1] == "%"
+
+    def test_iter_passphrases_words_as_given(self):
+        # words are not transformed, specials can be missing
+        options = handle_options(args=['-n', '3', '--caps'])
+        phrases = list(iter_passphrases(
+            [["foo"]], options, 3, os.urandom, SPECIAL_CHARS))
+        assert phrases == ["foofoofoo"] * 3
+
+    def test_iter_passphrases_batches(self, monkeypatch):
+        # passphrases are generated in batches
+        monkeypatch.setattr("diceware.numpy_engine.BATCH_SIZE", 7)
+        options = handle_options(args=['-n', '1'])
+        phrases = list(iter_passphrases(
+            [["Foo"]], options, 20, os.urandom, SPECIAL_CHARS))
+        assert phrases == ["Foo"] * 20
+
+    def test_iter_scheduled(self, monkeypatch):
+        # we can pick items for format strings in batches
+        monkeypatch.setattr("diceware.numpy_engine.BATCH_SIZE", 7)
+        digits = "0123456789"
+        result = list(iter_scheduled(
+            [["a"], digits, digits], "%s-%s%%%s", 20, os.urandom))
+        assert len(result) == 20
+        for item in result:
+            assert item[:2] == "a-"
+            assert item[2] in digits and item[4] in digits
+            assert item[3] == "%"
+        assert list(iter_scheduled([], "x", 3, os.urandom)) == ["x"] * 3
+
+    def test_iter_scheduled_large_sequences(self, monkeypatch):
+        # from sequences larger than all draws we look up picked items only
+        class Sequence(object):
+            lookups = 0
+
+            def __len__(self):
+                return 1000
+
+            def __getitem__(self, index):
+                self.lookups += 1
+                return "%03d" % index
+
+            def __iter__(self):
+                raise AssertionError("sequence copied")
+        monkeypatch.setattr("diceware.numpy_engine.BATCH_SIZE", 7)
+        seq = Sequence()
+        result = list(iter_scheduled([seq, "ab", seq], "%s%s%s", 20,
+                                     os.urandom))
+        assert len(result) == 20
+        assert seq.lookups == 40
+        for item in result:
+            assert item[3] in "ab"
+            assert item[:3].isdigit() and item[4:].isdigit()
+
+    def test_iter_passphrases_uniform(self):
+        # all passphrases are equally likely (chi-squared test)
+        options = handle_options(args=['-n', '2', '-d', ' '])
+        num = 90000
+        counts = Counter(iter_passphrases(
+            [["a", "b", "c"]], options, num, os.urandom, SPECIAL_CHARS))
+        assert len(counts) == 9
+        expected = num / 9.0
+        chi2 = sum([(x - expected) ** 2 / expected for x in counts.values()])
+        # 8 degrees of freedom: fails by chance with p < 10^-6
+        assert chi2 < 44.0
+
+    def test_use_numpy_engine(self):
+        # we use the engine for large batches with system randomness only
+        rnd = SystemRandomSource(None)
+        assert use_numpy_engine(rnd, [["foo"]], 1000) is True
+        assert use_numpy_engine(rnd, [["foo"]], 999) is False
+        assert use_numpy_engine(rnd, [[]], 1000) is False
+        assert use_numpy_engine(BulkRandom(), [["foo"]], 1000) is False
+        assert use_numpy_engine(
+            RealDiceRandomSource(None), [["foo"]], 1000) is False
+
+    def test_use_numpy_engine_imports_last(self, monkeypatch):
+        # numpy is imported only if the engine would be used
+        monkeypatch.setattr("diceware.numpy_engine.numpy", False)
+        rnd = SystemRandomSource(None)
+        assert use_numpy_engine(rnd, [["foo"]], 999) is False
+        assert use_numpy_engine(BulkRandom(), [["foo"]], 1000) is False
+        assert numpy_engine.numpy is False
+        assert use_numpy_engine(rnd, [["foo"]], 1000) is True
+        assert numpy_engine.numpy is numpy
+
+    def test_use_numpy_engine_no_numpy(self, monkeypatch):
+        # without numpy we fall back to the pure Python path
+        monkeypatch.setattr("diceware.numpy_engine.numpy", None)
+        assert is_available() is False
+        rnd = SystemRandomSource(None)
+        assert use_numpy_engine(rnd, [["foo"]], 1000) is False
+
+    def test_get_passphrases(self, wordlists_dir, monkeypatch):
+        # get_passphrases() uses the engine for large batches
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        calls = []
+        orig_iter_passphrases = numpy_engine.iter_passphrases
+
+        def iter_passphrases(*args):
+            calls.append(args[2])
+            return orig_iter_passphrases(*args)
+        monkeypatch.setattr(numpy_engine, "iter_passphrases", iter_passphrases)
+        options = handle_options(args=['-n', '2', '-w', 'foo', '-d', ' '])
+        phrases = list(get_passphrases(options, 2000))
+        assert calls == [2000]
+        assert len(phrases) == 2000
+        assert set(phrases) == set(
+            ["Foo Foo", "Foo Bar", "Bar Foo", "Bar Bar"])
+
+    def test_get_passphrases_fallback(self, wordlists_dir, monkeypatch):
+        # without numpy, we generate large batches one by one
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        monkeypatch.setattr("diceware.numpy_engine.numpy", None)
+        options = handle_options(args=['-n', '2', '-w', 'foo'])
+        assert list(get_passphrases(options, 1000)) == ["FooFoo"] * 1000
+
+    def test_get_passphrases_insert_specials(self, wordlists_dir):
+        # specials inserted at random positions are added afterwards
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', '-s', '2', '--insert-specials'])
+        phrases = list(get_passphrases(options, 1000))
+        assert options.specials == 2
+        assert len(phrases) == 1000
+        for phrase in phrases:
+            assert len(phrase) == 8
+            assert [x for x in phrase if x not in SPECIAL_CHARS] == list(
+                "FooFoo")
+        assert len(set(phrases)) > 1
@@ -0,0 +1,193 @@
+import errno
+import pytest
+import sys
+from contextlib import redirect_stdout
+from io import BytesIO, StringIO
+from diceware import handle_options, main
+from diceware.output import (
+    PassphraseWriter, is_broken_pipe, silence_stdout,
+)
+
+
+class FakeStdout(object):
+    # a stdout replacement recording writes and flushes
+
+    encoding = "utf-8"
+
+    def __init__(self):
+        self.buffer = self
+        self.written = []
+        self.flushes = 0
+
+    def write(self, data):
+        self.written.append(data)
+
+    def flush(self):
+        self.flushes += 1
+
+
+class BrokenStdout(FakeStdout):
+    # a stdout nobody reads from anymore
+
+    def write(self, data):
+        raise IOError(errno.EPIPE, "Broken pipe")
+
+
+class TestPassphraseWriter(object):
+
+    def test_write_to_file(self, tmpdir):
+        # we can write passphrases to files
+        path = tmpdir.join("out.txt")
+        writer = PassphraseWriter(str(path))
+        writer.write_all(["foo", "bär"])
+        assert path.read_binary() == "foo\nbär\n".encode("utf-8")
+        assert writer.fd.closed
+
+    def test_write_to_stdout(self, monkeypatch):
+        # by default we write to stdout in large blocks
+        stdout = FakeStdout()
+        monkeypatch.setattr("sys.stdout", stdout)
+        writer = PassphraseWriter()
+        writer.write("foo")
+        writer.write("bar")
+        assert stdout.written == []
+        writer.close()
+        assert stdout.written == [b"foo\nbar\n"]
+        assert PassphraseWriter("-").to_stdout is True
+
+    def test_write_to_text_stdout(self, monkeypatch):
+        # stdout w/o binary buffer gets text
+        stdout = StringIO()
+        monkeypatch.setattr("sys.stdout", stdout)
+        writer = PassphraseWriter()
+        writer.write_all(["foo", "b\u00e4r"])
+        assert writer.text is True
+        assert stdout.getvalue() == "foo\nb\u00e4r\n"
+
+    def test_file_created_on_first_write(self, tmpdir):
+        # w/o passphrases we do not create files
+        path = tmpdir.join("out.txt")
+        PassphraseWriter(str(path)).write_all([])
+        assert not path.exists()
+
+    def test_buffer_size(self, monkeypatch):
+        # full buffers are written out
+        stdout = FakeStdout()
+        monkeypatch.setattr("sys.stdout", stdout)
+        writer = PassphraseWriter(buffer_size=8)
+        for passphrase in ["foo", "bar", "baz"]:
+            writer.write(passphrase)
+        assert stdout.written == [b"foo\nbar\n"]
+        assert writer.buffered == 4
+
+    def test_flush_every(self, monkeypatch):
+        # we can flush after some number of passphrases
+        stdout = FakeStdout()
+        monkeypatch.setattr("sys.stdout", stdout)
+        writer = PassphraseWriter(flush_every=2)
+        writer.write_all(["a", "b", "c", "d", "e"])
+        assert stdout.written == [b"a\nb\n", b"c\nd\n", b"e\n"]
+        assert stdout.flushes == 3
+
+    def test_write_all_consumes_lazily(self, monkeypatch):
+        # generators are consumed while writing
+        stdout = FakeStdout()
+        monkeypatch.setattr("sys.stdout", stdout)
+        seen = []
+
+        def passphrases():
+            for num in range(4):
+                seen.append(len(stdout.written))
+                yield "x"
+        PassphraseWriter(buffer_size=4).write_all(passphrases())
+        assert seen == [0, 0, 1, 1]
+
+    def test_stdout_encoding(self, monkeypatch):
+        # we respect the encoding of stdout
+        stdout = FakeStdout()
+        stdout.encoding = "latin-1"
+        monkeypatch.setattr("sys.stdout", stdout)
+        PassphraseWriter().write_all(["bär"])
+        assert stdout.written == ["bär\n".encode("latin-1")]
+
+    def test_stdout_wo_buffer(self, monkeypatch):
+        # stdout without binary buffer (like in Python 2) is used directly
+        stdout = BytesIO()
+        monkeypatch.setattr("sys.stdout", stdout)
+        PassphraseWriter().write_all(["foo"])
+        assert stdout.getvalue() == b"foo\n"
+
+
+class TestBrokenPipes(object):
+
+    def test_is_broken_pipe(self):
+        # we can tell broken pipes from other errors
+        assert is_broken_pipe(IOError(errno.EPIPE, "Broken pipe")) is True
+        assert is_broken_pipe(IOError(errno.ENOENT, "No such file")) is False
+        assert is_broken_pipe(ValueError()) is False
+
+    def test_silence_stdout(self, monkeypatch, tmpdir):
+        # we can redirect stdout to devnull
+        path = tmpdir.join("stdout.txt")
+        with path.open("w") as fd:
+            monkeypatch.setattr("sys.stdout", fd)
+            silence_stdout()
+            fd.write("foo")
+        assert path.read() == ""
+        monkeypatch.setattr("sys.stdout", StringIO())
+        silence_stdout()  # no real file
+
+    def test_main_broken_pipe(self, argv_handler, monkeypatch):
+        # main() exits quietly if nobody reads our output anymore
+        monkeypatch.setattr("sys.stdout", BrokenStdout())
+        sys.stdin = StringIO("word1\n")
+        sys.argv = ['diceware', '-N', '100', '-']
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+        assert exc_info.value.code == 1
+
+    def test_main_output(self, argv_handler, tmpdir):
+        # main() can write to files
+        path = tmpdir.join("out.txt")
+        sys.stdin = StringIO("word1\n")
+        sys.argv = ['diceware', '-n', '2', '-N', '3', '-o', str(path), '-']
+        main()
+        assert path.read() == "Word1Word1\n" * 3
+
+    def test_main_text_stdout(self, argv_handler):
+        # main() can write to stdout replacements w/o binary buffer
+        sys.stdin = StringIO("word1\n")
+        stdout = StringIO()
+        with redirect_stdout(stdout):
+            main(['-n', '2', '-N', '3', '-'])
+        assert stdout.getvalue() == "Word1Word1\n" * 3
+
+    def test_main_output_dir_missing(self, argv_handler, tmpdir, capsys):
+        # we tell missing output dirs from missing input files
+        path = str(tmpdir / "missing" / "out.txt")
+        sys.stdin = StringIO("word1\n")
+        with pytest.raises(SystemExit) as exc_info:
+            main(['-o', path, '-'])
+        assert exc_info.value.code == 1
+        out, err = capsys.readouterr()
+        assert (
+            "Cannot write to '%s': the directory does not exist." % path
+            ) in err
+        assert "The file" not in err
+
+    def test_main_other_errors(self, argv_handler, tmpdir):
+        # other errors when writing are not swallowed
+        sys.stdin = StringIO("word1\n")
+        sys.argv = ['diceware', '-o', str(tmpdir), '-']
+        with pytest.raises(IOError) as exc_info:
+            main()
+        assert exc_info.value.errno == errno.EISDIR
+
+    def test_handle_options_output(self):
+        # we can set output file and flush policy
+        options = handle_options([])
+        assert options.output is None
+        assert options.flush_every == 0
+        options = handle_options(['-o', 'out.txt', '--flush-every', '10'])
+        assert options.output == "out.txt"
+        assert options.flush_every == 10
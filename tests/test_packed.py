@@ -0,0 +1,270 @@
+import os
+import time
+import pytest
+from io import BytesIO
+from diceware.packed import (
+    HEADER, MAGIC, get_cache_dir, get_cache_path, get_source_id, pack,
+    read_header, unpack, open_cached, store_cached, PackedWordList,
+)
+
+
+def make_old(path, age=100):
+    # set modification time of `path` `age` seconds into the past
+    past = time.time() - age
+    os.utime(str(path), (past, past))
+
+
+@pytest.fixture(scope="function")
+def old_wordlist(request, tmpdir):
+    """A wordlist file modified some time ago.
+    """
+    path = tmpdir.join("wordlist_old.txt")
+    path.write("foo\nbar\n")
+    make_old(path)
+    return path
+
+
+class TestPackedModule(object):
+
+    def test_get_cache_dir(self, home_dir):
+        # by default we cache in ~/.cache/diceware
+        assert get_cache_dir() == str(home_dir / ".cache" / "diceware")
+
+    def test_get_cache_dir_considers_xdg_cache_home(self, home_dir, monkeypatch):
+        # we respect $XDG_CACHE_HOME
+        monkeypatch.setenv("XDG_CACHE_HOME", str(home_dir / "foo"))
+        assert get_cache_dir() == str(home_dir / "foo" / "diceware")
+
+    def test_get_cache_dir_no_home(self, monkeypatch):
+        # w/o home and $XDG_CACHE_HOME there is no cache dir
+        monkeypatch.setattr("os.path.expanduser", lambda x: x)
+        assert get_cache_dir() is None
+        assert get_cache_path("foo") is None
+
+    def test_get_cache_path(self, home_dir):
+        # cache paths depend on the absolute source path
+        path1 = get_cache_path("foo")
+        path2 = get_cache_path(os.path.abspath("foo"))
+        path3 = get_cache_path("bar")
+        assert path1 == path2
+        assert path1 != path3
+        assert path1.startswith(get_cache_dir())
+        assert path1.endswith(".dwl")
+
+    def test_get_source_id(self, tmpdir):
+        # we get size and mtime in nanoseconds
+        path = tmpdir.join("foo")
+        path.write("foo\n")
+        os.utime(str(path), (1000000, 1000000))
+        assert get_source_id(str(path)) == (4, 1000000 * 10 ** 9)
+
+    def test_pack_unpack(self):
+        # we can pack and unpack lists of words
+        fd = BytesIO()
+        assert pack(["foo", "bär", "b a z"], fd, "/src", 12, 34, True) == 3
+        header, words = unpack(fd.getvalue())
+        assert words == ["foo", "bär", "b a z"]
+        assert header.source_path == "/src"
+        assert header.source_size == 12
+        assert header.source_mtime == 34
+        assert header.signed is True
+        assert header.num_words == 3
+
+    def test_pack_empty(self):
+        # we can pack empty lists
+        fd = BytesIO()
+        assert pack([], fd) == 0
+        header, words = unpack(fd.getvalue())
+        assert words == []
+        assert header.signed is False
+
+    def test_pack_iterable(self):
+        # generators are consumed once
+        fd = BytesIO()
+        pack((x for x in ["foo", "bar"]), fd)
+        assert unpack(fd.getvalue())[1] == ["foo", "bar"]
+
+    def test_pack_offsets(self):
+        # the offsets table points to word starts
+        fd = BytesIO()
+        pack(["a", "bc"], fd, "/p")
+        data = fd.getvalue()
+        header = read_header(data)
+        table = HEADER.size + 2 + header.blob_len
+        assert header.wide is False
+        assert data[table:] == (
+            b"\x00" * 4 + b"\x02" + b"\x00" * 3 + b"\x05" + b"\x00" * 3)
+
+    def test_pack_wide_offsets(self, monkeypatch, tmpdir):
+        # large blobs get 64 bit offsets
+        monkeypatch.setattr("diceware.packed.MAX_NARROW_OFFSET", 3)
+        fd = tmpdir.join("packed.dwl").open("w+b")
+        pack(["a", "bc", "d"], fd, "/p")
+        data = tmpdir.join("packed.dwl").read_binary()
+        header = read_header(data)
+        table = HEADER.size + 2 + header.blob_len
+        assert header.wide is True
+        assert data[table:] == (
+            b"\x00" * 8 + b"\x02" + b"\x00" * 7 + b"\x05" + b"\x00" * 7 +
+            b"\x07" + b"\x00" * 7)
+        packed = PackedWordList(fd)
+        assert [packed[0], packed[1], packed[2]] == ["a", "bc", "d"]
+
+    def test_read_header_invalid(self):
+        # we complain about data that is not a packed wordlist
+        with pytest.raises(ValueError):
+            read_header(b"foo")
+        with pytest.raises(ValueError):
+            read_header(b"X" * HEADER.size)
+        assert read_header(MAGIC + b"\x00" * (HEADER.size - 8)) is not None
+
+    def test_store_and_open_cached(self, old_wordlist):
+        # we can store words in cache and get them back
+        path = str(old_wordlist)
+        assert open_cached(path) is None
+        cache_path = store_cached(path, ["foo", "bar"], signed=True)
+        assert os.path.isfile(cache_path)
+        packed = open_cached(path)
+        assert list(packed) == ["foo", "bar"]
+        assert packed.header.signed is True
+        assert packed.header.source_path == os.path.abspath(path)
+
+    def test_open_cached_detects_changes(self, old_wordlist):
+        # changed source files invalidate the cache
+        path = str(old_wordlist)
+        store_cached(path, ["foo", "bar"])
+        old_wordlist.write("foo\nbaz\n")
+        make_old(old_wordlist, 50)
+        assert open_cached(path) is None
+
+    def test_open_cached_detects_changed_size(self, old_wordlist):
+        # also size changes with same mtime are detected
+        path = str(old_wordlist)
+        store_cached(path, ["foo", "bar"])
+        mtime = os.stat(path).st_mtime
+        old_wordlist.write("foo\nbar\nbaz\n")
+        os.utime(path, (mtime, mtime))
+        assert open_cached(path) is None
+
+    def test_open_cached_source_removed(self, old_wordlist):
+        # removed sources invalidate cached copies
+        path = str(old_wordlist)
+        store_cached(path, ["foo", "bar"])
+        old_wordlist.remove()
+        assert open_cached(path) is None
+
+    def test_open_cached_broken_cache_file(self, old_wordlist):
+        # broken cache files are ignored
+        path = str(old_wordlist)
+        cache_path = store_cached(path, ["foo", "bar"])
+        with open(cache_path, "wb") as fd:
+            fd.write(b"garbage")
+        assert open_cached(path) is None
+
+    def test_store_and_open_cached_transforms(self, old_wordlist):
+        # transformed words are cached apart from plain words
+        path = str(old_wordlist)
+        store_cached(path, ["foo"])
+        assert open_cached(path, ["upper"]) is None
+        store_cached(path, ["FOO"], transforms=["upper"])
+        assert list(open_cached(path)) == ["foo"]
+        assert list(open_cached(path, ["upper"])) == ["FOO"]
+        assert open_cached(path, ["upper", "ascii"]) is None
+        assert get_cache_path(path, ["upper"]) not in (
+            get_cache_path(path), get_cache_path(path, ["upper", "ascii"]))
+
+    def test_store_cached_consumes_iterables(self, old_wordlist):
+        # we can cache words from generators
+        path = str(old_wordlist)
+        store_cached(path, (x for x in ["foo", "bar"]))
+        assert list(open_cached(path)) == ["foo", "bar"]
+
+    def test_store_cached_skips_recent_files(self, tmpdir):
+        # files modified right now are not cached
+        path = tmpdir.join("wordlist_new.txt")
+        path.write("foo\n")
+        assert store_cached(str(path), ["foo"]) is None
+        assert open_cached(str(path)) is None
+
+    def test_store_cached_no_cache_dir(self, old_wordlist, monkeypatch):
+        # w/o a cache dir we cannot cache
+        monkeypatch.setattr("diceware.packed.get_cache_dir", lambda: None)
+        assert store_cached(str(old_wordlist), ["foo"]) is None
+        assert open_cached(str(old_wordlist)) is None
+
+    def test_store_cached_unwritable_cache(self, old_wordlist, home_dir):
+        # we cope with cache dirs we cannot create
+        home_dir.join(".cache").write("not-a-dir")
+        assert store_cached(str(old_wordlist), ["foo"]) is None
+
+    def test_store_cached_cleans_up_on_errors(self, old_wordlist, home_dir):
+        # temporary files are removed on errors
+        with pytest.raises(AttributeError):
+            store_cached(str(old_wordlist), [None])
+        assert os.listdir(get_cache_dir()) == []
+
+
+class TestPackedWordList(object):
+
+    def packed(self, tmpdir, words):
+        # get a PackedWordList containing `words`
+        fd = tmpdir.join("packed.dwl").open("w+b")
+        pack(words, fd)
+        return PackedWordList(fd)
+
+    def test_len(self, tmpdir):
+        # we can get the number of words
+        assert len(self.packed(tmpdir, ["foo", "bar"])) == 2
+        assert len(self.packed(tmpdir, [])) == 0
+
+    def test_getitem(self, tmpdir):
+        # we can look up words by index
+        packed = self.packed(tmpdir, ["foo", "bär", "", "baz"])
+        assert packed[0] == "foo"
+        assert packed[1] == "bär"
+        assert packed[2] == ""
+        assert packed[3] == "baz"
+        assert packed[-1] == "baz"
+        assert packed[-4] == "foo"
+
+    def test_getitem_out_of_range(self, tmpdir):
+        # invalid indexes raise IndexError
+        packed = self.packed(tmpdir, ["foo", "bar"])
+        with pytest.raises(IndexError):
+            packed[2]
+        with pytest.raises(IndexError):
+            packed[-3]
+        with pytest.raises(TypeError):
+            packed["1"]
+
+    def test_iter(self, tmpdir):
+        # we can iterate over packed wordlists
+        assert list(self.packed(tmpdir, ["foo", "bar"])) == ["foo", "bar"]
+        assert list(self.packed(tmpdir, [])) == []
+
+    def test_iter_chunked(self, tmpdir, monkeypatch):
+        # words are decoded in chunks, also words longer than a chunk
+        monkeypatch.setattr("diceware.packed.ITER_CHUNK_SIZE", 5)
+        words = ["a", "bb", "\u00e4\u00e4\u00e4", "cccccccc", "d", "", "e"]
+        assert list(self.packed(tmpdir, words)) == words
+
+    def test_header(self, tmpdir):
+        # header infos are available
+        packed = self.packed(tmpdir, ["foo", "bar"])
+        assert packed.header.num_words == 2
+
+    def test_truncated(self, tmpdir):
+        # truncated files are rejected
+        path = tmpdir.join("packed.dwl")
+        with path.open("w+b") as fd:
+            pack(["foo", "bar"], fd)
+        data = path.read_binary()
+        path.write_binary(data[:-1])
+        with pytest.raises(ValueError):
+            PackedWordList(path.open("rb"))
+
+    def test_random_choice(self, tmpdir):
+        # packed wordlists can be used with `random.choice`
+        import random
+        packed = self.packed(tmpdir, ["foo", "bar"])
+        assert random.SystemRandom().choice(packed) in ["foo", "bar"]
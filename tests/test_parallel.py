@@ -0,0 +1,144 @@
+import pytest
+import sys
+from io import StringIO
+from diceware import get_passphrases, handle_options, main
+from diceware.parallel import (
+    CHUNK_SIZE, generate_chunk, get_chunk_sizes, get_sources, init_worker,
+    iter_parallel, worker_state,
+)
+
+
+class TestParallel(object):
+
+    def test_get_chunk_sizes(self):
+        # work is split into chunks
+        assert get_chunk_sizes(8, 2) == [1] * 8
+        assert get_chunk_sizes(100, 2) == [13] * 7 + [9]
+        assert get_chunk_sizes(0, 2) == []
+        assert get_chunk_sizes(10 ** 6, 2) == [CHUNK_SIZE] * 100
+        assert get_chunk_sizes(100, 1, chunk_size=30) == [25] * 4
+
+    def test_get_sources(self, wordlists_dir, home_dir):
+        # wordlist files are passed by path, stdin as list of words
+        path = wordlists_dir.join("wordlist_foo.txt")
+        path.write("foo\n")
+        options = handle_options(args=['-w', 'foo'])
+        assert get_sources(options) == [str(path)]
+        sys.stdin = StringIO("bar\nbaz\n")
+        options = handle_options(args=['-'])
+        assert get_sources(options) == [["bar", "baz"]]
+
+    def test_init_worker_and_generate_chunk(self, wordlists_dir):
+        # workers load (and transform) wordlists and generate chunks
+        path = wordlists_dir.join("wordlist_foo.txt")
+        path.write("foo\n")
+        options = handle_options(args=['-n', '1', '-w', 'foo'])
+        init_worker(options, [str(path), ["bar"]])
+        assert list(worker_state["wordlists"][0]) == ["Foo"]
+        assert worker_state["wordlists"][1] == ["Bar"]
+        assert generate_chunk((0, 2)) == ["FooBar", "FooBar"]
+        worker_state.clear()
+
+    def test_init_worker_template(self, wordlists_dir):
+        # workers can make passphrases after templates
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['-t', '{foo}-{foo}'])
+        assert get_sources(options) == []
+        init_worker(options, [])
+        assert worker_state["plan"].fmt == "%s-%s"
+        assert generate_chunk((0, 2)) == ["Foo-Foo", "Foo-Foo"]
+        worker_state.clear()
+
+    def test_generate_chunk_seeded(self, wordlists_dir, capsys):
+        # seeded sources are reseeded for each chunk
+        wordlists_dir.join("wordlist_foo.txt").write(
+            "\n".join([str(x) for x in range(1000)]))
+        options = handle_options(
+            args=['-n', '2', '-w', 'foo', '-d', ' ', '-r', 'seeded'])
+        init_worker(options, get_sources(options))
+        chunk = generate_chunk((3, 20))
+        assert generate_chunk((4, 20)) != chunk
+        assert generate_chunk((3, 20)) == chunk
+        worker_state.clear()
+
+    def test_iter_parallel(self, wordlists_dir):
+        # we can generate passphrases in several processes
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(args=['-n', '2', '-w', 'foo', '-d', ' '])
+        phrases = list(iter_parallel(options, 50, 2))
+        assert len(phrases) == 50
+        assert set(phrases) <= set(
+            ["Foo Foo", "Foo Bar", "Bar Foo", "Bar Bar"])
+
+    def test_iter_parallel_unordered(self, wordlists_dir):
+        # we can get passphrases in order of completion
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['-n', '1', '-w', 'foo'])
+        phrases = list(iter_parallel(options, 20, 0, ordered=False))
+        assert phrases == ["Foo"] * 20
+
+    def test_iter_parallel_workers_differ(self, wordlists_dir):
+        # workers do not share random numbers
+        wordlists_dir.join("wordlist_foo.txt").write(
+            "\n".join([str(x) for x in range(1000)]))
+        options = handle_options(args=['-n', '4', '-w', 'foo', '-d', ' '])
+        phrases = list(iter_parallel(options, 400, 4))
+        assert len(set(phrases)) == 400
+
+    def test_iter_parallel_seeded(self, wordlists_dir, capsys):
+        # parallel runs with seeded sources are reproducible
+        wordlists_dir.join("wordlist_foo.txt").write(
+            "\n".join([str(x) for x in range(1000)]))
+        options = handle_options(args=[
+            '-n', '4', '-w', 'foo', '-d', ' ', '-r', 'seeded', '--seed', 'x'])
+        phrases = list(iter_parallel(options, 400, 4))
+        assert len(set(phrases)) == 400
+        assert list(iter_parallel(options, 400, 4)) == phrases
+        assert sorted(iter_parallel(options, 400, 4, ordered=False)) == (
+            sorted(phrases))
+
+    def test_get_passphrases_jobs(self, wordlists_dir):
+        # get_passphrases() respects `options.jobs`
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(
+            args=['-n', '1', '-w', 'foo', '-j', '2', '--unordered'])
+        assert list(get_passphrases(options, 5)) == ["Foo"] * 5
+        options.single_pass = True
+        assert list(get_passphrases(options, 5)) == ["Foo"] * 5
+
+    def test_main_jobs(self, argv_handler, capsys):
+        # we can generate passphrases in parallel from the command line
+        sys.stdin = StringIO("word1\n")
+        sys.argv = ['diceware', '-n', '2', '-N', '3', '-j', '2', '-']
+        main()
+        out, err = capsys.readouterr()
+        assert out == 'Word1Word1\n' * 3
+
+    def test_handle_options_jobs(self):
+        # we can set the number of jobs and output order
+        options = handle_options([])
+        assert options.jobs == 1
+        assert options.unordered is False
+        options = handle_options(['-j', '4', '--unordered'])
+        assert options.jobs == 4
+        assert options.unordered is True
+        assert handle_options(['--jobs', '0']).jobs == 0
+
+    def test_handle_options_jobs_realdice(self, capsys):
+        # interactive sources cannot be used in worker processes
+        for jobs in ('0', '2'):
+            with pytest.raises(SystemExit):
+                handle_options(['-j', jobs, '-r', 'realdice'])
+            out, err = capsys.readouterr()
+            assert "--jobs does not work with random source" in err
+        assert handle_options(['-j', '1', '-r', 'realdice']).jobs == 1
+
+    def test_handle_options_jobs_single_pass(self, capsys):
+        # --jobs and --single-pass exclude each other
+        with pytest.raises(SystemExit):
+            handle_options(['-j', '2', '--single-pass'])
+        out, err = capsys.readouterr()
+        assert "--jobs cannot be used with --single-pass" in err
+        assert handle_options(['-j', '1', '--single-pass']).jobs == 1
+        options = handle_options(['-j', '2', '--single-pass', '-t', '{digit}'])
+        assert options.jobs == 2
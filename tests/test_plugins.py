@@ -0,0 +1,219 @@
+import json
+import os
+import pytest
+import sys
+from diceware import get_random_sources, handle_options
+from diceware.plugins import (
+    ENTRY_POINT_GROUP, PLUGINS_CACHE_NAME, PluginRegistry, RandomSources,
+    get_path_fingerprint, iter_entry_points, load_spec, registry,
+)
+from diceware.random_sources import SystemRandomSource
+
+FAKE_MODULE = '''
+class FakeSource(object):
+
+    def __init__(self, options):
+        self.options = options
+
+    @classmethod
+    def update_argparser(cls, parser):
+        parser.add_argument('--fake-opt', default="fake")
+        return parser
+'''
+
+FAKE_ENTRY_POINTS = '''
+[%s]
+fake = diceware_fakesrc:FakeSource
+system = diceware_fakesrc:FakeSource
+''' % ENTRY_POINT_GROUP
+
+
+@pytest.fixture(scope="function")
+def fake_dist(request, monkeypatch, tmpdir):
+    """This fixture installs a fake package registering random sources.
+    """
+    dist_dir = tmpdir.mkdir("site")
+    dist_dir.join("diceware_fakesrc.py").write(FAKE_MODULE)
+    info_dir = dist_dir.mkdir("diceware_fakesrc-1.0.dist-info")
+    info_dir.join("METADATA").write(
+        "Metadata-Version: 2.1\nName: diceware_fakesrc\nVersion: 1.0\n")
+    info_dir.join("entry_points.txt").write(FAKE_ENTRY_POINTS)
+    monkeypatch.syspath_prepend(str(dist_dir))
+    monkeypatch.delitem(sys.modules, "diceware_fakesrc", raising=False)
+    registry.clear()
+    return dist_dir
+
+
+class TestHelpers(object):
+
+    def test_iter_entry_points(self, fake_dist):
+        # we can find entry points without importing them
+        assert sorted(iter_entry_points(ENTRY_POINT_GROUP)) == [
+            ("fake", "diceware_fakesrc:FakeSource"),
+            ("system", "diceware_fakesrc:FakeSource")]
+        assert "diceware_fakesrc" not in sys.modules
+        assert iter_entry_points("diceware_not_existing") == []
+
+    def test_get_path_fingerprint(self, fake_dist):
+        # fingerprints change when package metadata changes
+        fingerprint, age = get_path_fingerprint()
+        assert len(fingerprint) == 64
+        assert 0 <= age < 60
+        fake_dist.join("unrelated.txt").write("")
+        assert get_path_fingerprint()[0] == fingerprint
+        info_dir = fake_dist / "diceware_fakesrc-1.0.dist-info"
+        os.utime(str(info_dir), (1000000000, 1000000000))
+        assert get_path_fingerprint()[0] != fingerprint
+        fingerprint = get_path_fingerprint()[0]
+        fake_dist.mkdir("other-2.0.dist-info")
+        assert get_path_fingerprint()[0] != fingerprint
+
+    def test_get_path_fingerprint_files(self, monkeypatch, tmpdir):
+        # sys.path entries can be files or missing
+        tmpdir.join("foo.zip").write("")
+        monkeypatch.syspath_prepend(str(tmpdir / "missing"))
+        monkeypatch.syspath_prepend(str(tmpdir / "foo.zip"))
+        fingerprint = get_path_fingerprint()[0]
+        os.utime(str(tmpdir / "foo.zip"), (1000000000, 1000000000))
+        assert get_path_fingerprint()[0] != fingerprint
+
+    def test_load_spec(self):
+        # we can load objects by spec
+        assert load_spec(
+            "diceware.random_sources:SystemRandomSource") is (
+                SystemRandomSource)
+        with pytest.raises(ImportError):
+            load_spec("diceware.random_sources:NotExistingSource")
+        with pytest.raises(ImportError):
+            load_spec("diceware_not_existing:Foo")
+
+
+class TestPluginRegistry(object):
+
+    def test_get_specs(self, fake_dist):
+        # we can get specs of entry points
+        specs = PluginRegistry().get_specs()
+        assert specs["fake"] == "diceware_fakesrc:FakeSource"
+
+    def test_get_specs_once_per_process(self, fake_dist, monkeypatch):
+        # entry points are discovered once
+        reg = PluginRegistry()
+        specs = reg.get_specs()
+        monkeypatch.setattr("diceware.plugins.iter_entry_points", None)
+        monkeypatch.setattr("diceware.plugins.get_path_fingerprint", None)
+        assert reg.get_specs() is specs
+        reg.clear()
+        assert reg.specs is None
+
+    def test_cache_file(self, fake_dist, monkeypatch, home_dir):
+        # entry points are cached in a file for other processes
+        monkeypatch.setattr("diceware.plugins.RACY_INTERVAL", -1)
+        specs = PluginRegistry().get_specs()
+        path = home_dir / ".cache" / "diceware" / PLUGINS_CACHE_NAME
+        data = json.loads(path.read())
+        assert data["specs"] == specs
+        assert data["fingerprint"] == get_path_fingerprint()[0]
+        monkeypatch.setattr("diceware.plugins.iter_entry_points", None)
+        assert PluginRegistry().get_specs() == specs
+
+    def test_cache_file_outdated(self, fake_dist, monkeypatch, home_dir):
+        # cache files are not used if sys.path changed
+        monkeypatch.setattr("diceware.plugins.RACY_INTERVAL", -1)
+        PluginRegistry().get_specs()
+        monkeypatch.setattr(
+            "diceware.plugins.get_path_fingerprint", lambda: ("other", 100))
+        monkeypatch.setattr(
+            "diceware.plugins.iter_entry_points", lambda group: [("a", "b:c")])
+        assert PluginRegistry().get_specs() == {"a": "b:c"}
+        path = home_dir / ".cache" / "diceware" / PLUGINS_CACHE_NAME
+        assert json.loads(path.read())["fingerprint"] == "other"
+
+    def test_cache_file_racy(self, fake_dist, monkeypatch, home_dir):
+        # we do not write cache files if sys.path changed just now
+        monkeypatch.setattr("diceware.plugins.RACY_INTERVAL", 3600)
+        assert "fake" in PluginRegistry().get_specs()
+        assert not (home_dir / ".cache" / "diceware").exists()
+
+    def test_read_cache_invalid(self, tmpdir):
+        # broken cache files are ignored
+        path = tmpdir / "cache.json"
+        reg = PluginRegistry()
+        assert reg.read_cache(str(path), "foo") is None
+        for content in ("garbage", "[]", '{"fingerprint": "foo"}',
+                        '{"fingerprint": "foo", "specs": []}'):
+            path.write(content)
+            assert reg.read_cache(str(path), "foo") is None
+        path.write('{"fingerprint": "foo", "specs": {"a": "b:c"}}')
+        assert reg.read_cache(str(path), "foo") == {"a": "b:c"}
+        assert reg.read_cache(str(path), "bar") is None
+
+    def test_write_cache_fails(self, tmpdir):
+        # failing to write a cache file is not an error
+        tmpdir.join("blocker").write("")
+        path = tmpdir / "blocker" / "cache.json"
+        PluginRegistry().write_cache(str(path), "foo", {})
+        assert not path.exists()
+
+    def test_write_cache_fails_cleanup(self, tmpdir, monkeypatch):
+        # temporary files are removed if writing fails
+        def fail(src, dst):
+            raise OSError("fail")
+        monkeypatch.setattr("os.replace", fail)
+        monkeypatch.setattr("os.rename", fail)
+        PluginRegistry().write_cache(str(tmpdir / "cache.json"), "foo", {})
+        assert tmpdir.listdir() == []
+
+    def test_no_cache_dir(self, fake_dist, monkeypatch):
+        # without cache dir, we discover entry points in each process
+        monkeypatch.setattr("diceware.plugins.get_cache_dir", lambda: None)
+        reg = PluginRegistry()
+        assert reg.get_cache_path() is None
+        assert "fake" in reg.get_specs()
+
+    def test_load(self):
+        # objects are loaded once
+        reg = PluginRegistry()
+        spec = "diceware.random_sources:SystemRandomSource"
+        assert reg.load(spec) is SystemRandomSource
+        assert reg.loaded == {spec: SystemRandomSource}
+
+
+class TestRandomSources(object):
+
+    def test_mapping(self):
+        # random sources work like a read-only dict
+        sources = RandomSources(
+            {"sys": "diceware.random_sources:SystemRandomSource"})
+        assert list(sources) == ["sys"]
+        assert len(sources) == 1
+        assert "sys" in sources
+        assert sources["sys"] is SystemRandomSource
+        assert dict(sources) == {"sys": SystemRandomSource}
+        with pytest.raises(KeyError):
+            sources["foo"]
+
+    def test_lazy(self, fake_dist):
+        # sources are imported when looked up
+        sources = get_random_sources()
+        assert "fake" in sources.keys()
+        assert "diceware_fakesrc" not in sys.modules
+        assert sources["fake"].__name__ == "FakeSource"
+        assert "diceware_fakesrc" in sys.modules
+
+    def test_builtin_sources_win(self, fake_dist):
+        # other packages cannot replace sources shipped with diceware
+        assert get_random_sources()["system"] is SystemRandomSource
+
+    def test_handle_options(self, fake_dist):
+        # plugins found as entry point can be selected and add options
+        options = handle_options(['-r', 'fake', '--fake-opt', 'foo'])
+        assert options.fake_opt == 'foo'
+        assert "diceware_fakesrc" in sys.modules
+
+    def test_handle_options_loads_selected_only(self, fake_dist, capsys):
+        # plugins not selected are not imported
+        with pytest.raises(SystemExit):
+            handle_options(['--fake-opt', 'foo'])
+        assert "diceware_fakesrc" not in sys.modules
+        out, err = capsys.readouterr()
+        assert "unrecognized arguments: --fake-opt" in err
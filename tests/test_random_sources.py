@@ -1,13 +1,20 @@
 from __future__ import unicode_literals
+import binascii
+import hashlib
 import pytest
 import sys
+import struct
 import argparse
 from conftest import InputMock
 from io import StringIO
 from itertools import product, chain
-from diceware import main, get_random_sources
+from collections import Counter, OrderedDict
+from diceware import main, get_random_sources, get_passphrases, handle_options
 from diceware.random_sources import (
-    SystemRandomSource, RealDiceRandomSource,
+    SystemRandomSource, RealDiceRandomSource, BulkRandom, BufferedRandom,
+    BufferedSystemRandomSource, RANDOM_BUFFER_SIZE, XofRandom,
+    XofRandomSource, XOF_RESEED_BYTES, XOF_RESEED_INTERVAL, HmacDrbg,
+    SeededRandom, SeededRandomSource, BatchSourceAdapter, as_batch_source,
     )
 
 
@@ -75,6 +82,580 @@ class TestSystemRandomSource(object):
         assert num > 0
 
 
+    def test_choice_uses_bulk_random(self, monkeypatch):
+        # batches of passphrases need only few calls to the OS
+        import os
+        calls = []
+        orig_urandom = os.urandom
+
+        def urandom(num):
+            calls.append(num)
+            return orig_urandom(num)
+        monkeypatch.setattr("os.urandom", urandom)
+        options = handle_options(args=["-s", "2"])
+        assert len(list(get_passphrases(options, 1000))) == 1000
+        # 1000 * (6 words * 3 bytes + 2 specials * 2 bytes) = 22000 bytes
+        assert len(calls) < 10
+
+    def test_sample_indices(self):
+        # we can draw many numbers at once
+        src = SystemRandomSource(None)
+        numbers = src.sample_indices(36, 100)
+        assert len(numbers) == 100
+        assert set(numbers) <= set(range(36))
+        assert not hasattr(src, "randbelow_many")
+
+    def test_batch_methods(self):
+        # we can pick many items and indices at once
+        src = SystemRandomSource(None)
+        picked = src.choice_many("abc", 100)
+        assert len(picked) == 100
+        assert set(picked) == set("abc")
+        numbers = src.sample_indices(36, 100)
+        assert len(numbers) == 100
+        assert set(numbers) <= set(range(36))
+        assert as_batch_source(src) is src
+
+
+class TestBulkRandom(object):
+
+    def fake_urandom(self, monkeypatch, data):
+        # make os.urandom() deliver `data`
+        calls = []
+
+        def urandom(num):
+            calls.append(num)
+            return data[:num]
+        monkeypatch.setattr("os.urandom", urandom)
+        return calls
+
+    def test_getbytes(self, monkeypatch):
+        # we serve random bytes out of a pool
+        calls = self.fake_urandom(monkeypatch, b"abcdefgh")
+        rnd = BulkRandom(pool_size=4)
+        assert rnd.getbytes(3) == b"abc"
+        assert rnd.getbytes(1) == b"d"
+        assert calls == [4]
+        assert rnd.getbytes(2) == b"ab"
+        assert rnd.getbytes(6) == b"abcdef"
+        assert calls == [4, 4, 6]
+
+    def test_getbytes_after_fork(self, monkeypatch):
+        # pooled bytes are dropped in forked processes
+        calls = self.fake_urandom(monkeypatch, b"abcdefgh")
+        rnd = BulkRandom(pool_size=8)
+        assert rnd.getbytes(2) == b"ab"
+        monkeypatch.setattr("os.getpid", lambda: rnd.pid + 1)
+        assert rnd.getbytes(2) == b"ab"
+        assert calls == [8, 8]
+
+    def test_randbelow(self):
+        # we get ints in the requested range
+        rnd = BulkRandom()
+        for n in (1, 2, 3, 255, 256, 257, 7776, 2 ** 64 + 1):
+            assert 0 <= rnd.randbelow(n) < n
+        assert rnd.randbelow(1) == 0
+        with pytest.raises(ValueError):
+            rnd.randbelow(0)
+
+    def test_randbelow_rejects_incomplete_range(self, monkeypatch):
+        # values in the incomplete last interval are rejected
+        self.fake_urandom(monkeypatch, b"\xff\xff\x00\x04")
+        rnd = BulkRandom(pool_size=4)
+        # 65535 is the only value >= 3 * 21845
+        assert rnd.randbelow(3) == 1
+
+    def test_randbelow_exactly_uniform(self, monkeypatch):
+        # feeding each possible input once, each result is hit equally
+        data = b"".join(
+            bytes(bytearray([x // 256, x % 256])) for x in range(65536))
+        self.fake_urandom(monkeypatch, data)
+        for n in (3, 5, 7, 10, 100, 255):
+            rnd = BulkRandom(pool_size=len(data))
+            counts = Counter(
+                [rnd.randbelow(n) for x in range(65536 - 65536 % n)])
+            assert len(counts) == n
+            assert len(set(counts.values())) == 1
+
+    def test_randbelow_many(self, monkeypatch):
+        # we get many ints from one block of random bytes
+        calls = self.fake_urandom(monkeypatch, b"\x00\x04\xff\xff\x00\x05")
+        rnd = BulkRandom(pool_size=4)
+        # 65535 is rejected and replaced by a fresh draw
+        assert rnd.randbelow_many(3, 2) == [1, 1]
+        assert calls == [4, 4]
+        assert rnd.randbelow_many(3, 0) == []
+        with pytest.raises(ValueError):
+            rnd.randbelow_many(0, 1)
+
+    def test_choice_many(self, monkeypatch):
+        # we pick many items from one block of random bytes
+        calls = self.fake_urandom(monkeypatch, b"\x00\x04\x00\x05\x00\x03")
+        rnd = BulkRandom(pool_size=6)
+        assert rnd.choice_many("abc", 3) == ["b", "c", "a"]
+        assert calls == [6]
+        assert rnd.choice_many("abc", 0) == []
+        assert rnd.choice_many("", 0) == []
+        with pytest.raises(IndexError):
+            rnd.choice_many("", 1)
+
+    def test_randbelow_many_exactly_uniform(self, monkeypatch):
+        # feeding each possible input once, each result is hit equally
+        data = b"".join(
+            bytes(bytearray([x // 256, x % 256])) for x in range(65536))
+        self.fake_urandom(monkeypatch, data)
+        for n in (3, 100, 255):
+            rnd = BulkRandom(pool_size=len(data))
+            limit = 65536 - 65536 % n
+            numbers = rnd.randbelow_many(n, limit)
+            assert Counter(numbers) == Counter(
+                [x % n for x in range(limit)])
+
+    def test_choice_uniform(self):
+        # picked items are uniformly distributed (chi-squared test)
+        rnd = BulkRandom()
+        sequence = "abcdefghij"
+        num = 60000
+        counts = Counter([rnd.choice(sequence) for x in range(num)])
+        expected = num / len(sequence)
+        chi2 = sum([(counts[x] - expected) ** 2 / expected for x in sequence])
+        # 9 degrees of freedom: fails by chance with p < 10^-6
+        assert chi2 < 46.0
+
+    def test_choice_empty(self):
+        # we cannot pick from empty sequences
+        with pytest.raises(IndexError):
+            BulkRandom().choice([])
+
+
+class TestBufferedRandom(object):
+
+    def fake_urandom_path(self, monkeypatch, tmpdir, data):
+        # make BufferedRandom read `data` from a file
+        path = tmpdir.join("urandom")
+        path.write_binary(data)
+        monkeypatch.setattr(
+            "diceware.random_sources.URANDOM_PATH", str(path))
+        return path
+
+    def test_getbytes(self, monkeypatch, tmpdir):
+        # we serve bytes out of a prefetched buffer
+        self.fake_urandom_path(monkeypatch, tmpdir, b"abcdef")
+        rnd = BufferedRandom(pool_size=4)
+        assert rnd.getbytes(3) == b"abc"
+        assert rnd.getbytes(1) == b"d"
+        assert rnd.getbytes(2) == b"ab"
+        assert rnd.getbytes(6) == b"abcdef"
+
+    def test_consumed_bytes_are_wiped(self, monkeypatch, tmpdir):
+        # bytes handed out are overwritten with zeros
+        self.fake_urandom_path(monkeypatch, tmpdir, b"abcd")
+        rnd = BufferedRandom(pool_size=4)
+        rnd.getbytes(3)
+        pool = rnd.pool
+        assert pool == bytearray(b"\x00\x00\x00d")
+        # refilling wipes what is left over
+        rnd.getbytes(2)
+        assert pool == bytearray(4)
+        pool = rnd.pool
+        rnd.wipe()
+        assert pool == bytearray(4)
+        assert rnd.pool == bytearray()
+
+    def test_wipe_on_delete(self):
+        # buffers are wiped when the instance is dropped
+        rnd = BufferedRandom(pool_size=16)
+        rnd.getbytes(1)
+        pool = rnd.pool
+        del rnd
+        assert pool == bytearray(16)
+
+    def test_getbytes_after_fork(self, monkeypatch, tmpdir):
+        # a forked child never serves bytes of the parent
+        self.fake_urandom_path(monkeypatch, tmpdir, b"abcdefgh")
+        rnd = BufferedRandom(pool_size=8)
+        assert rnd.getbytes(2) == b"ab"
+        pool = rnd.pool
+        monkeypatch.setattr("os.getpid", lambda: rnd.pid + 1)
+        assert rnd.getbytes(2) == b"ab"
+        assert pool == bytearray(8)
+
+    def test_fallback_to_urandom(self, monkeypatch, tmpdir):
+        # w/o readable device we use os.urandom()
+        monkeypatch.setattr("os.urandom", lambda num: b"x" * num)
+        monkeypatch.setattr(
+            "diceware.random_sources.URANDOM_PATH", str(tmpdir / "missing"))
+        assert BufferedRandom(pool_size=4).getbytes(2) == b"xx"
+        self.fake_urandom_path(monkeypatch, tmpdir, b"ab")
+        assert BufferedRandom(pool_size=4).getbytes(2) == b"xx"
+
+    def test_real_device(self):
+        # with real randomness we get numbers as usual
+        rnd = BufferedRandom(pool_size=64)
+        assert len(rnd.getbytes(100)) == 100
+        assert set(rnd.randbelow_many(6, 500)) == set(range(6))
+
+
+class TestBufferedSystemRandomSource(object):
+
+    def test_registered_as_buffered(self):
+        # the source is registered as 'buffered'
+        assert get_random_sources()['buffered'] == BufferedSystemRandomSource
+
+    def test_buffer_size(self):
+        # the buffer size can be set in options
+        assert handle_options([]).random_buffer_size == RANDOM_BUFFER_SIZE
+        options = handle_options(
+            ['-r', 'buffered', '--random-buffer-size', '128'])
+        assert options.random_buffer_size == 128
+        assert BufferedSystemRandomSource(options).rnd.pool_size == 128
+        src = BufferedSystemRandomSource(None)
+        assert src.rnd.pool_size == RANDOM_BUFFER_SIZE
+        assert isinstance(src.rnd, BufferedRandom)
+
+    def test_get_passphrases(self, wordlists_dir):
+        # we can generate passphrases with the buffered source
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(['-r', 'buffered', '-w', 'foo', '-n', '1'])
+        assert set(get_passphrases(options, 1000)) == set(["Foo", "Bar"])
+        assert set(get_passphrases(options, 10)) <= set(["Foo", "Bar"])
+
+
+class TestXofRandom(object):
+
+    def test_known_answers_shake256(self):
+        # SHAKE-256 output for a fixed seed
+        rnd = XofRandom(pool_size=64, xof_hash="shake256", seed=b"\x00" * 32)
+        assert binascii.hexlify(rnd.getbytes(64)) == (
+            b"52ec49d77164727b9a6219f64aee9466cc50af6b4bdd06a436894ff6fbbb189d"
+            b"f00bb61d501289a0df54704dc4dd3742057052088e073fc6afb6dda4e4fd0730")
+        assert binascii.hexlify(rnd.getbytes(16)) == (
+            b"22d18226522b3422dfc9227c19cf4ccf")
+
+    def test_known_answers_blake2b(self):
+        # BLAKE2b output for a fixed seed
+        rnd = XofRandom(pool_size=64, xof_hash="blake2b", seed=b"\x00" * 32)
+        assert binascii.hexlify(rnd.getbytes(64)) == (
+            b"a6afa8a4ab199803768d8ad51504f1109e9f5ec87d2f4ffd41065d2c5c42a56e"
+            b"8d46075cf3098dae051a51ae0c841204f029025fa5595cc615eb6e4c044c81c9")
+        assert binascii.hexlify(rnd.getbytes(16)) == (
+            b"6ddbaa674b3b6f545d38effca7c15f62")
+
+    def test_construction(self):
+        # output blocks are computed in counter mode with key erasure
+        seed = b"\x01" * 32
+        key = hashlib.shake_256(b"diceware-xof" + seed).digest(32)
+        block0 = hashlib.shake_256(key + b"\x00" * 8).digest(32 + 100)
+        key = block0[:32]
+        block1 = hashlib.shake_256(key + b"\x01" + b"\x00" * 7).digest(32 + 10)
+        rnd = XofRandom(pool_size=100, seed=seed)
+        assert rnd.getbytes(100) == block0[32:]
+        assert rnd.getbytes(10) == block1[32:]
+        assert rnd.key == block1[:32]
+        assert rnd.counter == 2
+        key = block1[:32]
+        blocks = [hashlib.blake2b(
+            b"\x02" + b"\x00" * 7 + bytes(bytearray([num])) + b"\x00" * 7,
+            key=key).digest() for num in (0, 1)]
+        rnd.xof_hash = "blake2b"
+        assert rnd.read(96) == b"".join(blocks)[32:]
+
+    def test_seeded_from_os(self, monkeypatch):
+        # w/o seed, we are seeded from the OS on first use
+        calls = []
+
+        def urandom(num):
+            calls.append(num)
+            return b"\x00" * num
+        monkeypatch.setattr("os.urandom", urandom)
+        rnd = XofRandom(pool_size=64)
+        assert calls == []
+        expected = XofRandom(pool_size=64, seed=b"\x00" * 32).getbytes(64)
+        assert rnd.getbytes(64) == expected
+        assert calls == [32]
+
+    def test_reseed_after_bytes(self, monkeypatch):
+        # we reseed after some amount of bytes delivered
+        calls = []
+        monkeypatch.setattr("os.urandom", lambda num: calls.append(num) or (
+            b"\x00" * num))
+        rnd = XofRandom(pool_size=64, reseed_bytes=128, seed=b"seed")
+        rnd.getbytes(128)
+        assert calls == []
+        key = rnd.key
+        rnd.getbytes(1)
+        assert calls == [32]
+        assert rnd.counter == 1 and rnd.delivered == 64
+        assert rnd.key != key
+
+    def test_reseed_after_interval(self, monkeypatch):
+        # we reseed after some time
+        now = [1000.0]
+        monkeypatch.setattr("time.time", lambda: now[0])
+        rnd = XofRandom(pool_size=8, reseed_interval=60, seed=b"seed")
+        rnd.getbytes(8)
+        now[0] += 59
+        rnd.getbytes(8)
+        assert rnd.seeded_at == 1000.0
+        now[0] += 1
+        rnd.getbytes(8)
+        assert rnd.seeded_at == 1060.0
+
+    def test_reseed_after_fork(self, monkeypatch):
+        # forked processes do not repeat the output of their parent
+        rnd = XofRandom(pool_size=8, seed=b"seed")
+        twin = XofRandom(pool_size=8, seed=b"seed")
+        assert rnd.getbytes(8) == twin.getbytes(8)
+        monkeypatch.setattr("os.getpid", lambda: rnd.pid + 1)
+        assert rnd.getbytes(8) != twin.getbytes(8)
+        assert rnd.seeded_pid == rnd.pid + 1
+
+    def test_unknown_hash(self):
+        # only supported hashes are accepted
+        with pytest.raises(ValueError):
+            XofRandom(xof_hash="md5")
+
+    def test_numbers(self):
+        # we can draw numbers as usual
+        rnd = XofRandom()
+        assert set(rnd.randbelow_many(6, 600)) == set(range(6))
+        assert rnd.choice("a") == "a"
+
+
+class TestXofRandomSource(object):
+
+    def test_registered_as_xof(self):
+        # the source is registered as 'xof'
+        assert get_random_sources()['xof'] == XofRandomSource
+
+    def test_options(self):
+        # hash and reseed budgets can be set in options
+        options = handle_options([])
+        assert options.xof_hash == "shake256"
+        assert options.reseed_bytes == XOF_RESEED_BYTES
+        assert options.reseed_interval == XOF_RESEED_INTERVAL
+        options = handle_options([
+            '-r', 'xof', '--xof-hash', 'blake2b', '--reseed-bytes', '1024',
+            '--reseed-interval', '10', '--random-buffer-size', '256'])
+        rnd = XofRandomSource(options).rnd
+        assert (rnd.xof_hash, rnd.reseed_bytes, rnd.reseed_interval) == (
+            "blake2b", 1024, 10)
+        assert rnd.pool_size == 256
+        assert XofRandomSource(None).rnd.xof_hash == "shake256"
+
+    def test_shared_buffer_size_argument(self):
+        # xof and buffered sources can update a parser in any order
+        for sources in [(XofRandomSource, BufferedSystemRandomSource),
+                        (BufferedSystemRandomSource, XofRandomSource)]:
+            parser = argparse.ArgumentParser()
+            for source in sources:
+                source.update_argparser(parser)
+            args = parser.parse_args(['--random-buffer-size', '64'])
+            assert args.random_buffer_size == 64
+
+    def test_help_with_xof_registered_first(self, capsys, monkeypatch):
+        # --help works, whatever order sources are registered in
+        sources = OrderedDict(sorted(
+            get_random_sources().items(), key=lambda x: x[0] != 'xof'))
+        monkeypatch.setattr("diceware.get_random_sources", lambda: sources)
+        with pytest.raises(SystemExit):
+            handle_options(['--help'])
+        assert capsys.readouterr()[0].count('random bytes to prefetch') == 1
+
+    def test_get_passphrases(self, wordlists_dir, monkeypatch):
+        # we can generate passphrases with the xof source
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(['-r', 'xof', '-w', 'foo', '-n', '1'])
+        assert set(get_passphrases(options, 1000)) == set(["Foo", "Bar"])
+        monkeypatch.setattr("diceware.numpy_engine.numpy", None)
+        assert set(get_passphrases(options, 1000)) == set(["Foo", "Bar"])
+
+
+class FakeProcess(object):
+    # a process that is not the main process
+    name = "Process-1"
+
+
+class TestHmacDrbg(object):
+
+    def test_nist_vector(self):
+        # NIST CAVP HMAC_DRBG SHA-256, no reseed, count 0
+        entropy = binascii.unhexlify(
+            "ca851911349384bffe89de1cbdc46e6831e44d34a4fb935ee285dd14b71a7488")
+        nonce = binascii.unhexlify("659ba96c601dc69fc902940805ec0ca8")
+        drbg = HmacDrbg(entropy + nonce)
+        drbg.generate(128)
+        assert binascii.hexlify(drbg.generate(128)) == (
+            b"e528e9abf2dece54d47c7e75e5fe302149f817ea9fb4bee6f4199697d04d5b89"
+            b"d54fbb978a15b5c443c9ec21036d2460b6f73ebad0dc2aba6e624abf07745bc1"
+            b"07694bb7547bb0995f70de25d6b29e2d3011bb19d27676c07162c8b5ccde0668"
+            b"961df86803482cb37ed6d5c0bb8d50cf1f50d476aa0458bdaba806f48be9dcb8")
+
+    def test_generate_sizes(self):
+        # we can get any number of bytes
+        drbg = HmacDrbg(b"seed")
+        assert drbg.generate(0) == b""
+        assert len(drbg.generate(1)) == 1
+        assert len(drbg.generate(33)) == 33
+
+
+class TestSeededRandom(object):
+
+    def test_reproducible(self):
+        # same seeds give same numbers
+        rnd1, rnd2 = SeededRandom(b"foo"), SeededRandom(b"foo")
+        assert rnd1.randbelow_many(1000, 50) == rnd2.randbelow_many(1000, 50)
+        assert rnd1.getbytes(5000) == rnd2.getbytes(5000)
+        assert SeededRandom(b"bar").getbytes(16) != SeededRandom(
+            b"foo").getbytes(16)
+
+    def test_known_answers(self):
+        # numbers are the same everywhere
+        rnd = SeededRandom(b"diceware")
+        assert rnd.randbelow_many(7776, 5) == [3965, 3675, 1203, 7430, 4586]
+
+    def test_fork(self, monkeypatch):
+        # forked processes do not repeat their parent
+        rnd, twin = SeededRandom(b"foo", 8), SeededRandom(b"foo", 8)
+        assert rnd.getbytes(8) == twin.getbytes(8)
+        expected = twin.getbytes(8)
+        pid = rnd.pid + 1
+        monkeypatch.setattr("os.getpid", lambda: pid)
+        assert rnd.getbytes(8) != expected
+        assert rnd.drbg_pid == pid
+
+
+class TestSeededRandomSource(object):
+
+    def test_registered_as_seeded(self):
+        # the source is registered as 'seeded'
+        assert get_random_sources()['seeded'] == SeededRandomSource
+
+    def test_warning(self, capsys):
+        # users are warned
+        SeededRandomSource(None)
+        out, err = capsys.readouterr()
+        assert "predictable" in err
+
+    def test_seed_option(self):
+        # we can set a seed
+        assert handle_options(['-r', 'seeded']).seed == ""
+        options = handle_options(['-r', 'seeded', '--seed', 'f\u00f6\u00f6'])
+        assert options.seed == "f\u00f6\u00f6"
+        src = SeededRandomSource(options)
+        expected = SeededRandom("f\u00f6\u00f6".encode("utf-8"))
+        assert src.sample_indices(100, 10) == expected.randbelow_many(100, 10)
+        assert src.choice("abc") == expected.choice("abc")
+        assert SeededRandomSource(None).rnd.getbytes(16) == SeededRandom(
+            b"").getbytes(16)
+
+    def test_worker_processes(self, monkeypatch, capsys):
+        # sources in worker processes do not warn
+        monkeypatch.setattr(
+            "multiprocessing.current_process", lambda: FakeProcess())
+        src = SeededRandomSource(None)
+        out, err = capsys.readouterr()
+        assert err == ""
+        assert src.rnd.getbytes(16) == SeededRandom(b"").getbytes(16)
+
+    def test_seed_chunk(self, capsys):
+        # chunks of parallel runs mix their index into the seed
+        src = SeededRandomSource(
+            handle_options(['-r', 'seeded', '--seed', 'foo']))
+        src.rnd.getbytes(16)
+        src.seed_chunk(4242)
+        expected = SeededRandom(b"foo" + struct.pack("<Q", 4242))
+        assert src.rnd.getbytes(16) == expected.getbytes(16)
+
+    def test_reproducible_passphrases(self, wordlists_dir, capsys):
+        # passphrases are reproducible, also in large batches
+        wordlists_dir.join("wordlist_foo.txt").write(
+            "\n".join([str(x) for x in range(100)]))
+        options = handle_options(
+            ['-r', 'seeded', '--seed', '42', '-w', 'foo', '-n', '3',
+             '-d', '-', '-s', '1'])
+        phrases = list(get_passphrases(options, 2000))
+        assert phrases[:3] == ["28-9-835", "87-40-92)", "40-5-76)"]
+        assert list(get_passphrases(options, 2000)) == phrases
+
+
+class ChoiceOnlySource(object):
+    # a random source without batch methods, counting calls
+
+    def __init__(self):
+        self.calls = 0
+
+    def choice(self, sequence):
+        self.calls += 1
+        return sequence[-1]
+
+
+class IndicesOnlySource(ChoiceOnlySource):
+    # a random source providing indices in batches
+
+    def sample_indices(self, n, k):
+        self.calls += 1
+        return [0] * k
+
+
+class ChoiceManySource(ChoiceOnlySource):
+    # a random source picking items in batches
+
+    def choice_many(self, sequence, k):
+        self.calls += 1
+        return [sequence[0]] * k
+
+
+class TestBatchSourceAdapter(object):
+
+    def test_as_batch_source(self):
+        # sources without batch methods are adapted
+        src = ChoiceOnlySource()
+        adapted = as_batch_source(src)
+        assert isinstance(adapted, BatchSourceAdapter)
+        assert adapted.rnd is src
+        assert isinstance(as_batch_source(ChoiceManySource()),
+                          BatchSourceAdapter)
+        assert adapted.choice("abc") == "c"
+
+    def test_choice_only(self):
+        # sources with `choice()` only are called once per item
+        src = ChoiceOnlySource()
+        adapted = BatchSourceAdapter(src)
+        assert adapted.choice_many("abc", 3) == ["c", "c", "c"]
+        assert adapted.sample_indices(4, 2) == [3, 3]
+        assert adapted.choice_many("abc", 0) == []
+        assert src.calls == 5
+
+    def test_indices_only(self):
+        # sources with batches of indices pick items with one call
+        src = IndicesOnlySource()
+        adapted = BatchSourceAdapter(src)
+        assert adapted.choice_many("abc", 3) == ["a", "a", "a"]
+        assert adapted.sample_indices(4, 2) == [0, 0]
+        assert src.calls == 2
+        assert adapted.choice_many("", 0) == []
+        with pytest.raises(IndexError):
+            adapted.choice_many("", 1)
+
+    def test_choice_many_only(self):
+        # sources picking items in batches deliver indices too
+        src = ChoiceManySource()
+        adapted = BatchSourceAdapter(src)
+        assert adapted.choice_many("abc", 3) == ["a", "a", "a"]
+        assert adapted.sample_indices(4, 2) == [0, 0]
+        assert src.calls == 2
+
+    def test_seeded(self, capsys):
+        # the seeded source provides batch methods
+        src = SeededRandomSource(None)
+        assert as_batch_source(src) is src
+        expected = SeededRandom(b"")
+        assert src.choice_many("abcdef", 5) == expected.choice_many(
+            "abcdef", 5)
+        assert src.sample_indices(10, 5) == expected.randbelow_many(10, 5)
+
+
 class TestRealDiceRandomSource(object):
 
     def test_raw_input_patch_works(self, capsys, fake_input):
@@ -366,12 +947,47 @@ class TestRealDiceRandomSource(object):
         assert src.get_num_rolls(3) == 1
         assert src.get_num_rolls(2**12 + 1) == 12
 
+    def test_choice_many(self, capsys, fake_input):
+        # we ask for the rolls of all items at once
+        fake_input(["1 2 3 4 5 6 1 1"])
+        src = RealDiceRandomSource(None)
+        assert as_batch_source(src) is src
+        assert src.choice_many(list(range(36)), 4) == [1, 15, 29, 0]
+        out, err = capsys.readouterr()
+        assert out.count("Please roll 8 dice (or a single dice 8 times).") == 1
+        assert out.count("Enter your 8 dice results") == 1
+
+    def test_choice_many_rerolls(self, capsys, fake_input):
+        # values out of range are rolled again, all at once
+        fake_input(["4 1 4 2", "3 4", "1"])
+        src = RealDiceRandomSource(argparse.Namespace(dice_sides=4))
+        assert src.choice_many([1, 2, 3], 4) == [1, 2, 3, 1]
+        out, err = capsys.readouterr()
+        assert out.count("Please roll dice again") == 2
+        assert "Enter your 2 dice results" in out
+        assert "Enter your 1 dice results" in out
+
+    def test_choice_many_special_cases(self, capsys, fake_input):
+        # we need no rolls for no items or sequences of len 1
+        src = RealDiceRandomSource(None)
+        assert src.choice_many("abc", 0) == []
+        assert src.choice_many("a", 3) == ["a", "a", "a"]
+        out, err = capsys.readouterr()
+        assert "roll" not in out
+
+    def test_sample_indices(self, fake_input):
+        # we can get random indices
+        fake_input(["6 1"])
+        src = RealDiceRandomSource(None)
+        assert src.sample_indices(6, 2) == [5, 0]
+
     def test_main_with_realdice_source(
             self, argv_handler, capsys, fake_input):
         # we can run main with `realdice` source of randomness
-        fake_input(["1", "3"])
+        fake_input(["1 3"])
         sys.stdin = StringIO("w1\nw2\nw3\nw4\nw5\nw6\n")
         sys.argv = ['diceware', '-r', 'realdice', '-n', '2', '-d', '#', '-']
         main()
         out, err = capsys.readouterr()
+        assert out.count("Please roll 2 dice") == 1
         assert out.endswith('W1#W3\n')
@@ -0,0 +1,184 @@
+import math
+import pytest
+import sys
+from diceware import (
+    SPECIAL_CHARS, PassphraseGenerator, get_passphrase, get_passphrases,
+    handle_options, main,
+)
+from diceware.random_sources import SystemRandomSource
+from diceware.template import (
+    CHAR_SLOTS, TemplatePlan, TemplateSlot, compile_template, parse_template,
+)
+
+
+class FakeRandom(object):
+    # pick the last item of each sequence
+
+    def choice(self, sequence):
+        return sequence[-1]
+
+
+class TestParseTemplate(object):
+
+    def test_parse_template(self):
+        # we can split templates into literals and slots
+        assert parse_template("") == []
+        assert parse_template("foo") == ["foo"]
+        assert parse_template("{en_eff}{digit:12}-{special}") == [
+            TemplateSlot("en_eff", 1), TemplateSlot("digit", 12), "-",
+            TemplateSlot("special", 1)]
+
+    def test_parse_template_escaped_braces(self):
+        # double braces give literal braces
+        assert parse_template("{{a}}{digit}}}") == [
+            "{a}", TemplateSlot("digit", 1), "}"]
+        assert parse_template("{{{digit}}}") == [
+            "{", TemplateSlot("digit", 1), "}"]
+
+    def test_parse_template_invalid(self):
+        # invalid templates are rejected
+        for template in ("{", "}", "a{b", "{a}}", "{a{b}"):
+            with pytest.raises(ValueError) as exc_info:
+                parse_template(template)
+            assert "Unbalanced brace" in str(exc_info.value)
+        for template in ("{}", "{a b}", "{a:}", "{a:x}", "{a:-1}", "{a:0}"):
+            with pytest.raises(ValueError) as exc_info:
+                parse_template(template)
+            assert "Invalid template slot" in str(exc_info.value)
+
+    def test_parse_template_wordlist_names(self):
+        # we can check slot names
+        assert parse_template("{foo}{digit}", ["foo"]) == [
+            TemplateSlot("foo", 1), TemplateSlot("digit", 1)]
+        with pytest.raises(ValueError) as exc_info:
+            parse_template("{bar}", ["foo"])
+        assert str(exc_info.value) == "Unknown template slot: {bar}"
+
+
+class TestTemplatePlan(object):
+
+    def test_compile_template(self, wordlists_dir):
+        # templates are compiled into plans
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        options = handle_options(args=[])
+        plan = compile_template("{foo:2}%{digit}", options)
+        assert isinstance(plan, TemplatePlan)
+        assert plan.fmt == "%s%s%%%s"
+        assert [list(x) for x in plan.schedule[:2]] == [["Foo", "Bar"]] * 2
+        assert plan.schedule[2] == CHAR_SLOTS["digit"]
+        assert plan.schedule[0] is plan.schedule[1]
+        assert plan.runs == [
+            (plan.schedule[0], 2), (CHAR_SLOTS["digit"], 1)]
+        assert plan.slot_entropies == [
+            (TemplateSlot("foo", 2), 2.0),
+            (TemplateSlot("digit", 1), math.log(10, 2))]
+        assert plan.entropy == 2.0 + math.log(10, 2)
+
+    def test_compile_template_transforms(self, wordlists_dir):
+        # words are transformed, chars of char slots are not
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(args=['--transform', 'upper'])
+        plan = compile_template("{foo}{special}", options)
+        assert list(plan.schedule[0]) == ["FOO"]
+        assert plan.schedule[1] == SPECIAL_CHARS
+
+    def test_compile_template_errors(self, wordlists_dir):
+        # unknown and empty wordlists are rejected
+        wordlists_dir.join("wordlist_empty.txt").write("\n")
+        options = handle_options(args=[])
+        with pytest.raises(ValueError) as exc_info:
+            compile_template("{foo}", options)
+        assert str(exc_info.value) == "Unknown template slot: foo"
+        with pytest.raises(ValueError) as exc_info:
+            compile_template("foo", options)
+        assert str(exc_info.value) == "Template without slots: foo"
+        with pytest.raises(ValueError) as exc_info:
+            compile_template("{empty}", options)
+        assert str(exc_info.value) == "Empty wordlist: empty"
+
+    def test_generate(self, wordlists_dir):
+        # plans make passphrases
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        plan = compile_template("{{{foo}-{digit:2}}}", handle_options([]))
+        assert plan.generate(FakeRandom()) == "{Bar-99}"
+        assert plan.format(["Foo", "1", "2"]) == "{Foo-12}"
+
+    def test_generate_many(self, wordlists_dir, monkeypatch):
+        # plans make batches of passphrases, also without numpy
+        wordlists_dir.join("wordlist_foo.txt").write("foo\nbar\n")
+        plan = compile_template("{foo} {digit}", handle_options([]))
+        rnd = SystemRandomSource(None)
+        expected = set(["%s %s" % (word, num)
+                        for word in ("Foo", "Bar") for num in range(10)])
+        phrases = list(plan.generate_many(rnd, 2000))
+        assert len(phrases) == 2000
+        assert set(phrases) == expected
+        monkeypatch.setattr("diceware.numpy_engine.numpy", None)
+        phrases = list(plan.generate_many(rnd, 1000))
+        assert len(phrases) == 1000
+        assert set(phrases) == expected
+        assert list(plan.generate_many(FakeRandom(), 2)) == ["Bar 9"] * 2
+
+
+class TestTemplateOptions(object):
+
+    def test_handle_options_template(self, wordlists_dir, capsys):
+        # templates are checked when options are parsed
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        assert handle_options([]).template is None
+        options = handle_options(['-t', '{foo}{digit}'])
+        assert options.template == '{foo}{digit}'
+        with pytest.raises(SystemExit):
+            handle_options(['--template', '{bar}'])
+        out, err = capsys.readouterr()
+        assert "Unknown template slot: {bar}" in err
+
+    def test_handle_options_template_no_slots(self, capsys):
+        # templates without slots would give constant passphrases
+        for template in ("abc", "{{digit}}"):
+            with pytest.raises(SystemExit):
+                handle_options(['-t', template])
+            out, err = capsys.readouterr()
+            assert "Template without slots: %s" % template in err
+
+    def test_handle_options_template_infile(self, capsys):
+        # wordlist files cannot be given with templates
+        with pytest.raises(SystemExit):
+            handle_options(['-t', '{digit}', 'mywordlist.txt'])
+        out, err = capsys.readouterr()
+        assert "INFILE cannot be used with --template" in err
+
+    def test_get_passphrase(self, wordlists_dir):
+        # other options are ignored with templates
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(
+            ['-t', 'x{foo}x', '-n', '3', '-d', '-', '-s', '2', '-w', 'foo',
+             '--single-pass'])
+        assert get_passphrase(options) == "xFoox"
+        assert list(get_passphrases(options, 2)) == ["xFoox"] * 2
+
+    def test_passphrase_generator(self, wordlists_dir):
+        # we can create generators for templates
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        generator = PassphraseGenerator(template="{foo}{foo}", caps=False)
+        assert generator.generate() == "foofoo"
+        assert list(generator.generate_many(2)) == ["foofoo"] * 2
+        assert generator.wordlists == []
+
+    def test_parallel(self, wordlists_dir):
+        # templates work in worker processes
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        options = handle_options(['-t', '{foo}-{foo}', '-j', '2'])
+        assert list(get_passphrases(options, 5)) == ["Foo-Foo"] * 5
+
+    def test_main(self, argv_handler, capsys, wordlists_dir):
+        # we can use templates from the command line
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        sys.argv = ['diceware', '-t', '{foo}{special:2}', '-N', '3']
+        main()
+        out, err = capsys.readouterr()
+        lines = out.splitlines()
+        assert len(lines) == 3
+        for line in lines:
+            assert line[:3] == "Foo"
+            assert line[3] in SPECIAL_CHARS and line[4] in SPECIAL_CHARS
@@ -1,13 +1,22 @@
+import logging
 import math
 import os
 import pytest
+import stat
 import sys
+import time
 from io import StringIO
 from diceware.wordlist import (
     get_wordlist_dirs, get_wordlists_dir, RE_WORDLIST_NAME,
     RE_NUMBERED_WORDLIST_ENTRY, RE_VALID_WORDLIST_FILENAME, get_wordlist_path,
-    get_wordlist_names, WordList,
+    get_wordlist_names, WordList, WordlistRegistry, registry,
+    WordListCache, load_wordlist, wordlist_cache,
+    FORMAT_NUMBERED, FORMAT_PLAIN, detect_format, iter_entry_chunks,
+    parse_wordlist, refine_entries, refine_numbered, compile_wordlist,
+    COMPRESSED_OPENERS, open_wordlist_file, WORD_TRANSFORMS, ascii_fold,
+    transform_words,
 )
+from diceware.packed import PackedWordList, read_header
 
 
 @pytest.fixture(scope="function")
@@ -98,10 +107,15 @@ class TestWordlistModule(object):
         assert regexp.match("wordlist_en_eff.txt") is not None
         assert regexp.match("wordlist_en_orig.asc") is not None
         assert regexp.match("wordlist_en_securedrop.asc") is not None
+        assert regexp.match("wordlist_foo.txt.gz") is not None
+        assert regexp.match("wordlist_foo.txt.xz") is not None
+        assert regexp.match("wordlist_foo.txt.bz2") is not None
+        assert regexp.match("wordlist_foo.txt.zst") is not None
         # We can get the internal wordlist name
         assert regexp.match("wordlist_foo.txt").groups()[0] == "foo"
         assert regexp.match(
             "wordlist_foo_bar.asc").groups()[0] == "foo_bar"
+        assert regexp.match("wordlist_foo.txt.gz").groups()[0] == "foo"
         assert regexp.match(
             "wordlist_name-with.dots.txt.asc").groups()[0] == "name-with"
         # Invalid names
@@ -187,6 +201,336 @@ class TestWordlistModule(object):
         assert get_wordlist_names() == []
 
 
+class TestParseWordlist(object):
+
+    def parse_per_line(self, path):
+        # parse a wordlist the traditional way, line by line
+        w_list = WordList(path)
+        signed = w_list.signed
+        w_list.fd.seek(0)
+        if signed:
+            while w_list.fd.readline().strip():
+                pass
+        result = []
+        for line in w_list.fd:
+            line = w_list.refine_entry(line)
+            if not line:
+                continue
+            elif signed and line == '-----BEGIN PGP SIGNATURE-----':
+                break
+            result.append(line)
+        return result
+
+    def test_refine_numbered(self):
+        # numbered entries are refined like with RE_NUMBERED_WORDLIST_ENTRY
+        assert refine_numbered("11111\tfoo") == "foo"
+        assert refine_numbered("1-2-3 foo") == "foo"
+        assert refine_numbered("11111 foo bar") == "11111 foo bar"
+        assert refine_numbered("12a11 foo") == "12a11 foo"
+        assert refine_numbered("1211- foo") == "1211- foo"
+        assert refine_numbered("\u0661\u0662 foo") == "\u0661\u0662 foo"
+        assert refine_numbered("foo") == "foo"
+        assert refine_numbered("11111") == "11111"
+
+    def test_detect_format(self):
+        # we can tell numbered from plain entries
+        assert detect_format("11111 foo") == FORMAT_NUMBERED
+        assert detect_format("1-1 foo") == FORMAT_NUMBERED
+        assert detect_format("foo") == FORMAT_PLAIN
+        assert detect_format("11111") == FORMAT_PLAIN
+
+    def test_refine_entries(self):
+        # both fast paths deliver the same results
+        entries = ["11111 foo", "bar", "1-2 baz", "2 x y", "3"]
+        expected = ["foo", "bar", "baz", "2 x y", "3"]
+        assert refine_entries(entries, FORMAT_NUMBERED) == expected
+        assert refine_entries(entries, FORMAT_PLAIN) == expected
+
+    def test_iter_entry_chunks(self, monkeypatch):
+        # we get chunks of stripped, non-empty entries
+        monkeypatch.setattr("diceware.wordlist.PARSE_CHUNK_SIZE", 1)
+        fd = StringIO(" foo \n\nbar\nbaz\n")
+        chunks = list(iter_entry_chunks(fd))
+        assert len(chunks) > 1
+        assert sum(chunks, []) == ["foo", "bar", "baz"]
+
+    def test_iter_entry_chunks_signed(self, monkeypatch):
+        # signed headers are detected and signatures ignored
+        monkeypatch.setattr("diceware.wordlist.PARSE_CHUNK_SIZE", 1)
+        fd = StringIO(
+            "-----BEGIN PGP SIGNED MESSAGE-----\nHash: SHA512\n\n"
+            "foo\n- -bar\n-----BEGIN PGP SIGNATURE-----\nbaz\n")
+        chunks = list(iter_entry_chunks(fd))
+        assert len(chunks) > 1
+        assert sum(chunks, []) == ["foo", "-bar"]
+
+    def test_iter_entry_chunks_signed_given(self):
+        # we can tell whether a wordlist is signed
+        fd = StringIO("Hash: SHA512\n\n- foo\n")
+        assert list(iter_entry_chunks(fd, signed=True)) == [["foo"]]
+        fd = StringIO("- foo\n")
+        assert list(iter_entry_chunks(fd, signed=False)) == [["- foo"]]
+
+    def test_parse_wordlist_empty(self):
+        # we can parse empty wordlists
+        assert list(parse_wordlist(StringIO(""))) == []
+        assert list(parse_wordlist(StringIO("\n \n"))) == []
+
+    def test_parse_wordlist_mixed(self, monkeypatch):
+        # the format is detected once but all entries are refined
+        monkeypatch.setattr("diceware.wordlist.PARSE_CHUNK_SIZE", 1)
+        fd = StringIO("\n11111 foo\nbar\n\n2-2 baz\n")
+        assert list(parse_wordlist(fd)) == ["foo", "bar", "baz"]
+        fd = StringIO("foo\n11111 bar\n")
+        assert list(parse_wordlist(fd)) == ["foo", "bar"]
+
+    def test_parse_wordlist_like_per_line(self):
+        # bulk parsing and parsing per line give same results
+        wordlists_dir = get_wordlists_dir()
+        paths = [os.path.join(wordlists_dir, name)
+                 for name in os.listdir(wordlists_dir)
+                 if not name.endswith(".dwl")]
+        paths.append(os.path.join(
+            os.path.dirname(__file__), "sample_signed_wordlist.asc"))
+        for path in paths:
+            with open(path, "r") as fd:
+                assert list(parse_wordlist(fd)) == self.parse_per_line(path)
+
+
+def write_compressed(path, data):
+    # write `data` compressed as indicated by filename extension of `path`
+    opener = COMPRESSED_OPENERS[os.path.splitext(str(path))[1]]
+    with opener(str(path), "wb") as fd:
+        fd.write(data.encode("utf-8"))
+
+
+class TestCompressedWordlists(object):
+
+    def test_compressed_openers(self):
+        # we support common compression formats
+        assert ".gz" in COMPRESSED_OPENERS
+        assert ".bz2" in COMPRESSED_OPENERS
+        if sys.version_info >= (3, ):
+            assert ".xz" in COMPRESSED_OPENERS
+
+    def test_open_wordlist_file(self, tmpdir):
+        # we can read plain and compressed wordlist files
+        path = tmpdir.join("wordlist_foo.txt")
+        path.write("foo\nbär\n")
+        with open_wordlist_file(str(path)) as fd:
+            assert fd.read() == "foo\nbär\n"
+        for ext in COMPRESSED_OPENERS:
+            path = tmpdir.join("wordlist_foo.txt" + ext)
+            write_compressed(path, "foo\nbär\n")
+            with open_wordlist_file(path) as fd:
+                assert fd.read() == "foo\nbär\n"
+
+    def test_zstd(self):
+        # with zstd available, we support zstd-compressed wordlists
+        try:
+            from compression import zstd  # NOQA: F401
+        except ImportError:
+            pytest.importorskip("backports.zstd")
+        assert ".zst" in COMPRESSED_OPENERS
+
+    def test_wordlist_compressed(self, tmpdir):
+        # WordList reads compressed wordlists, also signed ones
+        signed = os.path.join(
+            os.path.dirname(__file__), "sample_signed_wordlist.asc")
+        with open(signed, "r") as fd:
+            signed_data = fd.read()
+        for ext in COMPRESSED_OPENERS:
+            path = tmpdir.join("wordlist_foo.txt" + ext)
+            write_compressed(path, "foo\n\n  bar\n")
+            assert list(WordList(str(path))) == ["foo", "bar"]
+            path = tmpdir.join("wordlist_signed.asc" + ext)
+            write_compressed(path, signed_data)
+            w_list = WordList(str(path))
+            assert w_list.signed is True
+            assert list(w_list) == list(WordList(signed))
+
+    def test_wordlist_compressed_cached(self, tmpdir, home_dir):
+        # refined words of compressed wordlists are cached
+        path = tmpdir.join("wordlist_foo.txt.gz")
+        write_compressed(path, "foo\nbar\n")
+        past = time.time() - 100
+        os.utime(str(path), (past, past))
+        assert len(WordList(str(path))) == 2
+        w_list = WordList(str(path))
+        assert w_list.fd is None
+        assert list(w_list) == ["foo", "bar"]
+
+    def test_get_wordlist_path_compressed(self, wordlists_dir):
+        # compressed wordlists are found in wordlist dirs
+        path = wordlists_dir.join("wordlist_foo.txt.gz")
+        write_compressed(path, "foo\n")
+        assert get_wordlist_names() == ["foo"]
+        assert get_wordlist_path("foo") == str(path)
+
+    def test_compile_compressed(self, tmpdir):
+        # we can compile compressed wordlists
+        path = tmpdir.join("mylist.txt.gz")
+        write_compressed(path, "foo\n")
+        out_path = compile_wordlist(str(path))
+        assert out_path == str(tmpdir / "mylist.dwl")
+        assert list(WordList(out_path)) == ["foo"]
+        path = tmpdir.join("wordlist_bar.txt.bz2")
+        write_compressed(path, "bar\n")
+        assert compile_wordlist(str(path)) == str(tmpdir / "wordlist_bar.dwl")
+
+
+class TestWordlistRegistry(object):
+
+    def make_old(self, path, age=100):
+        # set mtime of `path` `age` seconds into the past
+        past = time.time() - age
+        os.utime(str(path), (past, past))
+
+    def counting_registry(self, monkeypatch):
+        # get a registry that counts dir scans
+        reg = WordlistRegistry()
+        reg.scans = []
+        orig_scan_dir = reg.scan_dir
+
+        def scan_dir(path):
+            reg.scans.append(path)
+            return orig_scan_dir(path)
+        monkeypatch.setattr(reg, "scan_dir", scan_dir)
+        return reg
+
+    def test_get_names(self, wordlists_dir):
+        # we can get sorted names of wordlists
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        wordlists_dir.join("wordlist_bar.asc").write("bar\n")
+        wordlists_dir.join("not-a-wordlist.txt").write("baz\n")
+        wordlists_dir.mkdir("wordlist_subdir.txt")
+        assert WordlistRegistry().get_names() == ["bar", "foo"]
+
+    def test_get_names_unique(self, wordlists_dir):
+        # names provided by several files are listed once
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        wordlists_dir.join("wordlist_foo.dwl").write("foo\n")
+        assert WordlistRegistry().get_names() == ["foo"]
+
+    def test_get_entry_prefers_packed(self, wordlists_dir):
+        # packed wordlists are preferred over text files of same name
+        wordlists_dir.join("wordlist_foo.asc").write("foo\n")
+        packed = wordlists_dir.join("wordlist_foo.dwl")
+        packed.write("foo\n")
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        assert WordlistRegistry().get_entry("foo").path == str(packed)
+
+    def test_get_entry_outdated_packed(self, wordlists_dir, caplog):
+        # packed wordlists older than their source are not used
+        caplog.set_level(logging.WARNING, logger="ulif.diceware")
+        source = wordlists_dir.join("wordlist_foo.txt")
+        source.write("foo\n")
+        other = wordlists_dir.join("wordlist_foo.asc")
+        other.write("bar\n")
+        packed = compile_wordlist(str(source))
+        reg = WordlistRegistry()
+        assert reg.get_entry("foo").path == packed
+        other.write("baz\n")
+        assert reg.get_entry("foo").path == packed
+        assert caplog.text == ""
+        source.write("foo\nbar\n")
+        assert reg.get_entry("foo").path == str(source)
+        assert "Packed wordlist %s is outdated" % packed in caplog.text
+        past = time.time() - 100
+        compile_wordlist(str(source))
+        os.utime(str(source), (past, past))
+        assert reg.get_entry("foo").path == str(source)
+
+    def test_get_entry_source_vanished(self, wordlists_dir, monkeypatch):
+        # if we cannot stat a source file, packed wordlists are used
+        source = wordlists_dir.join("wordlist_foo.txt")
+        source.write("foo\n")
+        packed = compile_wordlist(str(source))
+
+        def get_source_id(path):
+            raise OSError("gone")
+        monkeypatch.setattr("diceware.wordlist.get_source_id", get_source_id)
+        assert WordlistRegistry().get_entry("foo").path == packed
+
+    def test_get_entry(self, wordlists_dir):
+        # we get path and metadata of wordlists
+        path = wordlists_dir.join("wordlist_foo.txt")
+        path.write("foo\n")
+        entry = WordlistRegistry().get_entry("foo")
+        assert entry.name == "foo"
+        assert entry.path == str(path)
+        assert entry.size == 4
+        assert entry.mtime == os.stat(str(path)).st_mtime
+        assert WordlistRegistry().get_entry("bar") is None
+
+    def test_dirs_are_scanned_once(self, wordlists_dir, monkeypatch):
+        # unchanged dirs are not scanned again
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        self.make_old(wordlists_dir)
+        reg = self.counting_registry(monkeypatch)
+        assert reg.get_names() == ["foo"]
+        assert reg.get_entry("foo").name == "foo"
+        assert reg.get_entry("bar") is None
+        assert reg.scans == [str(wordlists_dir)]
+
+    def test_changed_dirs_are_rescanned(self, wordlists_dir, monkeypatch):
+        # we notice changes of wordlist dirs
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        self.make_old(wordlists_dir, 200)
+        reg = self.counting_registry(monkeypatch)
+        assert reg.get_names() == ["foo"]
+        wordlists_dir.join("wordlist_bar.txt").write("bar\n")
+        self.make_old(wordlists_dir, 100)
+        assert reg.get_names() == ["bar", "foo"]
+        assert len(reg.scans) == 2
+
+    def test_recently_changed_dirs_are_rescanned(
+            self, wordlists_dir, monkeypatch):
+        # dirs modified right now are not trusted
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        reg = self.counting_registry(monkeypatch)
+        reg.get_names()
+        reg.get_names()
+        assert len(reg.scans) == 2
+        assert reg.dirs == {}
+
+    def test_removed_dirs(self, wordlists_dir, monkeypatch):
+        # removed dirs are forgotten
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        self.make_old(wordlists_dir)
+        reg = WordlistRegistry()
+        assert reg.get_names() == ["foo"]
+        assert str(wordlists_dir) in reg.dirs
+        wordlists_dir.remove()
+        assert reg.get_names() == []
+        assert reg.dirs == {}
+
+    def test_clear(self, wordlists_dir, monkeypatch):
+        # we can clear the registry
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        self.make_old(wordlists_dir)
+        reg = self.counting_registry(monkeypatch)
+        reg.get_names()
+        reg.clear()
+        reg.get_names()
+        assert len(reg.scans) == 2
+
+    def test_scan_dir_ignores_vanished_files(self, wordlists_dir, monkeypatch):
+        # files removed while scanning are ignored
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        monkeypatch.setattr(
+            "os.listdir", lambda path: ["wordlist_bar.txt", "wordlist_foo.txt"])
+        entries = WordlistRegistry().scan_dir(str(wordlists_dir))
+        assert [x.name for x in entries] == ["foo"]
+
+    def test_module_registry(self, wordlists_dir):
+        # `get_wordlist_path` and `get_wordlist_names` use the registry
+        wordlists_dir.join("wordlist_foo.txt").write("foo\n")
+        self.make_old(wordlists_dir)
+        get_wordlist_names()
+        assert str(wordlists_dir) in registry.dirs
+
+
 class TestWordList(object):
 
     def test_create_wordlist(self, tmpdir):
@@ -287,6 +631,22 @@ class TestWordList(object):
         w_list = WordList("-")
         assert list(w_list) == ['foo', 'bar']
 
+    def test_get_wordlist_stdin_chunked(self, argv_handler, monkeypatch):
+        # stdin is copied in chunks, larger input is spooled to disk
+        class ChunkedInput(StringIO):
+            sizes = []
+
+            def read(self, size=-1):
+                self.sizes.append(size)
+                return StringIO.read(self, size)
+        monkeypatch.setattr("diceware.wordlist.MAX_IN_MEM_SIZE", 20)
+        monkeypatch.setattr("diceware.wordlist.COPY_CHUNK_SIZE", 8)
+        sys.stdin = ChunkedInput("foo\nbar\n" * 5)
+        w_list = WordList("-")
+        assert list(w_list) == ["foo", "bar"] * 5
+        assert w_list.fd._rolled is True
+        assert set(sys.stdin.sizes) == set([8])
+
     def test_get_wordlist_ignore_empty_lines(self, tmpdir):
         # we ignore empty lines in wordlists
         in_file = tmpdir.mkdir("work").join("mywordlist")
@@ -371,3 +731,370 @@ class TestWordList(object):
         # we can do all the things above at once and in right order.
         wordlist.signed = True
         assert wordlist.refine_entry("- 11111 foo  \n") == "foo"
+
+    def test_packed(self, tmpdir):
+        # we can get wordlists as `PackedWordList`
+        in_file = tmpdir.join("mywordlist")
+        in_file.write("foo\n\nbar\n")
+        w_list = WordList(str(in_file))
+        packed = w_list.packed()
+        assert isinstance(packed, PackedWordList)
+        assert len(packed) == 2
+        assert packed[1] == "bar"
+        assert w_list.packed() is packed
+        assert list(w_list) == ["foo", "bar"]
+
+    def test_sequence_protocol(self, tmpdir):
+        # wordlists provide len() and indexes
+        in_file = tmpdir.join("mywordlist")
+        in_file.write("foo\n\n11111 bar\nbaz\n")
+        w_list = WordList(str(in_file))
+        assert len(w_list) == 3
+        assert w_list[0] == "foo"
+        assert w_list[1] == "bar"
+        assert w_list[-1] == "baz"
+        with pytest.raises(IndexError):
+            w_list[3]
+        assert w_list.packed() is w_list.packed()
+
+    def test_sequence_random_choice(self, tmpdir):
+        # wordlists can be used with random.choice directly
+        import random
+        in_file = tmpdir.join("mywordlist")
+        in_file.write("foo\nbar\n")
+        w_list = WordList(str(in_file))
+        assert random.SystemRandom().choice(w_list) in ["foo", "bar"]
+
+    def test_packed_stdin(self, argv_handler):
+        # also wordlists from stdin can be packed
+        sys.stdin = StringIO("foo\nbar\n")
+        packed = WordList("-").packed()
+        assert list(packed) == ["foo", "bar"]
+
+    def test_packed_is_cached(self, tmpdir):
+        # packed wordlists are cached and reloaded from cache
+        in_file = tmpdir.join("mywordlist")
+        in_file.write("11111 foo\n\nbar\n")
+        past = time.time() - 100
+        os.utime(str(in_file), (past, past))
+        assert list(WordList(str(in_file)).packed()) == ["foo", "bar"]
+        w_list = WordList(str(in_file))
+        assert w_list.fd is None
+        assert w_list.signed is False
+        assert w_list.is_signed() is False
+        assert list(w_list) == ["foo", "bar"]
+        assert w_list.packed()[0] == "foo"
+
+    def test_signed_wordlist_is_cached(self, tmpdir):
+        # the signed flag survives caching
+        in_path = os.path.join(
+            os.path.dirname(__file__), "sample_signed_wordlist.asc")
+        in_file = tmpdir.join("signed.asc")
+        with open(in_path, "r") as fd:
+            in_file.write(fd.read())
+        past = time.time() - 100
+        os.utime(str(in_file), (past, past))
+        WordList(str(in_file)).packed()
+        w_list = WordList(str(in_file))
+        assert w_list.fd is None
+        assert w_list.signed is True
+        assert list(w_list) == ["foo", "bar", "-dash-at-start", "baz"]
+
+    def test_transformed(self, wordlist):
+        # we can get transformed words, computed only once
+        assert wordlist.transformed([]) is wordlist
+        words = wordlist.transformed(["capitalize"])
+        assert isinstance(words, PackedWordList)
+        assert list(words) == ["Foo", "Bar"]
+        assert words[1] == "Bar"
+        assert wordlist.transformed(("capitalize", )) is words
+        assert list(wordlist.transformed(["upper", "ascii"])) == [
+            "FOO", "BAR"]
+        assert list(wordlist) == ["foo", "bar"]
+        assert wordlist.size == sum([
+            len(x.mmap) for x in (wordlist.packed(), words,
+                                  wordlist.transformed(["upper", "ascii"]))])
+
+    def test_transformed_is_cached(self, tmpdir, monkeypatch):
+        # transformed words are cached and reloaded from cache
+        in_file = tmpdir.join("mywordlist")
+        in_file.write("foo\nbar\n")
+        past = time.time() - 100
+        os.utime(str(in_file), (past, past))
+        WordList(str(in_file)).transformed(["upper"])
+        monkeypatch.setattr(
+            "diceware.wordlist.iter_transformed", lambda words, names: 1 / 0)
+        w_list = WordList(str(in_file))
+        assert list(w_list.transformed(["upper"])) == ["FOO", "BAR"]
+        assert list(w_list) == ["foo", "bar"]
+        with pytest.raises(ZeroDivisionError):
+            w_list.transformed(["lower"])
+
+
+class TestWordTransforms(object):
+
+    def test_ascii_fold(self):
+        # we can replace letters with diacritics
+        assert ascii_fold(u"caf\u00e9") == u"cafe"
+        assert ascii_fold(u"\u00c5ngstr\u00f6m") == u"Angstrom"
+        assert ascii_fold(u"\u0141\u00f3d\u017a") == u"Lodz"
+        assert ascii_fold(u"\u00df\u00e6") == u"ssae"
+        assert ascii_fold(u"foo-bar") == u"foo-bar"
+        # chars without ASCII replacement are kept
+        assert ascii_fold(u"\u65e5\u672c") == u"\u65e5\u672c"
+        assert ascii_fold(u"\ud55c") == u"\ud55c"
+
+    def test_transform_words(self):
+        # we can apply transforms in order
+        words = ["foo", "B\u00e4R"]
+        assert transform_words(words, []) == words
+        assert transform_words(words, ["capitalize"]) == ["Foo", "B\u00e4r"]
+        assert transform_words(words, ["upper"]) == ["FOO", "B\u00c4R"]
+        assert transform_words(words, ["lower", "ascii"]) == ["foo", "bar"]
+        assert transform_words(
+            iter(words), ["upper", "capitalize"]) == ["Foo", "B\u00e4r"]
+
+    def test_word_transforms(self):
+        # all transforms are registered in order
+        assert list(WORD_TRANSFORMS) == [
+            "capitalize", "upper", "lower", "ascii"]
+
+
+class TestWordListCache(object):
+
+    def make_wordlist(self, tmpdir, name, content="foo\nbar\n", age=100):
+        # create a wordlist file modified `age` seconds ago
+        path = tmpdir.join(name)
+        path.write(content)
+        past = time.time() - age
+        os.utime(str(path), (past, past))
+        return str(path)
+
+    def test_get(self, tmpdir):
+        # we can get wordlists, cached ones are reused
+        path = self.make_wordlist(tmpdir, "wlist1")
+        cache = WordListCache()
+        w_list = cache.get(path)
+        assert list(w_list) == ["foo", "bar"]
+        assert cache.get(path) is w_list
+        assert len(cache) == 1
+
+    def test_get_relative_path(self, tmpdir):
+        # relative and absolute paths share an entry
+        path = self.make_wordlist(tmpdir, "wlist1")
+        tmpdir.chdir()
+        cache = WordListCache()
+        assert cache.get("wlist1") is cache.get(path)
+
+    def test_get_changed_file(self, tmpdir):
+        # changed files are reloaded
+        path = self.make_wordlist(tmpdir, "wlist1")
+        cache = WordListCache()
+        w_list = cache.get(path)
+        self.make_wordlist(tmpdir, "wlist1", "baz\n", 50)
+        w_list2 = cache.get(path)
+        assert w_list2 is not w_list
+        assert list(w_list2) == ["baz"]
+        assert len(cache) == 1
+
+    def test_get_nonexisting(self, tmpdir):
+        # non-existing files raise errors
+        cache = WordListCache()
+        with pytest.raises(OSError):
+            cache.get(str(tmpdir / "not-existing"))
+
+    def test_get_recent_files_not_cached(self, tmpdir):
+        # files modified right now are not cached
+        path = self.make_wordlist(tmpdir, "wlist1", age=0)
+        cache = WordListCache()
+        assert cache.get(path) is not cache.get(path)
+        assert len(cache) == 0
+
+    def test_get_stdin_not_cached(self, argv_handler):
+        # wordlists from stdin are never cached
+        sys.stdin = StringIO("foo\n")
+        cache = WordListCache()
+        assert list(cache.get("-")) == ["foo"]
+        assert len(cache) == 0
+
+    def test_max_entries(self, tmpdir):
+        # least recently used wordlists are dropped first
+        paths = [self.make_wordlist(tmpdir, "wlist%s" % x) for x in range(3)]
+        cache = WordListCache(max_entries=2)
+        w_list0 = cache.get(paths[0])
+        cache.get(paths[1])
+        assert cache.get(paths[0]) is w_list0
+        cache.get(paths[2])
+        assert len(cache) == 2
+        assert list(cache.entries) == [paths[0], paths[2]]
+
+    def test_max_bytes(self, tmpdir):
+        # we can limit the size of cached wordlists
+        paths = [self.make_wordlist(tmpdir, "wlist%s" % x) for x in range(3)]
+        cache = WordListCache()
+        size = len(cache.get(paths[0]).packed().mmap)
+        assert cache.size == size
+        cache.clear()
+        cache.max_bytes = 2 * size
+        for path in paths:
+            cache.get(path)
+        assert list(cache.entries) == paths[1:]
+        assert cache.size == 2 * size
+        cache.max_bytes = 0
+        cache.get(paths[0])
+        assert len(cache) == 0
+
+    def test_get_transformed(self, tmpdir):
+        # we can get transformed views, counted in cache size
+        path = self.make_wordlist(tmpdir, "wlist1")
+        cache = WordListCache()
+        w_list = cache.get(path)
+        size = cache.size
+        words = cache.get(path, ["upper"])
+        assert list(words) == ["FOO", "BAR"]
+        assert w_list.transformed(["upper"]) is words
+        assert cache.size == size + len(words.mmap)
+        cache.max_bytes = cache.size - 1
+        assert cache.get(path, ["upper"]) is words
+        assert len(cache) == 0
+
+    def test_get_transformed_not_cached(self, tmpdir, argv_handler):
+        # transformed views are made for wordlists not cached as well
+        path = self.make_wordlist(tmpdir, "wlist1", age=0)
+        cache = WordListCache()
+        assert list(cache.get(path, ["upper"])) == ["FOO", "BAR"]
+        sys.stdin = StringIO("foo\n")
+        assert list(cache.get("-", ["upper"])) == ["FOO"]
+        assert len(cache) == 0
+
+    def test_clear(self, tmpdir):
+        # we can clear the cache
+        path = self.make_wordlist(tmpdir, "wlist1")
+        cache = WordListCache()
+        cache.get(path)
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_load_wordlist(self, tmpdir):
+        # load_wordlist() uses the process-wide cache
+        path = self.make_wordlist(tmpdir, "wlist1")
+        w_list = load_wordlist(path)
+        assert load_wordlist(path) is w_list
+        assert path in wordlist_cache.entries
+        wordlist_cache.clear()
+
+
+class TestCompileWordlist(object):
+
+    def test_compile_wordlist(self, tmpdir):
+        # we can compile wordlists into packed wordlists
+        path = tmpdir.join("wordlist_foo.txt")
+        path.write("foo\nbar\n\n")
+        out_path = compile_wordlist(str(path))
+        assert out_path == str(tmpdir / "wordlist_foo.dwl")
+        w_list = WordList(out_path)
+        assert list(w_list) == ["foo", "bar"]
+        assert w_list.fd is None
+        assert w_list.signed is False
+        with open(out_path, "rb") as fd:
+            header = read_header(fd.read())
+        assert header.source_path == "wordlist_foo.txt"
+        assert header.source_size == 9
+
+    def test_compile_wordlist_other_names(self, tmpdir):
+        # other filenames only lose their extension
+        path = tmpdir.join("mylist.txt")
+        path.write("foo\n")
+        assert compile_wordlist(str(path)) == str(tmpdir / "mylist.dwl")
+
+    def test_compile_wordlist_out_path(self, tmpdir):
+        # we can choose the output path
+        path = tmpdir.join("mylist.txt")
+        path.write("foo\n")
+        out_path = str(tmpdir / "other.dwl")
+        assert compile_wordlist(str(path), out_path) == out_path
+        assert list(WordList(out_path)) == ["foo"]
+
+    def test_compile_wordlist_stdin(self, tmpdir, monkeypatch):
+        # input from stdin requires an output path
+        monkeypatch.setattr("sys.stdin", StringIO("foo\nbar\n"))
+        with pytest.raises(ValueError):
+            compile_wordlist("-")
+        out_path = compile_wordlist("-", str(tmpdir / "out.dwl"))
+        assert list(WordList(out_path)) == ["foo", "bar"]
+
+    def test_compile_wordlist_same_file(self, tmpdir):
+        # we refuse to overwrite the wordlist we read from
+        path = tmpdir.join("wordlist_foo.txt")
+        path.write("foo\nbar\n")
+        out_path = compile_wordlist(str(path))
+        with pytest.raises(ValueError):
+            compile_wordlist(out_path)
+        with pytest.raises(ValueError):
+            compile_wordlist(str(path), str(path))
+        assert list(WordList(out_path)) == ["foo", "bar"]
+        assert path.read() == "foo\nbar\n"
+
+    def test_compile_wordlist_replaces(self, tmpdir):
+        # existing packed wordlists are replaced, not overwritten in place
+        path = tmpdir.join("wordlist_foo.txt")
+        path.write("foo\nbar\n")
+        out_path = compile_wordlist(str(path))
+        w_list = WordList(out_path)
+        path.write("baz\n")
+        assert compile_wordlist(str(path)) == out_path
+        assert list(w_list) == ["foo", "bar"]
+        assert list(WordList(out_path)) == ["baz"]
+        assert sorted(os.listdir(str(tmpdir))) == [
+            "wordlist_foo.dwl", "wordlist_foo.txt"]
+
+    def test_compile_wordlist_fails_cleanup(self, tmpdir, monkeypatch):
+        # temporary files are removed if writing fails
+        def fail(src, dst):
+            raise OSError("fail")
+        path = tmpdir.join("wordlist_foo.txt")
+        path.write("foo\n")
+        monkeypatch.setattr("os.replace", fail)
+        monkeypatch.setattr("os.rename", fail)
+        with pytest.raises(OSError):
+            compile_wordlist(str(path))
+        assert tmpdir.listdir() == [path]
+
+    def test_compile_wordlist_mode(self, tmpdir):
+        # packed wordlists get the usual file mode
+        path = tmpdir.join("wordlist_foo.txt")
+        path.write("foo\n")
+        umask = os.umask(0o022)
+        try:
+            out_path = compile_wordlist(str(path))
+        finally:
+            os.umask(umask)
+        assert stat.S_IMODE(os.stat(out_path).st_mode) == 0o644
+
+    def test_compile_wordlist_cached(self, tmpdir, home_dir):
+        # we can compile wordlists we have in cache
+        path = tmpdir.join("mylist.txt")
+        path.write("foo\nbar\n")
+        past = time.time() - 100
+        os.utime(str(path), (past, past))
+        WordList(str(path)).packed()
+        assert WordList(str(path)).fd is None
+        out_path = compile_wordlist(str(path))
+        assert list(WordList(out_path)) == ["foo", "bar"]
+
+    def test_bundled_packed_wordlists(self):
+        # bundled packed wordlists are up to date
+        wordlists_dir = get_wordlists_dir()
+        names = os.listdir(wordlists_dir)
+        sources = [name for name in names if not name.endswith(".dwl")]
+        assert len(sources) == len(names) - len(sources)
+        for name in sources:
+            path = os.path.join(wordlists_dir, name)
+            packed_path = os.path.join(
+                wordlists_dir, "wordlist_%s.dwl" % (
+                    RE_VALID_WORDLIST_FILENAME.match(name).groups()[0]))
+            with open(path, "r") as fd:
+                words = list(parse_wordlist(fd))
+            w_list = WordList(packed_path)
+            assert list(w_list) == words
+            assert w_list.signed is name.endswith(".asc")